@@ -1,6 +1,8 @@
 import sys
 import glob
 import os
+sys.path.insert(1,os.path.join(os.path.dirname(os.path.abspath(__file__)),'../../funcs/'))
+import jobManifest
 
 files = glob.glob('ZHTo*')
 print("files={0:s}".format(str(files)))
@@ -10,6 +12,12 @@ for file in files :
     f_ntup = glob.glob('*.ntup')
     f_root = glob.glob('*.root')
     print("In {0:16s} Nntup={1:2d} Nroot={2:2d}".format(file,len(f_ntup),len(f_root)))
+    if os.path.isfile('manifest.csv') :
+        # per-job status from the manifest written by makeCondor.py
+        manifest = jobManifest.jobManifest()
+        manifest.update()
+        manifest.write()
+        manifest.printSummary()
     os.chdir('..')
 
 
@@ -6,6 +6,11 @@ def getArgs() :
     parser.add_argument("--dataSet",default=defDS,help="Data set name.") 
     parser.add_argument("--nickName",default='MCpileup',help="Data set nick name.") 
     parser.add_argument("-m","--mode",default='anaXRD',help="Mode (script to run).")
+    parser.add_argument("--stage",action='store_true',help="Copy the input files to the worker node with xrdcp instead of reading them directly.")
+    parser.add_argument("--redirector",default='root://cms-xrd-global.cern.ch/',help="XRootD redirector used to read the input.")
+    parser.add_argument("-e","--eventsPerJob",default=0,type=int,help="Split or pack the files into jobs of about this many events (0 for one job per file).")
+    parser.add_argument("--timing",action='store_true',help="Run ZH.py with --timing to write a per-stage timing report for each job.")
+    parser.add_argument("--skim",default='',choices=['','entries','events'],help="Run ZH.py with --skim to also write the events that pass the Z preselection.")
     parser.add_argument("-y","--year",default=2017,type=str,help="Data taking period, 2016, 2017 or 2018")
     return parser.parse_args()
 
@@ -26,6 +31,10 @@ def getFileName(line) :
     return fileName
 
 import os
+import sys
+sys.path.insert(1,os.path.join(os.path.dirname(os.path.abspath(__file__)),'../../funcs/'))
+import jobPlanner
+import jobManifest
 
 args = getArgs()
 era = str(args.year)
@@ -42,27 +51,51 @@ if len(files) < 1 :
     print("***In makeCondor.py: Empty fileList.txt")
     exit()
 
+# one job per file, or jobs of balanced size made from the numbers of events in DAS
+if args.eventsPerJob > 0 :
+    fileNames, entries = jobPlanner.getFileEntries(args.dataSet,instance='prod/phys03')
+    plan = jobPlanner.planJobs(fileNames,entries,args.eventsPerJob)
+    jobPlanner.printPlan(args.nickName,fileNames,plan)
+else :
+    plan = [([getFileName(file)],0,-1) for file in files]
+
+# the manifest records the jobs of this sample, so that failed ones can be resubmitted
+manifest = jobManifest.jobManifest()
 scriptList = [] 
-for nFile, file in enumerate(files) :
-    print("nFile={0:d} file[:80]={1:s}".format(nFile,file[:80]))
+for nFile, (fileNames, firstEntry, lastEntry) in enumerate(plan) :
+    print("nFile={0:d} file[:80]={1:s}".format(nFile,fileNames[0][:80]))
 
     scriptName = "{0:s}_{1:03d}.csh".format(args.nickName,nFile+1)
     print("scriptName={0:s}".format(scriptName))
     outLines = beginBatchScript(scriptName)
-    fileName = getFileName(file)
 
     outFileName = "{0:s}_{1:03d}.root".format(args.nickName,nFile+1)
-    outLines.append("xrdcp root://cms-xrd-global.cern.ch/{0:s} inFile.root\n".format(fileName)) 
+    if args.stage :
+        inFiles = ['inFile.root']
+        if len(fileNames) > 1 : inFiles = ['inFile_{0:d}.root'.format(i) for i in range(len(fileNames))]
+        for fileName, inFile in zip(fileNames,inFiles) :
+            outLines.append("xrdcp {0:s}{1:s} {2:s}\n".format(args.redirector,fileName,inFile)) 
+    else :
+        # ZH.py reads the files directly, transferring only the branches it uses
+        inFiles = [args.redirector + fileName for fileName in fileNames]
+    rangeArgs = ''
+    if firstEntry > 0 : rangeArgs += ' --firstEntry {0:d}'.format(firstEntry)
+    if lastEntry >= 0 : rangeArgs += ' --lastEntry {0:d}'.format(lastEntry)
+    if args.timing : rangeArgs += ' --timing'
+    if len(args.skim) > 0 : rangeArgs += ' --skim {0:s}'.format(args.skim)
     outLines.append("tar -zxvf SFs.tar.gz\n")
     outLines.append("cp MCsamples_*csv MCsamples.csv\n")
-    outLines.append("python ZH.py -f inFile.root -o {0:s} --nickName {1:s}\n".format(outFileName,args.nickName))
+    outLines.append("python ZH.py -f {0:s} -o {1:s} --nickName {2:s}{3:s}\n".format(','.join(inFiles),outFileName,args.nickName,rangeArgs))
     outLines.append("mv inFile.csv {0:s}\n".format(outFileName.replace(".root",".csv")))
-    outLines.append("rm inFile.root\n")
+    if args.stage : outLines.append("rm {0:s}\n".format(' '.join(inFiles)))
     outLines.append("rm *.pyc\nrm *.so\nrm *.pcm\nrm *cc.d\n")
     
     print("Writing out file = {0:s}".format(scriptName))
     open(scriptName,'w').writelines(outLines)
     scriptList.append(scriptName)
+    manifest.addJob(outFileName,fileNames,firstEntry,lastEntry)
+
+manifest.write()
             
 
 # now that .csh files have been generated make a list of corresponding .jdl files
@@ -85,7 +118,7 @@ for file in scriptList :
     outLines.append('Log = {0:s}.log\n'.format(base))
     print("dir={0:s}".format(dir))
     outLines.append('transfer_input_files = {0:s}ZH.py, {0:s}MC_2017.root, {0:s}data_pileup_2017.root, {0:s}MCsamples_{1:s}.csv, {0:s}ScaleFactor.py, {0:s}SFs.tar.gz, '.format(dir,args.year))
-    outLines.append('{0:s}tauFun.py, {0:s}generalFunctions.py, {0:s}outTuple.py,'.format(funcsDir))
+    outLines.append('{0:s}tauFun.py, {0:s}generalFunctions.py, {0:s}outTuple.py, {0:s}jobManifest.py, {0:s}genCategory.py, {0:s}arrayReader.py, {0:s}eventBatch.py, {0:s}cutFlow.py, {0:s}stageTimer.py, {0:s}skim.py,'.format(funcsDir))
     outLines.append('{0:s}FastMTT.h, {0:s}MeasuredTauLepton.h, {0:s}svFitAuxFunctions.h,'.format(SVFitDir)) 
     outLines.append('{0:s}FastMTT.cc, {0:s}MeasuredTauLepton.cc, {0:s}svFitAuxFunctions.cc\n'.format(SVFitDir))
     outLines.append('should_transfer_files = YES\n')
@@ -8,7 +8,7 @@ __version__ = "GageDev_v1.1"
 # import external modules 
 import sys
 import numpy as np
-from ROOT import TFile, TTree, TH1D, TCanvas, TLorentzVector  
+from ROOT import TH1D, TChain
 from math import sqrt, pi
 
 # import from ZH_Run2/funcs/
@@ -16,25 +16,66 @@ sys.path.insert(1,'../funcs/')
 import tauFun
 import generalFunctions as GF 
 import outTuple
+import genCategory
+import jobManifest
+import cutFlow
+import stageTimer
+import skim
 import time
 
 def getArgs() :
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("-v","--verbose",default=0,type=int,help="Print level.")
-    parser.add_argument("-f","--inFileName",default='ZHtoTauTau_test.root',help="File to be analyzed.")
+    parser.add_argument("-f","--inFileName",default='ZHtoTauTau_test.root',help="File(s) to be analyzed (comma separated, local or root://).")
     #parser.add_argument("-f","--inFileName",default='DY1JetsToLL_test.root',help="File to be analyzed.")
     parser.add_argument("-c","--category",default='none',help="Event category to analyze.")
     parser.add_argument("--nickName",default='',help="MC sample nickname") 
     parser.add_argument("-d","--dataType",default='MC',help="Data or MC") 
     parser.add_argument("-o","--outFileName",default='',help="File to be used for output.")
     parser.add_argument("-n","--nEvents",default=0,type=int,help="Number of events to process.")
+    parser.add_argument("--firstEntry",default=0,type=int,help="First entry to process.")
+    parser.add_argument("--lastEntry",default=-1,type=int,help="Entry after the last one to process (-1 for all).")
+    parser.add_argument("--cacheSize",default=30,type=int,help="TTreeCache size in MB for reading the input (0 for none).")
+    parser.add_argument("--learnEntries",default=100,type=int,help="Entries used by the TTreeCache to learn which branches are read.")
+    parser.add_argument("--prefetch",action='store_true',help="Prefetch the input asynchronously.")
+    parser.add_argument("--allBranches",action='store_true',help="Read all input branches rather than only the declared ones.")
+    parser.add_argument("--checkBranches",action='store_true',help="Report branches that are read but not declared.")
+    parser.add_argument("--timing",action='store_true',help="Time each processing stage and write {job}.timing and a CSV.")
+    parser.add_argument("--skim",default='',choices=['']+skim.modes,help="Write the events passing the Z preselection: 'events' to {job}_skim.root, 'entries' to {job}.skim.")
+    parser.add_argument("--entryList",default='',help="Process only the entries listed in this .skim file (made with --skim entries from the same input).")
     parser.add_argument("-m","--maxPrint",default=0,type=int,help="Maximum number of events to print.")
     parser.add_argument("-t","--testMode",default='',help="tau MVA selection")
     parser.add_argument("-y","--year",default=2017,type=int,help="Data taking period, 2016, 2017 or 2018")
     
     return parser.parse_args()
 
+def getBranches(era, MC) :
+    # nanoAOD branches read directly in this script 
+    branches = ['run','luminosityBlock','event','nElectron','nMuon','nTau','Tau_eta','Tau_phi','Tau_idMVAnewDM2017v2']
+    triggers = { '2016':['HLT_Ele27_WPTight_Gsf','HLT_Ele23_Ele12_CaloIdL_TrackIdL_IsoVL_DZ','HLT_IsoMu22','HLT_IsoMu24',
+                         'HLT_IsoMu22_eta2p1','HLT_IsoTkMu22','HLT_IsoTkMu22_eta2p1','HLT_Mu17_TrkIsoVVL_Mu8_TrkIsoVVL_DZ'],
+                 '2017':['HLT_Ele35_WPTight_Gsf','HLT_IsoMu24','HLT_IsoMu27'],
+                 '2018':['HLT_Ele32_WPTight_Gsf','HLT_Ele35_WPTight_Gsf','HLT_IsoMu24','HLT_IsoMu27',
+                         'HLT_IsoMu20_eta2p1_LooseChargedIsoPFTauHPS27_eta2p1_CrossL1',
+                         'HLT_IsoMu20_eta2p1_LooseChargedIsoPFTauHPS27_eta2p1_TightID_CrossL1'] }
+    branches += triggers.get(era,[])
+    if MC : branches += ['Pileup_nPU'] + genCategory.branches
+    return branches
+
+def setTimer(timer, outTuple) :
+    # time the selection functions of tauFun, and the trigger matching, scale factors and FastMTT of outTuple.Fill()
+    stages = { 'ObjectSelection':['makeGoodElectronList','makeGoodMuonList','eliminateCloseLeptons'], 'FindZ':['findZ'],
+               'PairBuilding':['getTauList','getBestTauPair','getBestETauPair','getBestMuTauPair','getBestEMuTauPair'],
+               'TriggerMatching':['findETrigger','findMuTrigger'] }
+    for stage in ['ObjectSelection','FindZ','PairBuilding','TriggerMatching'] :
+        for name in stages[stage] : timer.wrap(tauFun,name,stage)
+    for sf in [outTuple.sf_EleTrig35,outTuple.sf_MuonTrigIso27] :
+        for name in ['get_EfficiencyMC','get_EfficiencyData'] : timer.wrap(sf,name,'SFLookup')
+    timer.wrap(outTuple,'runSVFit','FastMTT')
+    outTuple.timer = timer
+    return
+
 def ZHDR(entry,Lep,jt) :
     phi1, eta1 = Lep.Phi(), Lep.Eta()
     try :
@@ -76,24 +117,32 @@ args = getArgs()
 print("args={0:s}".format(str(args)))
 maxPrint = args.maxPrint 
 
-cutCounter = {}
-
 if args.category != 'none' :
     cats = [args.category]
 else :
     cats = ['eeet','eemt','eett','eeem','mmet','mmmt','mmtt','mmem']
 
-for cat in cats : cutCounter[cat] = GF.cutCounter()
+# one cut flow for all categories, counted with the generator weight for MC
+cutCounter = cutFlow.cutFlow(cats)
+catsByMode = { 'ee':[cat for cat in cats if cat[:2] == 'ee'], 'mm':[cat for cat in cats if cat[:2] == 'mm'] }
 
 inFileName = args.inFileName
-print("Opening {0:s} as input.  Event category {1:s}".format(inFileName,cat))
-inFile = TFile.Open(inFileName)
-inFile.cd()
-inTree = inFile.Get("Events")
+print("Opening {0:s} as input.  Event categories {1:s}".format(inFileName,' '.join(cats)))
+# several files, e.g. small files packed into one job, are read as a single chain 
+inTree = TChain("Events")
+for fileName in inFileName.split(',') : inTree.Add(fileName)
 nentries = inTree.GetEntries()
-nMax = nentries
-print("nentries={0:d} nMax={1:d}".format(nentries,nMax))
-if args.nEvents > 0 : nMax = min(args.nEvents-1,nentries)
+nFirst, nMax = max(args.firstEntry,0), nentries
+if args.lastEntry >= 0 : nMax = min(args.lastEntry,nentries)
+if args.nEvents > 0 : nMax = min(nFirst+args.nEvents,nMax)
+print("nentries={0:d} nMax={1:d} firstEntry={2:d}".format(nentries,nMax,nFirst))
+GF.setTreeCache(inTree,args.cacheSize,args.learnEntries,nFirst,nMax,args.prefetch)
+entries, entryList = xrange(nFirst,nMax), None
+if len(args.entryList) > 0 :
+    entryList = skim.readEntries(args.entryList)
+    if entryList['files'] != inFileName.split(',') : print("Warning: {0:s} was made from {1:s}".format(args.entryList,','.join(entryList['files'])))
+    entries = [i for i in entryList['entries'] if i >= nFirst and i < nMax]
+    print("Processing the {0:d} entries of {1:s}".format(len(entries),args.entryList))
 
 
 MC = len(args.nickName) > 0 
@@ -114,30 +163,68 @@ else :
 
 era=str(args.year)
 
+# read only the branches used by this script, tauFun and outTuple (and by the GF printing functions if needed)
+enabled = []
+if not args.allBranches :
+    branches = getBranches(era,MC) + tauFun.getBranches(era) + outTuple.getBranches(MC)
+    if maxPrint > 0 : branches += GF.getBranches(MC)
+    enabled, missing = GF.pruneBranches(inTree,branches)
+    print("Reading {0:d} branches.  Declared but not in the input: {1:s}".format(len(enabled),str(missing)))
+recorder = None
+if args.checkBranches : recorder = GF.branchRecorder(inTree)
+
 outFileName = GF.getOutFileName(args).replace(".root",".ntup")
 print("Opening {0:s} as output.".format(outFileName))
 outTuple = outTuple.outTuple(outFileName, era)
+timer = stageTimer.stageTimer(args.timing)
+if args.timing : setTimer(timer,outTuple)
+
+# pileup profile and generator weights of all input events (not just the selected ones), with the
+# names and binning of pileup/makePileUpHisto.py, so that no separate pileup pass over the MC is needed
+if MC :
+    hPU = TH1D("hMC","hMC",PU.nBins,PU.xMin,PU.xMax)
+    hPUWeight = TH1D("hWeight","hWeight",PU.nBins,PU.xMin,PU.xMax)
+    hPU.SetDirectory(outTuple.f)
+    hPUWeight.SetDirectory(outTuple.f)
+    # for a skim, those of the input it was made from, in the job that owns them (see funcs/skim.py)
+    fromSkim = False
+    if entryList is not None or skim.isSkim(inFileName.split(',')) :
+        fromSkim = skim.restoreHistos([hPU,hPUWeight],inFileName.split(','),nFirst,nMax,nentries,entryList)
+        if fromSkim : print("Pileup histograms taken from the skim")
+        else : print("Warning: the input is a skim without the pileup histograms of its full input; filling them from the skimmed events")
+
+skimWriter = None
+if len(args.skim) > 0 : skimWriter = skim.skimWriter(skim.getFileName(outFileName,args.skim),args.skim,inTree,inFileName.split(','),nFirst)
 
 
 tStart = time.time()
 countMod = 1000
 isMC = True
-for count, e in enumerate(inTree) :
-    for cat in cats : cutCounter[cat].count('All')
+for count in entries :
+    timer.start('Read')
+    inTree.GetEntry(count)
+    timer.stop('Read')
+    e = inTree
+    if recorder is not None : e = recorder
+    if MC and not fromSkim :
+        hPU.Fill(e.Pileup_nPU)
+        hPUWeight.Fill(e.Pileup_nPU,e.genWeight)
+    passZ = False
+    w = e.genWeight if MC else 1.
+    cutCounter.count('All',weight=w)
     if count % countMod == 0 :
         print("Count={0:d}".format(count))
         if count >= 10000 : countMod = 10000
-    if count == nMax : break
 
     for lepMode in ['ee','mm'] :
 
         if e.nTau < 1 : continue 
         if lepMode == 'ee' :
             if e.nElectron < 2 : continue
-            for cat in cats[:4] : cutCounter[cat].count('LeptonCount')
+            cutCounter.count('LeptonCount',weight=w,cats=catsByMode['ee'])
         if lepMode == 'mm' :
             if e.nMuon < 2 : continue 
-            for cat in cats[4:] : cutCounter[cat].count('LeptonCount')
+            cutCounter.count('LeptonCount',weight=w,cats=catsByMode['mm'])
 
         goodElectronList = tauFun.makeGoodElectronList(e)
         goodMuonList = tauFun.makeGoodMuonList(e)
@@ -154,7 +241,7 @@ for count, e in enumerate(inTree) :
             pairList, lepList = tauFun.findZ(goodElectronList,[], e)
             #protect from the case that you dont get back 2 leptons
             if len(lepList) != 2 : continue
-            for cat in cats[:4] : cutCounter[cat].count('Trigger')
+            cutCounter.count('Trigger',weight=w,cats=catsByMode['ee'])
         
         if lepMode == 'mm' :
             if args.year == '2016' and not e.HLT_IsoMu22 and not e.HLT_IsoMu24 and not e.HLT_IsoMu22_eta2p1 and not e.HLT_IsoTkMu22 and not e.HLT_IsoTkMu22_eta2p1 and not e.HLT_Mu17_TrkIsoVVL_Mu8_TrkIsoVVL_DZ : continue
@@ -163,21 +250,22 @@ for count, e in enumerate(inTree) :
 
             if len(goodMuonList) < 2 : continue
             pairList, lepList = tauFun.findZ([],goodMuonList, e)
-	    for cat in cats[4:] : cutCounter[cat].count('Trigger')
+	    cutCounter.count('Trigger',weight=w,cats=catsByMode['mm'])
         
         if len(pairList) < 1 : continue
         if lepMode == 'ee' :
-            for cat in cats[:4]: cutCounter[cat].count('LeptonPair')
+            cutCounter.count('LeptonPair',weight=w,cats=catsByMode['ee'])
         if lepMode == 'mm' :
-            for cat in cats[4:]: cutCounter[cat].count('LeptonPair')
+            cutCounter.count('LeptonPair',weight=w,cats=catsByMode['mm'])
    
         LepP, LepM = pairList[0], pairList[1]
         M = (LepM + LepP).M()
         if M < 60. or M > 120. : continue
+        passZ = True
         if lepMode == 'ee' :
-            for cat in cats[:4]: cutCounter[cat].count('FoundZ')
+            cutCounter.count('FoundZ',weight=w,cats=catsByMode['ee'])
         if lepMode == 'mm' :
-            for cat in cats[4:]: cutCounter[cat].count('FoundZ')
+            cutCounter.count('FoundZ',weight=w,cats=catsByMode['mm'])
         
         for tauMode in ['et','mt','tt','em'] :
             cat = lepMode + tauMode
@@ -208,14 +296,14 @@ for count, e in enumerate(inTree) :
                     GF.printMC(e)
                 continue
 
-            cutCounter[cat].count("GoodTauPair")
+            cutCounter.count("GoodTauPair",weight=w,cats=cat)
 
             if tauMode == 'tt' and args.testMode.lower() == "vvtight" :
                 j1, j2 = bestTauPair[0], bestTauPair[1]
                 if ord(e.Tau_idMVAnewDM2017v2[j1]) < 64 : continue
                 if ord(e.Tau_idMVAnewDM2017v2[j2]) < 64 : continue
 
-            cutCounter[cat].count("VVtightTauPair")
+            cutCounter.count("VVtightTauPair",weight=w,cats=cat)
 
             if len(bestTauPair) > 1 :
                 jt1, jt2 = bestTauPair[0], bestTauPair[1]
@@ -230,12 +318,15 @@ for count, e in enumerate(inTree) :
                 if not isInJSON :
                     print("Event not in JSON: Run:{0:d} LS:{1:d}".format(e.run,e.luminosityBlock))
                     continue
-                cutCounter[cat].count("InJSON")
+                cutCounter.count("InJSON",weight=w,cats=cat)
                         
             SVFit = True
 	    
             if not MC : isMC = False
+            if MC : outTuple.setGenCat(genCategory.catNumbers.get(GF.eventID(e),0))
+            timer.start('Fill')
             outTuple.Fill(e,SVFit,cat,jt1,jt2,LepP,LepM,lepList,isMC,era) 
+            timer.stop('Fill')
 
             if maxPrint > 0 :
                 maxPrint -= 1
@@ -246,16 +337,30 @@ for count, e in enumerate(inTree) :
                 GF.printEvent(e)
                 print("Event ID={0:s} cat={1:s}".format(GF.eventID(e),cat))
                 
+    if passZ and skimWriter is not None : skimWriter.fill(count)
 
+nProcessed = len(entries)
 dT = time.time() - tStart
-print("Run time={0:.2f} s  time/event={1:.1f} us".format(dT,1000000.*dT/count))
-
+print("Run time={0:.2f} s  time/event={1:.1f} us".format(dT,1000000.*dT/max(nProcessed,1)))
+if args.timing :
+    timer.add('Total',dT)
+    timer.nEvents = nProcessed
+    timer.printSummary()
+    timer.write(stageTimer.getFileName(outFileName),csv=True)
+
+if skimWriter is not None : skimWriter.write(nProcessed,[hPU,hPUWeight] if MC else [])
+eventsOut = outTuple.entries
 outTuple.writeTree()
 for cat in cats :
     print('\nSummary for {0:s}'.format(cat))
-    cutCounter[cat].printSummary()
+    cutCounter.printSummary(cat,weighted=MC)
+cutCounter.write(cutFlow.getFileName(outFileName))
 
 if not MC : CJ.printJSONsummary()
+if recorder is not None : recorder.printSummary(enabled if len(enabled) > 0 else recorder.names)
+
+# mark the job as complete in the production manifest
+jobManifest.writeStatus(outFileName,'done',nProcessed,eventsOut,dT)
 
 
 
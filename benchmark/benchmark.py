@@ -0,0 +1,288 @@
+#
+# time the selection code on synthetic nanoAOD-like events (funcs/syntheticEvents.py)
+#
+# Each stage is run --repeat times on the same events and the fastest time is reported in
+# us/event, together with the median, so that the numbers are stable from run to run.
+# The columnar stages (pairSelection, jetSelection, genCategory, genMatching, cutFlow) only
+# need numpy; the pairKernels stages, the compiled pair loops, are timed when numba is installed.   The per-event stages (tauFun object selection, findZ and pair building)
+# need ROOT and run from --zhDir, where tauFun.py finds its configuration; --outTuple adds
+# outTuple.getJets(), FastMTT and outTuple.Fill(), which also need the SVFit sources and
+# scale factor files there.
+#
+# With -o the results are written to a JSON file, and --compare checks them against such a
+# file: the script exits with 1 if a stage is slower than the reference by more than --tolerance.
+#
+# --imports times the import of each analysis module in a fresh interpreter (after numpy, which
+# they all use) from --zhDir, and exits with 1 if one takes longer than --importTarget ms.
+# Modules that cannot be imported here (e.g. the python 2 ones under python 3) are listed as such.
+#
+# e.g.   python benchmark.py -n 20000 -o reference.json
+#        python benchmark.py -n 20000 --compare reference.json
+#        python benchmark.py --imports --importTarget 50
+#
+import sys
+import os
+funcsDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),'../funcs/')
+sys.path.insert(1,funcsDir)
+import gc
+import subprocess
+import json
+import time
+import platform
+import numpy as np
+import syntheticEvents
+import pairSelection
+import pairKernels
+import jetSelection
+import genCategory
+import genMatching
+import cutFlow
+import arrayReader
+import eventBatch
+
+def getArgs() :
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n","--nEvents",default=20000,type=int,help="Number of synthetic events.")
+    parser.add_argument("-s","--seed",default=1,type=int,help="Random seed of the synthetic events.")
+    parser.add_argument("-r","--repeat",default=5,type=int,help="Number of times each stage is timed.")
+    parser.add_argument("-f","--inFileName",default='',help="Read the events from this .npz file rather than making them.")
+    parser.add_argument("-w","--writeEvents",default='',help="Write the synthetic events to this .npz file.")
+    parser.add_argument("--zhDir",default='../ZH',help="Directory with configZH_tight.yaml (and the SVFit and SF files for --outTuple).")
+    parser.add_argument("--scalarEvents",default=5000,type=int,help="Number of events used for the per-event stages (0 for none).")
+    parser.add_argument("--outTuple",action='store_true',help="Also time outTuple.getJets(), FastMTT and outTuple.Fill().")
+    parser.add_argument("-o","--outFileName",default='',help="Write the results to this JSON file.")
+    parser.add_argument("--compare",default='',help="JSON file of a previous run to compare with.")
+    parser.add_argument("--tolerance",default=0.25,type=float,help="Allowed fractional slow down with respect to --compare.")
+    parser.add_argument("--imports",action='store_true',help="Time the import of the analysis modules.")
+    parser.add_argument("--importTarget",default=50.,type=float,help="Largest allowed import time of a module in ms.")
+    return parser.parse_args()
+
+def timeStage(func, nEvents, repeat) :
+    # fastest and median time per event in us over repeat runs, after one warm-up run
+    func()
+    times = []
+    gc.disable()
+    try :
+        for i in range(repeat) :
+            t0 = time.time()
+            func()
+            times.append(time.time() - t0)
+    finally :
+        gc.enable()
+    return 1.e6*min(times)/nEvents, 1.e6*float(np.median(times))/nEvents
+
+def getColumnarStages(a, selections) :
+    stages = []
+    for channel in ['tt','mt','et','em'] :
+        stages.append(('pairSelection.{0:s}'.format(channel),
+                       lambda channel=channel : pairSelection.getBestPairs(a,channel,selections,useKernels=False)))
+        if pairKernels.available :
+            stages.append(('pairKernels.{0:s}'.format(channel),
+                           lambda channel=channel : pairSelection.getBestPairs(a,channel,selections,useKernels=True)))
+
+    # jets cleaned against the selected tt pairs
+    jt1, jt2, nGood = pairSelection.getBestPairs(a,'tt',selections)
+    selected = np.nonzero(jt1 >= 0)[0]
+    offTau = arrayReader.getOffsets(a['nTau'])
+    k1, k2 = offTau[selected] + jt1[selected], offTau[selected] + jt2[selected]
+    stages.append(('jetSelection',lambda : jetSelection.getJets(a,a['Tau_eta'][k1],a['Tau_phi'][k1],a['Tau_eta'][k2],a['Tau_phi'][k2],selected)))
+    stages.append(('genCategory',lambda : genCategory.getCategories(a)))
+    stages.append(('genMatching.Tau',lambda : genMatching.matchObjects(a,'Tau')))
+
+    def countCutFlow() :
+        cf = cutFlow.cutFlow()
+        cf.count('All',n=len(jt1))
+        cf.count('TwoTaus',nGood >= 2,weight=a['genWeight'])
+        cf.count('TauPair',jt1 >= 0,weight=a['genWeight'])
+        return cf
+    stages.append(('cutFlow',countCutFlow))
+    return stages
+
+def getScalarStages(a, nEvents, zhDir, withOutTuple) :
+    # the per-event code of ZH.py, on the first nEvents events
+    cwd = os.getcwd()
+    os.chdir(zhDir)
+    try :
+        import tauFun
+        # read now, since tauFun.py finds configZH_tight.yaml in the working directory
+        tauFun.getSelections()
+        from ROOT import TLorentzVector
+        if withOutTuple :
+            import outTuple
+            out = outTuple.outTuple(os.path.join(cwd,'benchmark_outTuple.root'),'2017')
+    finally :
+        os.chdir(cwd)
+    e = eventBatch.eventView(a)
+
+    def readEvents() :
+        for i in range(nEvents) : e.GetEntry(i)
+
+    goodLists = []
+    def objectSelection() :
+        del goodLists[:]
+        for i in range(nEvents) :
+            e.GetEntry(i)
+            goodElectronList = tauFun.makeGoodElectronList(e)
+            goodMuonList = tauFun.makeGoodMuonList(e)
+            goodLists.append(tauFun.eliminateCloseLeptons(e,goodElectronList,goodMuonList))
+    objectSelection()
+
+    zCandidates = []
+    def findZ() :
+        del zCandidates[:]
+        for i in range(nEvents) :
+            e.GetEntry(i)
+            goodElectronList, goodMuonList = goodLists[i]
+            for lepMode in ['ee','mm'] :
+                if lepMode == 'ee' : pairList, lepList = tauFun.findZ(goodElectronList,[],e)
+                else : pairList, lepList = tauFun.findZ([],goodMuonList,e)
+                if len(pairList) > 1 : zCandidates.append((i,lepMode,pairList,lepList))
+    findZ()
+
+    pairs = []
+    def pairBuilding() :
+        del pairs[:]
+        for i, lepMode, pairList, lepList in zCandidates :
+            e.GetEntry(i)
+            tauList = tauFun.getTauList(lepMode+'tt',e,pairList=pairList)
+            best = tauFun.getBestTauPair(lepMode+'tt',e,tauList)
+            if len(best) > 1 : pairs.append((i,lepMode+'tt',best,pairList,lepList))
+            best = tauFun.getBestMuTauPair(e,cat=lepMode+'mt',pairList=pairList)
+            if len(best) > 1 : pairs.append((i,lepMode+'mt',best,pairList,lepList))
+            best = tauFun.getBestETauPair(e,cat=lepMode+'et',pairList=pairList)
+            if len(best) > 1 : pairs.append((i,lepMode+'et',best,pairList,lepList))
+    pairBuilding()
+
+    stages = [('eventView',readEvents),('tauFun.objectSelection',objectSelection),('tauFun.findZ',findZ),('tauFun.pairBuilding',pairBuilding)]
+    if not withOutTuple : return stages
+
+    def getTaus(i, cat, jt1, jt2) :
+        tau1, tau2 = TLorentzVector(), TLorentzVector()
+        leg1 = {'et':'Electron','mt':'Muon','tt':'Tau'}[cat[-2:]]
+        tau1.SetPtEtaPhiM(getattr(e,leg1+'_pt')[jt1],getattr(e,leg1+'_eta')[jt1],getattr(e,leg1+'_phi')[jt1],0.)
+        tau2.SetPtEtaPhiM(e.Tau_pt[jt2],e.Tau_eta[jt2],e.Tau_phi[jt2],0.)
+        return tau1, tau2
+
+    def getJets() :
+        for i, cat, best, pairList, lepList in pairs :
+            e.GetEntry(i)
+            tau1, tau2 = getTaus(i,cat,best[0],best[1])
+            out.getJets(e,tau1,tau2)
+
+    def fastMTT() :
+        for i, cat, best, pairList, lepList in pairs :
+            e.GetEntry(i)
+            tau1, tau2 = getTaus(i,cat,best[0],best[1])
+            out.runSVFit(e,cat[-2:],best[0],best[1],tau1,tau2)
+
+    def fill() :
+        for i, cat, best, pairList, lepList in pairs :
+            e.GetEntry(i)
+            out.Fill(e,True,cat,best[0],best[1],pairList[0],pairList[1],lepList,True,'2017')
+
+    return stages + [('outTuple.getJets',getJets),('FastMTT',fastMTT),('outTuple.Fill',fill)]
+
+importModules = ['generalFunctions','tauFun','outTuple','pairSelection','pairKernels','jetSelection','genCategory','genMatching',
+                 'cutFlow','stageTimer','arrayReader','eventBatch','jobManifest']
+
+def timeImports(modules, zhDir, repeat) :
+    # fastest import time of each module in ms, None if it cannot be imported
+    code = "import sys, time, numpy\nsys.path.insert(1,{0:s})\nt0 = time.time()\nimport {1:s}\nprint(time.time() - t0)"
+    results = []
+    for module in modules :
+        times = []
+        for i in range(max(repeat,1)) :
+            p = subprocess.Popen([sys.executable,'-c',code.format(repr(funcsDir),module)],cwd=zhDir,
+                                 stdout=subprocess.PIPE,stderr=subprocess.PIPE)
+            out, err = p.communicate()
+            if p.returncode != 0 :
+                print("Cannot import {0:s}: {1:s}".format(module,err.decode().strip().split('\n')[-1]))
+                break
+            times.append(1000.*float(out.decode().strip().split('\n')[-1]))
+        results.append({ 'module':module, 'ms':min(times) if len(times) == repeat else None })
+    return results
+
+def printResults(results) :
+    print("Stage                         us/event(min)  us/event(median)")
+    for r in results :
+        print("{0:30s}{1:14.3f}{2:18.3f}".format(r['stage'],r['min'],r['median']))
+    return
+
+def compareResults(results, reference, tolerance) :
+    # stages that are slower than in the reference by more than tolerance
+    ref = dict([(r['stage'],r) for r in reference['stages']])
+    slower = []
+    for r in results :
+        if not r['stage'] in ref : continue
+        ratio = r['min']/max(ref[r['stage']]['min'],1.e-9)
+        flag = ''
+        if ratio > 1. + tolerance :
+            slower.append(r['stage'])
+            flag = '  SLOWER'
+        print("{0:30s} {1:10.3f} us  reference {2:10.3f} us  ratio {3:5.2f}{4:s}".format(r['stage'],r['min'],ref[r['stage']]['min'],ratio,flag))
+    if reference['nEvents'] != results[0]['nEvents'] :
+        print("Warning: the reference was made with {0:d} events".format(reference['nEvents']))
+    return slower
+
+args = getArgs()
+print("args={0:s}".format(str(args)))
+
+t0 = time.time()
+if len(args.inFileName) > 0 :
+    a = syntheticEvents.readEvents(args.inFileName)
+else :
+    a = syntheticEvents.makeEvents(args.nEvents,seed=args.seed)
+nEvents = len(a['event'])
+print("{0:d} events ready in {1:.2f} s".format(nEvents,time.time()-t0))
+if len(args.writeEvents) > 0 : syntheticEvents.writeEvents(args.writeEvents,a)
+
+import yaml
+selections = yaml.safe_load(open(os.path.join(args.zhDir,'configZH_tight.yaml'),'r'))
+
+results = []
+for stage, func in getColumnarStages(a,selections) :
+    tMin, tMedian = timeStage(func,nEvents,args.repeat)
+    results.append({ 'stage':stage, 'min':tMin, 'median':tMedian, 'nEvents':nEvents })
+
+nScalar = min(args.scalarEvents,nEvents)
+if nScalar > 0 :
+    try :
+        stages = getScalarStages(a,nScalar,args.zhDir,args.outTuple)
+    except (ImportError, SyntaxError) as err :
+        print("Per-event stages skipped: {0:s}".format(str(err)))
+        stages = []
+    for stage, func in stages :
+        tMin, tMedian = timeStage(func,nScalar,args.repeat)
+        results.append({ 'stage':stage, 'min':tMin, 'median':tMedian, 'nEvents':nScalar })
+
+printResults(results)
+report = { 'nEvents':nEvents, 'seed':args.seed, 'repeat':args.repeat, 'python':platform.python_version(),
+           'numpy':np.__version__, 'host':platform.node(), 'stages':results }
+
+slowImports = []
+if args.imports :
+    report['imports'] = timeImports(importModules,args.zhDir,args.repeat)
+    print("Module              import(ms)")
+    for r in report['imports'] :
+        if r['ms'] is None :
+            print("{0:20s}{1:>10s}".format(r['module'],'-'))
+            continue
+        flag = ''
+        if r['ms'] > args.importTarget :
+            slowImports.append(r['module'])
+            flag = '  SLOW'
+        print("{0:20s}{1:10.1f}{2:s}".format(r['module'],r['ms'],flag))
+if len(args.outFileName) > 0 :
+    with open(args.outFileName,'w') as f : json.dump(report,f,indent=1)
+    print("Results written to {0:s}".format(args.outFileName))
+
+if len(args.compare) > 0 :
+    slower = compareResults(results,json.load(open(args.compare,'r')),args.tolerance)
+    if len(slower) > 0 :
+        print("{0:d} stage(s) slower than the reference by more than {1:.0f}%: {2:s}".format(len(slower),100.*args.tolerance,', '.join(slower)))
+        sys.exit(1)
+
+if len(slowImports) > 0 :
+    print("{0:d} module(s) take longer than {1:.0f} ms to import: {2:s}".format(len(slowImports),args.importTarget,', '.join(slowImports)))
+    sys.exit(1)
@@ -1,17 +1,56 @@
+# merge the .ntup files of each sample directory into {dir}/{dir}.root,
+# running several directories in parallel with one hadnano2.py process each.
+# When a directory has a manifest.csv only the outputs of the jobs that are 'done' are merged.
+# The cut flows and timing reports of the same jobs are added into {dir}/{dir}.cutflow and {dir}/{dir}.timing.
 import sys
 import glob
 import os
+import subprocess
+from multiprocessing.pool import ThreadPool
+sys.path.insert(1,os.path.join(os.path.dirname(os.path.abspath(__file__)),'../../funcs/'))
+import jobManifest
+import cutFlow
+import stageTimer
 
-files = glob.glob('*')
-print("files={0:s}".format(str(files)))
-for file in files :
-    print("file={0:s} isDir={1}".format(file,os.path.isdir(file)))
-    if not os.path.isdir(file) : continue
-    os.chdir(file) 
-    print("cwd={0:s}".format(os.getcwd()))
-    cmd = "python ../hadnano2.py {0:s}.root *.ntup".format(file)
-    print("cmd={0:s}".format(cmd))
-    os.system(cmd) 
-    os.chdir('..')
+def getArgs() :
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dirs",nargs='*',default=['*'],help="Sample directories (glob patterns).")
+    parser.add_argument("-j","--nWorkers",default=4,type=int,help="Number of directories merged in parallel.")
+    return parser.parse_args()
+
+def getInputs(dirName) :
+    if not os.path.isfile(os.path.join(dirName,'manifest.csv')) :
+        return sorted([os.path.basename(f) for f in glob.glob(os.path.join(dirName,'*.ntup'))])
+    manifest = jobManifest.jobManifest(dirName)
+    manifest.update()
+    manifest.printSummary()
+    return [job['outFileName'] for job in manifest.getJobs(['done'])]
 
+def mergeDir(dirName) :
+    inFiles = getInputs(dirName)
+    if len(inFiles) < 1 : return dirName, -1
+    cmd = [sys.executable,os.path.join(os.path.dirname(os.path.abspath(__file__)),'hadnano2.py'),"{0:s}.root".format(os.path.basename(dirName))] + inFiles
+    print("cmd={0:s}".format(' '.join(cmd[:3]) + " ({0:d} files)".format(len(inFiles))))
+    with open(os.path.join(dirName,'hadd.log'),'w') as log :
+        exitCode = subprocess.call(cmd,cwd=dirName,stdout=log,stderr=subprocess.STDOUT)
+    for module in [cutFlow,stageTimer] :
+        reports = [os.path.join(dirName,module.getFileName(f)) for f in inFiles]
+        total = module.mergeFiles([f for f in reports if os.path.isfile(f)])
+        if total is not None : total.write(os.path.join(dirName,module.getFileName(os.path.basename(dirName))))
+    return dirName, exitCode
+
+args = getArgs()
+files = sorted(set([f for pattern in args.dirs for f in glob.glob(pattern)]))
+print("files={0:s}".format(str(files)))
+dirs = [f for f in files if os.path.isdir(f)]
 
+pool = ThreadPool(args.nWorkers)
+failed = []
+for dirName, exitCode in pool.imap_unordered(mergeDir,dirs) :
+    print("Merged {0:s} exitCode={1:d}".format(dirName,exitCode))
+    if exitCode != 0 : failed.append(dirName)
+pool.close()
+pool.join()
+for dirName in failed : print("  FAILED {0:s} log={1:s}".format(dirName,os.path.join(dirName,'hadd.log')))
+sys.exit(1 if len(failed) > 0 else 0)
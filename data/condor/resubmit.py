@@ -0,0 +1,59 @@
+# resubmit only the missing or failed jobs of a production, using the manifest.csv
+# written by makeCondor.py or runLocal.py in each sample directory.
+# Run it after the jobs have finished: a job that is still running has no .status file yet.
+
+import os
+import sys
+import glob
+sys.path.insert(1,os.path.join(os.path.dirname(os.path.abspath(__file__)),'../../funcs/'))
+import jobManifest
+import localRunner
+
+def getArgs() :
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dirs",nargs='*',default=['*_Run2017*'],help="Sample directories (glob patterns).")
+    parser.add_argument("-y","--year",default=2017,type=int,help="Data taking period, 2016, 2017 or 2018")
+    parser.add_argument("-d","--dataType",default='Data',help="Data or MC")
+    parser.add_argument("-s","--status",default='failed,missing',help="Comma separated list of job status values to resubmit.")
+    parser.add_argument("--local",action='store_true',help="Rerun the jobs with the local runner instead of condor.")
+    parser.add_argument("-j","--nWorkers",default=4,type=int,help="Number of jobs to run in parallel (--local).")
+    parser.add_argument("-r","--nRetries",default=1,type=int,help="Number of times a failed job is retried (--local).")
+    parser.add_argument("--redirector",default=localRunner.xrdPrefix,help="XRootD redirector used to read the input (--local).")
+    parser.add_argument("--runDir",default='../../ZH',help="Directory with ZH.py and its input files (--local).")
+    parser.add_argument("--dryRun",action='store_true',help="Only list the jobs that would be resubmitted.")
+    return parser.parse_args()
+
+args = getArgs() 
+statusList = args.status.split(',')
+cwd = os.getcwd()
+
+localJobs = []
+for pattern in args.dirs :
+    for dirName in sorted(glob.glob(pattern)) :
+        if not os.path.isfile(os.path.join(dirName,'manifest.csv')) : continue
+        manifest = jobManifest.jobManifest(dirName)
+        manifest.update()
+        manifest.write()
+        manifest.printSummary()
+        jobs = manifest.getJobs(statusList)
+        for job in jobs : print("  {0:s} status={1:s} exitCode={2:d}".format(job['name'],job['status'],job['exitCode']))
+        if args.dryRun or len(jobs) < 1 : continue
+
+        if args.local :
+            localJobs += localRunner.makeJobsFromManifest(manifest,statusList,dataType=args.dataType,year=args.year,redirector=args.redirector)
+            continue
+
+        os.chdir(dirName)
+        for job in jobs :
+            if os.path.isfile(job['name'] + '.status') : os.remove(job['name'] + '.status')
+            command = "condor_submit {0:s}.jdl".format(job['name'])
+            print("Command={0:s}".format(command))
+            os.system(command)
+        os.chdir(cwd)
+
+if len(localJobs) > 0 :
+    runner = localRunner.localRunner(args.runDir,nWorkers=args.nWorkers,nRetries=args.nRetries)
+    localJobs = runner.run(localJobs)
+    nFailed = runner.printSummary(localJobs)
+    sys.exit(1 if nFailed > 0 else 0)
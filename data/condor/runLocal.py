@@ -0,0 +1,47 @@
+# run the data preselection jobs on the local machine rather than on condor.
+# The output goes to {nickName}/{nickName}_{NNN}.ntup, the same names as the condor jobs.
+
+import os
+import sys
+sys.path.insert(1,'../../funcs/')
+import localRunner
+import jobPlanner
+
+def getArgs() :
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f","--inFile",default='datasets.txt',help="Input file name.") 
+    parser.add_argument("-y","--year",default=2017,type=int,help="Data taking period, 2016, 2017 or 2018")
+    parser.add_argument("--nickNames",default='',help="Comma separated list of data sets to run (default all).")
+    parser.add_argument("--fileList",default='',help="File list (name and optionally number of entries per line) to use instead of a DAS query (requires a single nickName).")
+    parser.add_argument("-j","--nWorkers",default=4,type=int,help="Number of jobs to run in parallel.")
+    parser.add_argument("-r","--nRetries",default=1,type=int,help="Number of times a failed job is retried.")
+    parser.add_argument("--redirector",default=localRunner.xrdPrefix,help="XRootD redirector used to read the input.")
+    parser.add_argument("--runDir",default='../../ZH',help="Directory with ZH.py and its input files.")
+    parser.add_argument("-e","--eventsPerJob",default=0,type=int,help="Split or pack the files into jobs of about this many events (0 for one job per file).")
+    parser.add_argument("--maxFiles",default=0,type=int,help="Maximum number of files per data set (0 for all).")
+    return parser.parse_args()
+
+args = getArgs() 
+selected = [nn for nn in args.nickNames.split(',') if len(nn) > 0]
+if len(args.fileList) > 0 and len(selected) != 1 :
+    print("***In runLocal.py: --fileList needs exactly one data set in --nickNames")
+    exit(1)
+
+jobs = []
+for line in open(args.inFile,'r').readlines() :
+    dataSet = line.strip() 
+    if len(dataSet) < 2 : continue
+    nickName = dataSet.split('/')[1] + '_' + dataSet.split('/')[2].split('-')[0] 
+    if len(selected) > 0 and not nickName in selected : continue
+    if len(args.fileList) > 0 : files, entries = jobPlanner.readFileList(args.fileList)
+    else : files, entries = jobPlanner.getFileEntries(dataSet)
+    if args.maxFiles > 0 : files, entries = files[:args.maxFiles], entries[:args.maxFiles]
+    plan = jobPlanner.planJobs(files,entries,args.eventsPerJob)
+    jobPlanner.printPlan(nickName,files,plan)
+    jobs += localRunner.makeJobs(nickName,plan,nickName,dataType='Data',year=args.year,redirector=args.redirector)
+
+runner = localRunner.localRunner(args.runDir,nWorkers=args.nWorkers,nRetries=args.nRetries)
+jobs = runner.run(jobs)
+nFailed = runner.printSummary(jobs)
+sys.exit(1 if nFailed > 0 else 0)
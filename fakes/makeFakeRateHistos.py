@@ -2,8 +2,14 @@
 # estimate fake rate for irreducilble backgrounds 
 #
 
-from ROOT import TFile, TTree, TH1D, TCanvas, TLorentzVector, TLatex, kRed
+import sys
+import numpy as np
+from ROOT import TFile, TTree, TH1D, TCanvas, TLatex, kRed
 import tdrstyle 
+sys.path.insert(1,'../funcs/')
+import generalFunctions as GF
+import histoTools
+import arrayReader
 
 def getArgs() :
     import argparse
@@ -12,38 +18,147 @@ def getArgs() :
     parser.add_argument("-f","--inFileName",default='./VBF_sync_input.root',help="File to be analyzed.")
     parser.add_argument("-y","--year",default=2017,type=int,help="Year for data.")
     parser.add_argument("-l","--LTcut",default=80.,type=float,help="LT cut")
+    parser.add_argument("--cacheDir",default='',help="Directory for the per-sample histogram cache (no cache if empty).")
+    parser.add_argument("--checksum",action='store_true',help="Key the cache on file checksums instead of size and mtime.")
     return parser.parse_args()
 
-class dupeDetector() :
+def getLegacyMt(pt, lepMass, met) :
+    # (lep + ptMiss).Mt() for the TLorentzVectors used before, with both vectors at eta = 0.
+    # TLorentzVector::Mt() is sqrt(E*E - pz*pz), which for pz = 0 is the summed energy
+    # E(lep) + met, whatever the angle.  This is NOT the usual lepton-MET mT: the Mt > 40 cut
+    # of fillData() is defined with it, and replacing it by the real mT changes that cut.
+    return np.sqrt(pt*pt + lepMass*lepMass) + met
+
+def processData(inFileName) :
+    # return the same-sign, nbtag = 0 events of one data set as a dictionary of arrays.
+    # Duplicate events are removed by the caller, since they span data sets.
+    print("Opening {0:s}".format(inFileName)) 
+    a = arrayReader.getArrays(inFileName,dataBranches)
+
+    # impose any common selection criteria here
+    # include only same sign events 
+    keep = (a['q_1']*a['q_2'] >= 0.) & (a['nbtag'] <= 0)
+    a = dict([(b,a[b][keep]) for b in a])
+
+    tauMode = tauModes[a['cat']]
+    lepMass = np.where(tauMode == 'mt',0.102,0.000511)
+    a['Mt'] = np.where((tauMode == 'et') | (tauMode == 'mt'),
+                       getLegacyMt(a['pt_1'],lepMass,a['met']),0.)
+    return dict([(b,a[b]) for b in recordBranches])
+
+def fillData(a) :
+    # skip duplicate events
+    isDupe = DD.checkArrays(a['run'],a['evt'])
+    a = dict([(b,a[b][~isDupe]) for b in a])
+    tauMode = tauModes[a['cat']]
+    pt_1, pt_2 = a['pt_1'], a['pt_2']
+    preCut = preCutOff | (a['Mt'] > 40.)
+    tight_2 = a['iso_2_ID'] > 15
+
+    # apply transverse mass cut on electron-MET system
+    et = (tauMode == 'et')
+    hBase['e_et'].fill(pt_1[et & preCut])
+    hBase['t_et'].fill(pt_2[et])
+    hTight['e_et'].fill(pt_1[et & preCut & (a['iso_1'] > 0.5)])
+    hTight['t_et'].fill(pt_2[et & tight_2])
+
+    # apply transverse mass cut on muon-MET system
+    mt = (tauMode == 'mt')
+    hBase['m_mt'].fill(pt_1[mt & preCut])
+    hBase['t_mt'].fill(pt_2[mt])
+    hTight['m_mt'].fill(pt_1[mt & preCut & (a['iso_1'] < 0.25) & (a['iso_1_ID'] > 0)])
+    hTight['t_mt'].fill(pt_2[mt & tight_2])
+
+    tt = (tauMode == 'tt')
+    if not preCutOff : tt &= (pt_1 + pt_2 >= args.LTcut)
+    hBase['t1_tt'].fill(pt_1[tt])
+    hBase['t2_tt'].fill(pt_2[tt])
+    hTight['t1_tt'].fill(pt_1[tt & (a['iso_1_ID'] > 15)])
+    hTight['t2_tt'].fill(pt_2[tt & tight_2])
+    return
+
+def processMC(nickName, inFileName) :
+    # return the prompt base and tight histograms for one MC sample 
+    print("Opening {0:s}".format(inFileName)) 
+    a = arrayReader.getArrays(inFileName,mcBranches)
+    nentries = len(a['cat'])
+    
+    hBasePrompt, hTightPrompt = {}, {}
+    for h in hList :
+        hBasePrompt[h] = histoTools.npHisto(10,0.,100.)
+        hTightPrompt[h] = histoTools.npHisto(10,0.,100.)
+
+    # impose any common selection criteria here
+    # include only same sign events 
+    keep = (a['q_1']*a['q_2'] >= 0.) & (a['pt_1'] + a['pt_2'] <= args.LTcut)
+    a = dict([(b,a[b][keep]) for b in a])
+
+    # stitch the inclusive and jet-binned DYJets and WJets samples
+    sw = np.full(len(a['cat']),sampleWeight[nickName])
+    nJetNames = []
+    if nickName == 'DYJetsToLL' : nJetNames = ['DY{0:d}JetsToLL'.format(i) for i in range(1,5)]
+    if nickName == 'WJetsToLNu' : nJetNames = ['W{0:d}JetsToLNu'.format(i) for i in range(1,4)]
+    for i, nn in enumerate(nJetNames) :
+        sw[a['LHE_Njets'] == i+1] = sampleWeight[nn]
+    weight = a['weight']*sw
+
+    tauMode = tauModes[a['cat']]
+    pt_1, pt_2 = a['pt_1'], a['pt_2']
+    prompt_1 = (a['gen_match_1'] == 1) | (a['gen_match_1'] == 15)
+    tau_1, tau_2 = (a['gen_match_1'] == 5), (a['gen_match_2'] == 5)
+    tight_2 = a['iso_2_ID'] > 15
     
-    def __init__(self):
-        self.nCalls = 0 
-        self.runEventList = []
-
-    def checkEvent(self,entry) :
-        self.nCalls += 1 
-        runEvent = "{0:d}:{1:d}".format(entry.run,entry.evt)
-        if runEvent in self.runEventList :
-            #print("Event in list: runEventList={0:s}".format(str(self.runEventList)))
-            return True
-        else :
-            self.runEventList.append(runEvent)
-            #print("New event: runEventList={0:s}".format(str(self.runEventList)))
-            return False
-
-    def printSummary(self) :
-        print("Duplicate Event Summary: Calls={0:d} Unique Events={1:d}".format(self.nCalls,len(self.runEventList)))
-        return
+    for lep, mode, tight_1 in [('e','et',a['iso_1'] > 0.5), ('m','mt',(a['iso_1'] < 0.25) & (a['iso_1_ID'] > 0))] :
+        inMode = (tauMode == mode)
+        sel = inMode & prompt_1
+        hBasePrompt[lep+'_'+mode].fill(pt_1[sel],weight[sel])
+        sel &= tight_1
+        hTightPrompt[lep+'_'+mode].fill(pt_1[sel],weight[sel])
+        sel = inMode & tau_2
+        hBasePrompt['t_'+mode].fill(pt_2[sel],weight[sel])
+        sel &= tight_2
+        hTightPrompt['t_'+mode].fill(pt_2[sel],weight[sel])
+
+    tt = (tauMode == 'tt')
+    sel = tt & tau_1
+    hBasePrompt['t1_tt'].fill(pt_1[sel],weight[sel])
+    sel &= (a['iso_1_ID'] > 15)
+    hTightPrompt['t1_tt'].fill(pt_1[sel],weight[sel])
+    sel = tt & tau_2
+    hBasePrompt['t2_tt'].fill(pt_2[sel],weight[sel])
+    sel &= tight_2
+    hTightPrompt['t2_tt'].fill(pt_2[sel],weight[sel])
+
+    return nentries, hBasePrompt, hTightPrompt
+
+def getWeightKey(nickName) :
+    # the sample weights are folded into the histograms, so they are part of the cache key 
+    nns = [nickName]
+    if nickName == 'DYJetsToLL' : nns += ['DY{0:d}JetsToLL'.format(i) for i in range(1,5)]
+    if nickName == 'WJetsToLNu' : nns += ['W{0:d}JetsToLNu'.format(i) for i in range(1,4)]
+    return ','.join(["{0:.9e}".format(sampleWeight[nn]) for nn in nns])
 
 args = getArgs()
 era = str(args.year)
 nBins, xMin, xMax = 10, 0., 200.
 lumi = 1000.*41.8 
-cats = { 1:'eeet', 2:'eemt', 3:'eett', 4:'mmet', 5:'mmmt', 6:'mmtt', 7:'et', 8:'mt', 9:'tt' }
+#cats = { 1:'eeet', 2:'eemt', 3:'eett', 4:'mmet', 5:'mmmt', 6:'mmtt', 7:'et', 8:'mt', 9:'tt' }
+cats = { 1:'eeet', 2:'eemt', 3:'eett', 4:'eeem', 5:'mmet', 6:'mmmt', 7:'mmtt', 8:'mmem', 9:'et', 10:'mt', 11:'tt' }
+# tau-pair mode ('et', 'mt', 'tt' or 'em') indexed by the cat number; em events are not used 
+tauModes = np.array(['']+[cats[i][-2:] for i in range(1,len(cats)+1)])
+dataBranches = ['run','evt','cat','q_1','q_2','nbtag','pt_1','pt_2','met','iso_1','iso_1_ID','iso_2_ID']
+recordBranches = ['run','evt','cat','pt_1','pt_2','Mt','iso_1','iso_1_ID','iso_2_ID']
+mcBranches = ['cat','q_1','q_2','pt_1','pt_2','weight','LHE_Njets','gen_match_1','gen_match_2','iso_1','iso_1_ID','iso_2_ID']
 preCutOff = False  
 
 # use this utility class to screen out duplicate events
-DD = dupeDetector()
+DD = GF.dupeDetector(evtName='evt')
+
+# samples whose input and selection are unchanged are taken from the cache 
+cache = None
+if len(args.cacheDir) > 0 :
+    selection = { 'year':args.year, 'LTcut':args.LTcut, 'preCutOff':preCutOff }
+    cache = histoTools.histoCache(args.cacheDir,selection,codeFiles=[__file__,histoTools.__file__.replace('.pyc','.py'),arrayReader.__file__.replace('.pyc','.py')],useChecksum=args.checksum)
 
 # open an output file
 fOut = TFile('FakeRates.root', 'recreate' )
@@ -52,72 +167,20 @@ fOut = TFile('FakeRates.root', 'recreate' )
 hBase, hTight = {}, {}
 hList = ['e_et','m_mt','t_et','t_mt','t1_tt','t2_tt']
 for h in hList :
-    hName = "{0:s}Base".format(h)
-    hBase[h] = TH1D(hName,hName,10,0.,100.)
-    hName = "{0:s}Tight".format(h)
-    hTight[h] = TH1D(hName,hName,10,0.,100.)
+    hBase[h] = histoTools.npHisto(10,0.,100.)
+    hTight[h] = histoTools.npHisto(10,0.,100.)
     
 # loop over the data to fill the histograms
-for era in ['2017B','2017C','2017D','2017E','2017F'] :
+for dataEra in ['2017B','2017C','2017D','2017E','2017F'] :
     for dataset in ['SingleElectron','SingleMuon','DoubleEG','DoubleMuon'] :
-        inFileName = './data/{0:s}_Run{1:s}/{0:s}_Run{1:s}.root'.format(dataset,era)
-        print("Opening {0:s}".format(inFileName)) 
-        inFile = TFile.Open(inFileName)
-        inFile.cd()
-        inTree = inFile.Get("Events")
-        nentries = inTree.GetEntries()
-        for i, e in enumerate(inTree) :
-
-            # impose any common selection criteria here
-            # include only same sign events 
-            if e.q_1*e.q_2 < 0. : continue
-            if e.nbtag > 0 : continue
-            
-            # skip duplicate events
-            if DD.checkEvent(e) : continue 
-
-            cat = cats[e.cat]
-            if cat[2:] == 'et' :
-                # apply transverse mass cut on electron-MET system
-                et = TLorentzVector()
-                et.SetPtEtaPhiM(e.pt_1,0.,e.phi_1,0.000511)
-                ptMiss = TLorentzVector() 
-                ptMiss.SetPtEtaPhiM(e.met,0.,e.metphi,0.)
-                eMET = et + ptMiss
-                preCut = preCutOff or eMET.Mt() > 40.  
-                if preCut : hBase['e_et'].Fill(e.pt_1)
-                hBase['t_et'].Fill(e.pt_2)
-                if e.iso_1 > 0.5 :
-                    if preCut : hTight['e_et'].Fill(e.pt_1)
-                if e.iso_2_ID > 15 :
-                    hTight['t_et'].Fill(e.pt_2)
-                    
-            elif cat[2:] == 'mt' :
-                # apply transverse mass cut on muon-MET system
-                mut = TLorentzVector()
-                mut.SetPtEtaPhiM(e.pt_1,0.,e.phi_1,0.102)
-                ptMiss = TLorentzVector() 
-                ptMiss.SetPtEtaPhiM(e.met,0.,e.metphi,0.)
-                muMET = mut + ptMiss
-                preCut = preCutOff or muMET.Mt() > 40. 
-                if preCut : hBase['m_mt'].Fill(e.pt_1)
-                hBase['t_mt'].Fill(e.pt_2)
-                if e.iso_1 < 0.25 and e.iso_1_ID > 0 : 
-                    if preCut : hTight['m_mt'].Fill(e.pt_1)
-                if e.iso_2_ID > 15 :
-                    hTight['t_mt'].Fill(e.pt_2)
-
-            else :
-                H_LT = e.pt_1 + e.pt_2
-                if not preCutOff and H_LT < args.LTcut : continue
-                hBase['t1_tt'].Fill(e.pt_1)
-                hBase['t2_tt'].Fill(e.pt_2)
-                if e.iso_1_ID > 15 :
-                    hTight['t1_tt'].Fill(e.pt_1)
-                if e.iso_2_ID > 15 : 
-                    hTight['t2_tt'].Fill(e.pt_2)
-            
-        inFile.Close()
+        nickName = '{0:s}_Run{1:s}'.format(dataset,dataEra)
+        inFileName = './data/{0:s}/{0:s}.root'.format(nickName)
+        arrays = None
+        if cache is not None : arrays = cache.get(nickName,inFileName)
+        if arrays is None :
+            arrays = processData(inFileName)
+            if cache is not None : cache.put(nickName,inFileName,arrays)
+        fillData(arrays)
 
 DD.printSummary()
 
@@ -155,63 +218,32 @@ for i in range(1,4) :
 # create histograms
 hBasePrompt, hTightPrompt = {}, {}
 for h in hList :
-    hName = "{0:s}BasePrompt".format(h)
-    hBasePrompt[h] = TH1D(hName,hName,10,0.,100.)
-    hName = "{0:s}TightPrompt".format(h)
-    hTightPrompt[h] = TH1D(hName,hName,10,0.,100.)
+    hBasePrompt[h] = histoTools.npHisto(10,0.,100.)
+    hTightPrompt[h] = histoTools.npHisto(10,0.,100.)
 
 for nickName in nickNames :
     inFileName = './MC/{0:s}/{0:s}.root'.format(nickName)
-    print("Opening {0:s}".format(inFileName)) 
-    inFile = TFile.Open(inFileName)
-    inFile.cd()
-    inTree = inFile.Get("Events")
-    nentries = inTree.GetEntries()
-    
+    result = None
+    if cache is not None : result = cache.get(nickName,inFileName,extra=getWeightKey(nickName))
+    if result is None :
+        result = processMC(nickName,inFileName)
+        if cache is not None : cache.put(nickName,inFileName,result,extra=getWeightKey(nickName))
+    nentries, hBP, hTP = result
+    for h in hList :
+        hBasePrompt[h].add(hBP[h])
+        hTightPrompt[h].add(hTP[h])
+
     nEvents, totalWeight = 0, 0.
-    sWeight = sampleWeight[nickName]
-    DYJets = (nickName == 'DYJetsToLL')
-    WJets  = (nickName == 'WJetsToLNu')
-        
-    for i, e in enumerate(inTree) :
-        # impose any common selection criteria here
-        # include only same sign events 
-        if e.q_1*e.q_2 < 0. : continue
-        H_LT = e.pt_1 + e.pt_2
-        if H_LT > args.LTcut : continue
-
-        sw = sWeight
-        if e.LHE_Njets > 0 :
-            if DYJets : sw = sampleWeight['DY{0:d}JetsToLL'.format(e.LHE_Njets)]
-            if WJets  : sw = sampleWeight['W{0:d}JetsToLNu'.format(e.LHE_Njets)] 
-        weight = e.weight*sw
-        
-        cat = cats[e.cat]
-        if cat[2:] == 'et' :
-            if e.gen_match_1 == 1 or e.gen_match_1 == 15 :
-                hBasePrompt['e_et'].Fill(e.pt_1,weight)
-                if e.iso_1 > 0.5 : hTightPrompt['e_et'].Fill(e.pt_1,weight)
-            if e.gen_match_2 == 5 :
-                hBasePrompt['t_et'].Fill(e.pt_2,weight)
-                if e.iso_2_ID > 15 : hTightPrompt['t_et'].Fill(e.pt_2,weight)
-        elif cat[2:] == 'mt' :
-            if e.gen_match_1 == 1 or e.gen_match_1 == 15 :
-                hBasePrompt['m_mt'].Fill(e.pt_1,weight)
-                if e.iso_1 < 0.25 and e.iso_1_ID > 0 : hTightPrompt['m_mt'].Fill(e.pt_1,weight)
-            if e.gen_match_2 == 5 :
-                hBasePrompt['t_mt'].Fill(e.pt_2,weight)
-                if e.iso_2_ID > 15 : hTightPrompt['t_mt'].Fill(e.pt_2,weight)
-        else :
-            if e.gen_match_1 == 5 :
-                hBasePrompt['t1_tt'].Fill(e.pt_1,weight)
-                if e.iso_1_ID > 15 : hTightPrompt['t1_tt'].Fill(e.pt_1,weight)
-            if e.gen_match_2 == 5 :
-                hBasePrompt['t2_tt'].Fill(e.pt_2,weight)
-                if e.iso_2_ID > 15 : hTightPrompt['t2_tt'].Fill(e.pt_2,weight)
-
- 
     print("{0:30s} {1:7d} {2:10.6f} {3:5d} {4:8.3f}".format(nickName,nentries,sampleWeight[nickName],nEvents,totalWeight))
-    inFile.Close()
+
+if cache is not None : cache.printSummary()
+
+fOut.cd()
+for h in hList :
+    hBase[h] = hBase[h].toTH1D("{0:s}Base".format(h))
+    hTight[h] = hTight[h].toTH1D("{0:s}Tight".format(h))
+    hBasePrompt[h] = hBasePrompt[h].toTH1D("{0:s}BasePrompt".format(h))
+    hTightPrompt[h] = hTightPrompt[h].toTH1D("{0:s}TightPrompt".format(h))
 
 fOut.cd()
 for h in hList :
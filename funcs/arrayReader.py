@@ -0,0 +1,66 @@
+# read TTree branches into numpy arrays for the columnar (vectorized) code paths
+#
+# uproot is used when it is available (both the uproot3 and the uproot4+ interfaces
+# are handled).   Otherwise the branches are read with ROOT's RDataFrame.AsNumpy().
+#
+# A variable length (jagged) branch such as Tau_pt is returned as the content of all its
+# entries concatenated, and getOffsets() of its counter (nTau) gives where each entry starts.
+
+import numpy as np
+
+try :
+    import uproot
+    uprootVersion = int(uproot.__version__.split('.')[0])
+except ImportError :
+    uproot, uprootVersion = None, 0
+
+def getNumEntries(inFileName, treeName='Events') :
+    if uproot is not None :
+        tree = uproot.open(inFileName)[treeName]
+        return int(tree.num_entries if uprootVersion >= 4 else tree.numentries)
+    from ROOT import TFile
+    inFile = TFile.Open(inFileName)
+    nentries = inFile.Get(treeName).GetEntries()
+    inFile.Close()
+    return int(nentries)
+
+def toNumpy(x) :
+    # flat branches are returned as they are, jagged branches as their concatenated content
+    if hasattr(x,'offsets') and hasattr(x,'flatten') : return np.asarray(x.flatten())    # uproot3 JaggedArray
+    x = np.asarray(x)
+    if x.dtype == object :
+        if len(x) < 1 : return np.zeros(0)
+        return np.concatenate([np.asarray(v) for v in x])
+    return x
+
+def getOffsets(counts) :
+    # offsets[i] is the position of the first object of entry i in the content of a jagged branch
+    return np.concatenate([[0],np.cumsum(counts)]).astype(np.int64)
+
+def getArrays(inFileName, branches, treeName='Events', entryStart=0, entryStop=None) :
+    """ arrayReader.getArrays(): return a dictionary of numpy arrays,
+                                 one per branch, for entries [entryStart,entryStop)
+    """
+    if entryStop is None or entryStop < 0 : entryStop = getNumEntries(inFileName,treeName)
+    if uproot is not None :
+        tree = uproot.open(inFileName)[treeName]
+        if uprootVersion >= 4 :
+            arrays = tree.arrays(branches,entry_start=entryStart,entry_stop=entryStop,library='np')
+        else :
+            arrays = tree.arrays(branches,entrystart=entryStart,entrystop=entryStop,namedecode='utf-8')
+        return dict([(b,toNumpy(arrays[b])) for b in branches])
+
+    import ROOT
+    df = ROOT.RDataFrame(treeName,inFileName)
+    if entryStart > 0 or entryStop < getNumEntries(inFileName,treeName) : df = df.Range(entryStart,entryStop)
+    arrays = df.AsNumpy(list(branches))
+    return dict([(b,toNumpy(arrays[b])) for b in branches])
+
+def iterateArrays(inFileName, branches, chunkSize=200000, treeName='Events', entryStart=0, entryStop=None) :
+    """ arrayReader.iterateArrays(): yield (entryStart, arrays) for successive
+                                     chunks of at most chunkSize entries
+    """
+    if entryStop is None or entryStop < 0 : entryStop = getNumEntries(inFileName,treeName)
+    for first in range(entryStart,entryStop,chunkSize) :
+        last = min(first+chunkSize,entryStop)
+        yield first, getArrays(inFileName,branches,treeName=treeName,entryStart=first,entryStop=last)
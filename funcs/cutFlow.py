@@ -0,0 +1,178 @@
+# cut flow bookkeeping that can be filled per event or per chunk and merged across jobs
+#
+# The number of events, the sum of weights and the sum of squared weights of each stage and
+# category are held in (stage x category) numpy arrays.   Stages keep the order in which they
+# are first counted.   The per event counts are summed in plain python lists, one per stage and
+# set of categories, and only added to the arrays (flush()) when the cut flow is read, merged or
+# written, so that counting in the event loop costs no more than the old counters.   A cut flow is written to a small JSON file ({job}.cutflow next to the
+# job output, see getFileName()), and the files of the jobs of a sample, or the cut flows
+# returned by worker processes, are added with add() or mergeFiles().
+
+import os
+import json
+import numpy as np
+
+def getFileName(outFileName) :
+    return os.path.splitext(outFileName)[0] + '.cutflow'
+
+class cutFlow() :
+
+    def __init__(self, cats=['all']) :
+        self.cats = list(cats)
+        self.catIndex = dict([(cat,i) for i, cat in enumerate(self.cats)])
+        self.stages, self.stageIndex = [], {}
+        self.n = np.zeros((0,len(self.cats)),dtype=np.int64)
+        self.sumw = np.zeros((0,len(self.cats)))
+        self.sumw2 = np.zeros((0,len(self.cats)))
+        self.catSets = {}
+        self.pending = {}
+
+    def addStage(self, stage, position=None) :
+        if position is None : position = len(self.stages)
+        self.stages.insert(position,stage)
+        self.stageIndex = dict([(s,i) for i, s in enumerate(self.stages)])
+        self.n = np.insert(self.n,position,0,axis=0)
+        self.sumw = np.insert(self.sumw,position,0.,axis=0)
+        self.sumw2 = np.insert(self.sumw2,position,0.,axis=0)
+        return self.stageIndex[stage]
+
+    def getCats(self, cats) :
+        # column(s) of the given categories; None stands for all of them
+        if cats is None : return slice(None)
+        if isinstance(cats,str) : return self.catIndex[cats]
+        key = tuple(cats)
+        try :
+            return self.catSets[key]
+        except KeyError :
+            self.catSets[key] = np.array([self.catIndex[cat] for cat in cats],dtype=np.int64)
+            return self.catSets[key]
+
+    def count(self, stage, mask=None, weight=None, cats=None, n=1) :
+        """ cutFlow.count(): count n events (per event code) or the events of a chunk
+                             passing mask (columnar code) at stage, in the given categories
+                             (a name or a list of names, all if None).   weight is a number,
+                             or with mask an array of per-event weights.
+        """
+        if mask is None :
+            w = 1. if weight is None else float(weight)
+            key = (stage,cats if cats is None or isinstance(cats,str) else tuple(cats))
+            try :
+                counts = self.pending[key]
+            except KeyError :
+                if not stage in self.stageIndex : self.addStage(stage)
+                counts = self.pending[key] = [0,0.,0.]
+            counts[0] += n
+            counts[1] += n*w
+            counts[2] += n*w*w
+            return
+        try :
+            iStage = self.stageIndex[stage]
+        except KeyError :
+            iStage = self.addStage(stage)
+        iCat = self.getCats(cats)
+        mask = np.asarray(mask,dtype=bool)
+        if weight is None :
+            nPass = int(np.count_nonzero(mask))
+            sumw, sumw2 = float(nPass), float(nPass)
+        else :
+            w = np.broadcast_to(np.asarray(weight,dtype=float),mask.shape)[mask]
+            nPass, sumw, sumw2 = len(w), np.sum(w), np.sum(w*w)
+        self.n[iStage,iCat] += nPass
+        self.sumw[iStage,iCat] += sumw
+        self.sumw2[iStage,iCat] += sumw2
+        return
+
+    def flush(self) :
+        # add the per event counts to the arrays
+        for (stage, cats), counts in self.pending.items() :
+            iStage, iCat = self.stageIndex[stage], self.getCats(cats)
+            self.n[iStage,iCat] += counts[0]
+            self.sumw[iStage,iCat] += counts[1]
+            self.sumw2[iStage,iCat] += counts[2]
+        self.pending = {}
+        return self
+
+    def add(self, other) :
+        # add the counts of another cut flow; stages it has in addition are put after the
+        # last stage that precedes them there and is known here
+        self.flush()
+        other.flush()
+        for cat in other.cats :
+            if not cat in self.catIndex :
+                self.cats.append(cat)
+                self.catIndex[cat] = len(self.cats) - 1
+                for name in ['n','sumw','sumw2'] :
+                    setattr(self,name,np.concatenate([getattr(self,name),np.zeros((len(self.stages),1),dtype=getattr(self,name).dtype)],axis=1))
+        self.catSets = {}
+        position = 0
+        for stage in other.stages :
+            if stage in self.stageIndex :
+                position = self.stageIndex[stage] + 1
+            else :
+                self.addStage(stage,position)
+                position += 1
+        rows = np.array([self.stageIndex[s] for s in other.stages],dtype=np.int64)
+        cols = np.array([self.catIndex[c] for c in other.cats],dtype=np.int64)
+        if len(rows) > 0 :
+            self.n[np.ix_(rows,cols)] += other.n
+            self.sumw[np.ix_(rows,cols)] += other.sumw
+            self.sumw2[np.ix_(rows,cols)] += other.sumw2
+        return self
+
+    def getCount(self, stage, cat=None, weighted=False) :
+        self.flush()
+        if not stage in self.stageIndex : return 0
+        if cat is None : cat = self.cats[0]
+        counts = self.sumw if weighted else self.n
+        return counts[self.stageIndex[stage],self.catIndex[cat]]
+
+    def printSummary(self, cat=None, weighted=False) :
+        # as generalFunctions.cutCounter.printSummary(), with the sum of weights if weighted
+        self.flush()
+        if cat is None : cat = self.cats[0]
+        j = self.catIndex[cat]
+        nLast = 0.
+        for i, nn in enumerate(self.stages) :
+            fraction = 1.0
+            if nLast > 0. : fraction = self.n[i,j]/nLast
+            nLast = float(self.n[i,j])
+            sFrac = '   N/A'
+            if fraction < 1.0 : sFrac = "{0:6.1f}%".format(100.*fraction)
+            if fraction < 0.01 : sFrac = "{0:6.3f}%".format(100.*fraction)
+            line = "{0:16s}{1:6d} {2:s}".format(nn,int(self.n[i,j]),sFrac)
+            if weighted : line += " {0:12.2f} +- {1:.2f}".format(self.sumw[i,j],np.sqrt(self.sumw2[i,j]))
+            print(line)
+        return
+
+    def toDict(self) :
+        self.flush()
+        return { 'cats':self.cats, 'stages':self.stages, 'n':self.n.tolist(),
+                 'sumw':self.sumw.tolist(), 'sumw2':self.sumw2.tolist() }
+
+    def write(self, fileName) :
+        # written to a temporary file first, as jobManifest.write()
+        with open(fileName + '.tmp','w') as f : json.dump(self.toDict(),f)
+        os.rename(fileName + '.tmp',fileName)
+        return
+
+def fromDict(d) :
+    cf = cutFlow(d['cats'])
+    for stage in d['stages'] : cf.addStage(stage)
+    nCats = len(cf.cats)
+    cf.n = np.array(d['n'],dtype=np.int64).reshape(-1,nCats)
+    cf.sumw = np.array(d['sumw'],dtype=float).reshape(-1,nCats)
+    cf.sumw2 = np.array(d['sumw2'],dtype=float).reshape(-1,nCats)
+    return cf
+
+def read(fileName) :
+    return fromDict(json.load(open(fileName,'r')))
+
+def mergeFiles(fileNames) :
+    """ cutFlow.mergeFiles(): return the sum of the cut flows in the given files, None if there are none
+    """
+    total = None
+    for fileName in fileNames :
+        cf = read(fileName)
+        if total is None : total = cf
+        else : total.add(cf)
+    return total
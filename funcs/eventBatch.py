@@ -0,0 +1,180 @@
+# a chunk of events held as numpy arrays, shared by the columnar and the per-event code
+#
+# The branches are those of arrayReader.getArrays(): one value per event for the flat branches
+# (run, MET_pt, HLT_IsoMu27, ...), and for the branches of a collection (Tau_pt, Tau_eta, ...)
+# the objects of all events one after the other, with the n<Collection> counter giving the
+# number of objects of each event.   An eventBatch can be used wherever such a dictionary of
+# arrays is expected (b['Tau_pt'], 'nTau' in b), and it computes the offsets, the event of each
+# object and its index within the event once per collection; getOffsets(), getEventIndex() and
+# getLocalIndex() below take either, so the selection modules share them without recomputing,
+# as they share getDR().
+# slice() gives a range of events as views of the same arrays, select() copies the events that
+# pass a mask, and eventView reads one event at a time as a PyROOT TTree does (e.Tau_pt[j]), so
+# that the per-event code of tauFun.py and outTuple.py can run on the same arrays.
+
+import numpy as np
+import arrayReader
+
+# nanoAOD UChar_t branches, which PyROOT returns as characters (hence the ord() in tauFun.py)
+charBranches = ['Electron_lostHits','Electron_genPartFlav','Muon_genPartFlav','Tau_idAntiEle','Tau_idAntiMu',
+                'Tau_idMVAoldDM2017v2','Tau_idMVAnewDM2017v2','Tau_idMVAoldDMdR032017v2','Tau_genPartFlav','LHE_Njets']
+
+def getCounters(a) :
+    # the counter (e.g. nTau) of each jagged branch (e.g. Tau_pt)
+    counters = {}
+    for b in a.keys() :
+        collection = b.split('_')[0]
+        if '_' in b and 'n'+collection in a : counters[b] = 'n'+collection
+    return counters
+
+class eventBatch() :
+
+    def __init__(self, arrays, first=0) :
+        self.arrays = arrays
+        self.first = first      # entry number in the input of the first event
+        self.counters = getCounters(arrays)
+        flat = [b for b in arrays.keys() if not b in self.counters]
+        self.nEvents = len(arrays[flat[0]]) if len(flat) > 0 else 0
+        self.cache = {}
+
+    # the dictionary of arrays
+    def __getitem__(self, b) :
+        return self.arrays[b]
+
+    def __setitem__(self, b, x) :
+        self.arrays[b] = x
+        self.counters = getCounters(self.arrays)
+        if b[0] == 'n' : self.cache = {}
+
+    def __contains__(self, b) :
+        return b in self.arrays
+
+    def __len__(self) :
+        return self.nEvents
+
+    def keys(self) :
+        return self.arrays.keys()
+
+    def getCollections(self) :
+        return sorted(set([b.split('_')[0] for b in self.counters]))
+
+    def getCounts(self, collection) :
+        return np.asarray(self.arrays['n'+collection],dtype=np.int64)
+
+    def getCached(self, name, collection, func) :
+        key = (name,collection)
+        if not key in self.cache : self.cache[key] = func()
+        return self.cache[key]
+
+    def getOffsets(self, collection) :
+        # offsets[i] is the position of the first object of event i in the content
+        return self.getCached('offsets',collection,lambda : arrayReader.getOffsets(self.getCounts(collection)))
+
+    def getEventIndex(self, collection) :
+        # the event (within the batch) of each object
+        counts = self.getCounts(collection)
+        return self.getCached('event',collection,lambda : np.repeat(np.arange(len(counts)),counts))
+
+    def getLocalIndex(self, collection) :
+        # the index of each object within its event, as used by the per-event code
+        def local() :
+            event = self.getEventIndex(collection)
+            return np.arange(len(event)) - self.getOffsets(collection)[:-1][event]
+        return self.getCached('local',collection,local)
+
+    def getObjects(self, b, i) :
+        # the objects of event i of the jagged branch b (a view)
+        off = self.getOffsets(self.counters[b][1:])
+        return self.arrays[b][off[i]:off[i+1]]
+
+    def slice(self, first, last) :
+        """ eventBatch.slice(): events [first,last) as a new eventBatch whose arrays are views of these
+        """
+        arrays = {}
+        for b, x in self.arrays.items() :
+            if b in self.counters :
+                off = self.getOffsets(self.counters[b][1:])
+                arrays[b] = x[off[first]:off[last]]
+            else :
+                arrays[b] = x[first:last]
+        return eventBatch(arrays,self.first+first)
+
+    def select(self, mask) :
+        """ eventBatch.select(): a new eventBatch with (copies of) the events that pass mask
+        """
+        mask = np.asarray(mask,dtype=bool)
+        arrays = {}
+        for b, x in self.arrays.items() :
+            if b in self.counters :
+                arrays[b] = x[mask[self.getEventIndex(self.counters[b][1:])]]
+            else :
+                arrays[b] = x[mask]
+        return eventBatch(arrays,self.first)
+
+def getOffsets(a, collection) :
+    # the offsets of a collection of an eventBatch, or of a dictionary of arrays
+    if isinstance(a,eventBatch) : return a.getOffsets(collection)
+    return arrayReader.getOffsets(a['n'+collection])
+
+def getEventIndex(a, collection) :
+    if isinstance(a,eventBatch) : return a.getEventIndex(collection)
+    counts = np.asarray(a['n'+collection],dtype=np.int64)
+    return np.repeat(np.arange(len(counts)),counts)
+
+def getLocalIndex(a, collection) :
+    if isinstance(a,eventBatch) : return a.getLocalIndex(collection)
+    event = getEventIndex(a,collection)
+    return np.arange(len(event)) - getOffsets(a,collection)[:-1][event]
+
+def getDR(eta1, phi1, eta2, phi2) :
+    # DR of objects given as arrays, as tauFun.DRobj() but with dPhi taken in [0,pi]
+    dPhi = np.abs(phi2-phi1)
+    dPhi = np.minimum(dPhi,2.*np.pi-dPhi)
+    return np.sqrt(dPhi**2 + (eta2-eta1)**2)
+
+def iterateBatches(inFileName, branches, chunkSize=200000, treeName='Events', entryStart=0, entryStop=None) :
+    """ eventBatch.iterateBatches(): yield an eventBatch for successive chunks of at most chunkSize
+                                     entries, as arrayReader.iterateArrays()
+    """
+    for first, arrays in arrayReader.iterateArrays(inFileName,branches,chunkSize=chunkSize,treeName=treeName,
+                                                   entryStart=entryStart,entryStop=entryStop) :
+        yield eventBatch(arrays,first)
+
+class eventView() :
+    """ eventBatch.eventView: event i of an eventBatch (or of a dictionary of arrays), read as with a
+                              PyROOT TTree, e.g. e = eventView(b); e.GetEntry(i); e.nTau, e.Tau_pt[j], ord(e.Tau_idAntiMu[j])
+    """
+
+    def __init__(self, batch) :
+        if not isinstance(batch,eventBatch) : batch = eventBatch(batch)
+        self._batch, self._arrays, self._offsets = batch, {}, {}
+        for b in batch.keys() :
+            x = batch[b]
+            # UChar_t branches as one character strings, as PyROOT gives them (chr(0) included)
+            if b in charBranches : x = np.array([chr(v) for v in np.asarray(x,dtype=np.uint8).tolist()],dtype=object)
+            self._arrays[b] = x
+            if b in batch.counters : self._offsets[b] = batch.getOffsets(batch.counters[b][1:])
+        self._names = list(self._arrays.keys())
+        self._entry = -1
+
+    def GetEntry(self, i) :
+        for b in self._names :
+            if b in self.__dict__ : del self.__dict__[b]
+        self._entry = i
+        return 1
+
+    def GetEntries(self) :
+        return len(self._batch)
+
+    def __getattr__(self, b) :
+        # branches are looked up on first use in each entry
+        if b.startswith('_') or not b in self._arrays : raise AttributeError(b)
+        i = self._entry
+        if b in self._offsets :
+            off = self._offsets[b]
+            value = self._arrays[b][off[i]:off[i+1]]
+        else :
+            value = self._arrays[b][i]
+            if not b in charBranches : value = value.item()
+        self.__dict__[b] = value
+        return value
@@ -0,0 +1,125 @@
+# binned fake rates for the data-driven reducible background estimate
+#
+# The rates measured by fakes/makeFakeRateHistos.py are read once from FakeRates.root
+# into numpy arrays, so that the per-leg weights w = f/(1-f) of the application region
+# can be evaluated for whole arrays of events without any per-event ROOT calls.
+
+import hashlib
+import numpy as np
+
+class fakeRateLookup() :
+    # For each leg (e_et, m_mt, t_et, t_mt, t1_tt, t2_tt) the rate is taken from
+    #   {leg}Ratio            a TH1 in pt or a TH2 in pt (x) and |eta| (y), if present
+    # and otherwise from the prompt-subtracted ratio
+    #   ({leg}Tight - {leg}TightPrompt) / ({leg}Base - {leg}BasePrompt)
+    # Bins with no usable measurement get the pt-integrated rate of that leg, sum(Tight)/sum(Base)
+    # of the (prompt-subtracted) histograms, or for a {leg}Ratio without them the mean of its usable bins.
+
+    def __init__(self, inFileName, legs=['e_et','m_mt','t_et','t_mt','t1_tt','t2_tt'],
+                 promptSubtract=True, maxRate=0.9) :
+        from ROOT import TFile
+        self.inFileName = inFileName
+        self.maxRate = maxRate
+        self.rates = {}
+        inFile = TFile.Open(inFileName)
+        if not inFile or inFile.IsZombie() :
+            print("Error in fakeRates.fakeRateLookup(): unable to open {0:s}".format(inFileName))
+            exit()
+        for leg in legs :
+            h = inFile.Get("{0:s}Ratio".format(leg))
+            if h :
+                self.rates[leg] = self.getRatioArrays(h,self.getBaseTight(inFile,leg,promptSubtract))
+            else :
+                self.rates[leg] = self.getBaseTightArrays(inFile,leg,promptSubtract)
+        inFile.Close()
+
+    def getEdges(self, axis) :
+        return np.array([axis.GetBinLowEdge(i) for i in range(1,axis.GetNbins()+2)])
+
+    def getRatioArrays(self, h, baseTight=None) :
+        # the pt-integrated rate is taken from the Base and Tight histograms if there are any
+        ptEdges = self.getEdges(h.GetXaxis())
+        if h.GetDimension() == 1 :
+            f = np.array([h.GetBinContent(i) for i in range(1,len(ptEdges))])
+            etaEdges = None
+        else :
+            etaEdges = self.getEdges(h.GetYaxis())
+            f = np.array([[h.GetBinContent(i,j) for j in range(1,len(etaEdges))] for i in range(1,len(ptEdges))])
+        if baseTight is not None : fAvg = self.getIntegratedRate(*baseTight[1:])
+        else : fAvg = np.mean(f[f > 0.]) if np.any(f > 0.) else 0.
+        return ptEdges, etaEdges, self.cleanRates(f,fAvg)
+
+    def getBaseTight(self, inFile, leg, promptSubtract) :
+        # pt edges and (prompt-subtracted) contents of {leg}Base and {leg}Tight, or None
+        hBase, hTight = inFile.Get("{0:s}Base".format(leg)), inFile.Get("{0:s}Tight".format(leg))
+        if not (hBase and hTight) : return None
+        ptEdges = self.getEdges(hBase.GetXaxis())
+        nBins = len(ptEdges) - 1
+        base = np.array([hBase.GetBinContent(i) for i in range(1,nBins+1)])
+        tight = np.array([hTight.GetBinContent(i) for i in range(1,nBins+1)])
+        hBasePrompt, hTightPrompt = inFile.Get("{0:s}BasePrompt".format(leg)), inFile.Get("{0:s}TightPrompt".format(leg))
+        if promptSubtract and hBasePrompt and hTightPrompt :
+            base -= np.array([hBasePrompt.GetBinContent(i) for i in range(1,nBins+1)])
+            tight -= np.array([hTightPrompt.GetBinContent(i) for i in range(1,nBins+1)])
+        return ptEdges, base, tight
+
+    def getIntegratedRate(self, base, tight) :
+        good = base > 0.
+        return np.sum(tight[good])/np.sum(base[good]) if np.any(good) else 0.
+
+    def getBaseTightArrays(self, inFile, leg, promptSubtract) :
+        baseTight = self.getBaseTight(inFile,leg,promptSubtract)
+        if baseTight is None :
+            print("Error in fakeRates.fakeRateLookup(): no fake rate histograms for {0:s} in {1:s}".format(leg,self.inFileName))
+            exit()
+        ptEdges, base, tight = baseTight
+        f = np.zeros(len(base))
+        good = base > 0.
+        f[good] = tight[good]/base[good]
+        return ptEdges, None, self.cleanRates(np.where(good,f,-1.),self.getIntegratedRate(base,tight))
+
+    def cleanRates(self, f, fAvg) :
+        # replace unphysical bins (empty, negative after prompt subtraction, or near 1)
+        fAvg = min(max(fAvg,0.),self.maxRate)
+        return np.where((f > 0.) & (f < self.maxRate),f,fAvg)
+
+    def getBins(self, edges, x) :
+        # values below (above) the first (last) edge use the first (last) bin
+        return np.clip(np.searchsorted(edges,x,side='right')-1,0,len(edges)-2)
+
+    def getRate(self, leg, pt, eta=None) :
+        """ fakeRateLookup.getRate(): fake rate of leg for arrays of pt (and |eta|)
+        """
+        pt = np.atleast_1d(np.asarray(pt,dtype=float))
+        ptEdges, etaEdges, f = self.rates[leg]
+        return self.lookup(ptEdges,etaEdges,f,pt,eta)
+
+    def lookup(self, ptEdges, etaEdges, f, pt, eta) :
+        iPt = self.getBins(ptEdges,pt)
+        if etaEdges is None : return f[iPt]
+        if eta is None :
+            print("Error in fakeRates.fakeRateLookup(): eta is needed for the eta-binned rates in {0:s}".format(self.inFileName))
+            exit()
+        return f[iPt,self.getBins(etaEdges,np.abs(np.asarray(eta,dtype=float)))]
+
+    def getWeight(self, leg, pt, eta=None) :
+        """ fakeRateLookup.getWeight(): fake weight w = f/(1-f) of leg for arrays of pt
+        """
+        f = self.getRate(leg,pt,eta)
+        return f/(1.-f)
+
+    def getHash(self) :
+        # identifies the rates, e.g. for cache keys
+        h = hashlib.sha1()
+        for key in sorted(self.rates.keys()) :
+            h.update(key.encode())
+            for a in self.rates[key] :
+                if a is not None : h.update(np.ascontiguousarray(a).tobytes())
+        return h.hexdigest()
+
+    def printSummary(self) :
+        print("Fake rates from {0:s}".format(self.inFileName))
+        for leg in sorted(self.rates.keys()) :
+            ptEdges, etaEdges, f = self.rates[leg]
+            print("{0:12s} {1:s}".format(leg," ".join(["{0:.4f}".format(x) for x in np.ravel(f)])))
+        return
@@ -0,0 +1,84 @@
+# columnar (vectorized) version of generalFunctions.eventID() for a chunk of MC events
+#
+# The gen particles of all events are held one after the other (see eventBatch.py).  The
+# searches of findLast() and findFirst() become "last (first) particle in its event passing
+# a mask", so the Z decay flavour and the flavours of the two H->tau tau decays are found for
+# all events with a handful of array operations on GenPart_pdgId and GenPart_genPartIdxMother.
+# The categories are numbered as in tauFun.catToNumber(), with 0 for events that eventID()
+# does not classify ('').
+
+import numpy as np
+import eventBatch
+
+branches = ['nGenPart','GenPart_pdgId','GenPart_genPartIdxMother']
+catNumbers = { 'eeet':1, 'eemt':2, 'eett':3, 'eeem':4, 'mmet':5, 'mmmt':6, 'mmtt':7, 'mmem':8 }
+catNames = dict([(n,cat) for cat, n in catNumbers.items()] + [(0,'')])
+neutrinos = [12, 14, 16, -12, -14, -16]
+
+def selectInEvent(mask, event, local, nEvents, last=False) :
+    # local index of the first (last) particle passing mask in each event, -1 if there is none
+    found = -np.ones(nEvents,dtype=np.int64)
+    g = np.nonzero(mask)[0]
+    if len(g) < 1 : return found
+    ev = event[g]
+    edge = ev[1:] != ev[:-1]
+    keep = np.append(edge,True) if last else np.insert(edge,0,True)
+    found[ev[keep]] = local[g[keep]]
+    return found
+
+def getCategories(a) :
+    """ genCategory.getCategories(): return the category number of each event (see catNumbers),
+                                     as generalFunctions.eventID() would find it
+    """
+    nGen = np.asarray(a['nGenPart'],dtype=np.int64)
+    nEvents = len(nGen)
+    pdg = np.asarray(a['GenPart_pdgId'],dtype=np.int64)
+    mother = np.asarray(a['GenPart_genPartIdxMother'],dtype=np.int64)
+    offsets = eventBatch.getOffsets(a,'GenPart')
+    event, local = eventBatch.getEventIndex(a,'GenPart'), eventBatch.getLocalIndex(a,'GenPart')
+
+    def findLast(ID, parent) :
+        return selectInEvent((pdg == ID) & (local > parent[event]),event,local,nEvents,last=True)
+
+    def findFirst(vetoList, parent) :
+        mask = (mother == parent[event]) & (local > parent[event])
+        if len(vetoList) > 0 : mask &= np.logical_not(np.isin(pdg,vetoList))
+        return selectInEvent(mask,event,local,nEvents)
+
+    def getPDG(i) :
+        # |pdgId| of local particle i of each event, 0 where there is none
+        return np.where(i >= 0,np.abs(pdg[np.minimum(offsets[:-1]+i,max(len(pdg)-1,0))]) if len(pdg) > 0 else 0,0)
+
+    # decay mode of the Z0
+    zero = np.zeros(nEvents,dtype=np.int64)
+    iZ0 = findLast(23,zero)
+    lepPDG = getPDG(findFirst([],iZ0))
+    good = (iZ0 >= 0) & ((lepPDG == 11) | (lepPDG == 13))
+
+    # decay modes of the taus from the Higgs, 'e'=11, 'm'=13 and 't' for anything else
+    iH = findLast(25,zero)
+    good &= iH >= 0
+    flavours = []
+    for child in [-15,15] :
+        tauChildPDG = getPDG(findFirst(neutrinos,findLast(child,iH)))
+        flavours.append(np.where((tauChildPDG == 11) | (tauChildPDG == 13),tauChildPDG,15))
+    tau1, tau2 = flavours
+    # events with two leptonic tau decays are not ZH->ll tau tau signal
+    good &= (tau1 == 15) | (tau2 == 15)
+
+    # the light lepton comes first, as in 'et' and 'mt'
+    lep = np.where(tau1 == 15,tau2,tau1)
+    cats = np.where(lepPDG == 11,0,4) + np.where(lep == 11,1,np.where(lep == 13,2,3))
+    return np.where(good,cats,0)
+
+def getCategoryNames(cats) :
+    # the eventID() string of each category number
+    return [catNames[int(c)] for c in cats]
+
+def eventCategory(e) :
+    # category string of the current event of a TTree, as generalFunctions.eventID()
+    n = e.nGenPart
+    a = { 'nGenPart':np.array([n]),
+          'GenPart_pdgId':np.array([e.GenPart_pdgId[i] for i in range(n)],dtype=np.int64),
+          'GenPart_genPartIdxMother':np.array([e.GenPart_genPartIdxMother[i] for i in range(n)],dtype=np.int64) }
+    return catNames[int(getCategories(a)[0])]
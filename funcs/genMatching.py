@@ -0,0 +1,72 @@
+# columnar (vectorized) gen matching for a chunk of MC events
+#
+# As generalFunctions.getMCmatchString(), each reconstructed electron, muon or tau is matched
+# to the closest status 1 gen particle of its event, but for all objects of all events at once:
+# the DR of every (object, gen particle) combination of an event is computed in one go, and the
+# smallest one of each object is taken.   Unlike getMCmatchString(), dPhi is taken in [0,pi].
+# hasZmumu() and hasZee() answer the questions of their generalFunctions namesakes per event.
+
+import numpy as np
+import eventBatch
+
+branches = ['nGenPart','GenPart_pdgId','GenPart_genPartIdxMother','GenPart_status','GenPart_eta','GenPart_phi','GenPart_pt']
+
+def getBranches(collection) :
+    # branches read by matchObjects() for collection ('Electron', 'Muon' or 'Tau')
+    return branches + ['n'+collection,collection+'_eta',collection+'_phi']
+
+def matchObjects(a, collection, status=1) :
+    """ genMatching.matchObjects(): return (genIdx, dR, pdgId) for every object of collection,
+                                    in the order of its jagged branches: the index within the event
+                                    of the closest gen particle with the given status, their DR and
+                                    its pdgId.   Objects without any such gen particle have
+                                    genIdx = -1, dR = 999. and pdgId = 0.
+    """
+    nReco = np.asarray(a['n'+collection],dtype=np.int64)
+    nGen = np.asarray(a['nGenPart'],dtype=np.int64)
+    offReco, offGen = eventBatch.getOffsets(a,collection), eventBatch.getOffsets(a,'GenPart')
+    nObjects = int(offReco[-1])
+    genIdx = -np.ones(nObjects,dtype=np.int64)
+    dRBest = np.full(nObjects,999.)
+    pdgBest = np.zeros(nObjects,dtype=np.int64)
+
+    # all (object, gen particle) combinations of each event, objects outer and gen particles inner
+    nPairs = nReco*nGen
+    event = np.repeat(np.arange(len(nReco)),nPairs)
+    k = np.arange(len(event)) - (np.cumsum(nPairs)-nPairs)[event]
+    reco = offReco[event] + k // np.maximum(nGen[event],1)
+    gen = offGen[event] + k % np.maximum(nGen[event],1)
+    keep = a['GenPart_status'][gen] == status
+    reco, gen, event = reco[keep], gen[keep], event[keep]
+    if len(reco) < 1 : return genIdx, dRBest, pdgBest
+
+    dR = eventBatch.getDR(a[collection+'_eta'][reco],a[collection+'_phi'][reco],a['GenPart_eta'][gen],a['GenPart_phi'][gen])
+    # the smallest DR of each object, the first gen particle of those with the same DR
+    order = np.lexsort((gen,dR,reco))
+    first = np.ones(len(order),dtype=bool)
+    first[1:] = reco[order][1:] != reco[order][:-1]
+    best = order[first]
+    genIdx[reco[best]] = gen[best] - offGen[event[best]]
+    dRBest[reco[best]] = dR[best]
+    pdgBest[reco[best]] = a['GenPart_pdgId'][gen[best]]
+    return genIdx, dRBest, pdgBest
+
+def hasZll(a, lepPDG) :
+    # True for the events with a lepton and an antilepton of flavour lepPDG whose mother is a Z0
+    nGen = np.asarray(a['nGenPart'],dtype=np.int64)
+    offsets = eventBatch.getOffsets(a,'GenPart')
+    pdg = np.asarray(a['GenPart_pdgId'],dtype=np.int64)
+    mother = np.asarray(a['GenPart_genPartIdxMother'],dtype=np.int64)
+    event = eventBatch.getEventIndex(a,'GenPart')
+    # the scalar loop skips mothers at index 0 (and -1, no mother)
+    fromZ = mother >= 1
+    fromZ[fromZ] = pdg[offsets[event[fromZ]] + mother[fromZ]] == 23
+    hasM = np.bincount(event[fromZ & (pdg == lepPDG)],minlength=len(nGen)) > 0
+    hasP = np.bincount(event[fromZ & (pdg == -lepPDG)],minlength=len(nGen)) > 0
+    return hasM & hasP & (nGen >= 3)
+
+def hasZmumu(a) :
+    return hasZll(a,13)
+
+def hasZee(a) :
+    return hasZll(a,11)
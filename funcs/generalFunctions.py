@@ -1,10 +1,12 @@
 # functions for H->tautau analysis 
+#
+# ROOT is imported by the functions that need it, so that the per-event and columnar helpers
+# can be used (and the module imported quickly) without it
 
-from ROOT import TLorentzVector
-from ROOT import TFile, TH1D, TCanvas, TGraph, kRed, kBlue, TLegend
 from math import sqrt
 import numpy as np
 import json
+import genCategory
 
 def printEvent(entry) :
     print("** Run={0:d} LS={1:d} Event={2:d} MET={3:.1f}".format(entry.run,entry.luminosityBlock,entry.event,entry.MET_pt))
@@ -158,12 +160,13 @@ class cutCounter() :
         self.counter = {}
         self.nickNames = []
 
-    def count(self,nickName) :
+    def count(self,nickName,n=1) :
+        # n > 1 counts a whole chunk of events at once (columnar code)
         try :
-            self.counter[nickName] += 1
+            self.counter[nickName] += n
         except KeyError :
             self.nickNames.append(nickName) 
-            self.counter[nickName] = 1
+            self.counter[nickName] = n
             
     def printSummary(self) :
         #print("Cut summary:\n    Name      Events Fraction")
@@ -205,25 +208,109 @@ def getOutFileName(args) :
         
     return 'temp_out.root'
 
+def setTreeCache(tree, cacheSize, learnEntries, firstEntry, lastEntry, prefetch=False) :
+    # read-ahead for (remote) input.   The TTreeCache learns during the first learnEntries entries
+    # which branches are used, and afterwards reads only those branches, cacheSize MB at a time,
+    # in large vectored reads.   With prefetch the next block is read asynchronously as well.
+    import ROOT
+    if cacheSize <= 0 : return
+    if prefetch : ROOT.gEnv.SetValue("TFile.AsyncPrefetching",1)
+    ROOT.TTreeCache.SetLearnEntries(learnEntries)
+    tree.SetCacheSize(int(cacheSize*1024*1024))
+    tree.SetCacheEntryRange(firstEntry,lastEntry)
+    return
+
+def getBranches(isMC) :
+    # nanoAOD branches read by printEvent(), printMC() and eventID()
+    branches = ['run','luminosityBlock','event','MET_pt',
+                'Electron_charge','Electron_cutBased','Electron_dxy','Electron_dz','Electron_eta','Electron_lostHits',
+                'Electron_miniPFRelIso_all','Electron_mvaFall17V2noIso','Electron_mvaFall17V2noIso_WP90','Electron_phi','Electron_pt',
+                'Muon_charge','Muon_dxy','Muon_dz','Muon_eta','Muon_mediumId','Muon_pfRelIso04_all','Muon_phi','Muon_pt',
+                'Muon_softId','Muon_tightId','Photon_eta','Photon_phi','Photon_pt',
+                'Tau_chargedIso','Tau_decayMode','Tau_dxy','Tau_dz','Tau_eta','Tau_idAntiEle','Tau_idAntiMu','Tau_idDecayMode',
+                'Tau_idDecayModeNewDMs','Tau_idMVAoldDM2017v2','Tau_jetIdx','Tau_neutralIso','Tau_phi','Tau_pt','Tau_rawIso',
+                'Tau_rawMVAoldDM2017v2','Jet_btagCSVV2','Jet_eta','Jet_jetId','Jet_phi','Jet_pt',
+                'TrigObj_eta','TrigObj_filterBits','TrigObj_id','TrigObj_phi','TrigObj_pt']
+    if isMC :
+        branches += ['GenPart_eta','GenPart_genPartIdxMother','GenPart_mass','GenPart_pdgId','GenPart_phi','GenPart_pt','GenPart_status']
+    return branches
+
+def pruneBranches(tree, branches) :
+    # read only the given branches, together with the counters (nMuon, nTau, ...) of their
+    # collections, and register them in the TTreeCache so that the cache does not need to
+    # learn them.   Returns the enabled branches and the declared ones missing from the input.
+    tree.LoadTree(max(tree.GetReadEntry(),0))
+    available = set([b.GetName() for b in tree.GetListOfBranches()])
+    enabled = set()
+    for b in branches :
+        if not b in available : continue
+        enabled.add(b)
+        counter = 'n' + b.split('_')[0]
+        if '_' in b and counter in available : enabled.add(counter)
+    tree.SetBranchStatus("*",0)
+    for b in sorted(enabled) :
+        tree.SetBranchStatus(b,1)
+        if tree.GetCacheSize() > 0 : tree.AddBranchToCache(b,True)
+    if tree.GetCacheSize() > 0 : tree.StopCacheLearningPhase()
+    return sorted(enabled), sorted(set(branches) - available)
+
+class branchRecorder() :
+    # stands in for the input tree to record the branches the code actually reads,
+    # so that the branch lists given to pruneBranches() can be checked
+    def __init__(self, tree) :
+        self.__dict__['tree'] = tree
+        self.__dict__['names'] = set()
+
+    def __getattr__(self, name) :
+        self.names.add(name)
+        return getattr(self.tree,name)
+
+    def printSummary(self, enabled) :
+        undeclared = sorted(self.names - set(enabled))
+        print("branchRecorder: {0:d} branches read, undeclared: {1:s}".format(len(self.names),str(undeclared)))
+        return undeclared
+
 class dupeDetector() :
+    # screens out events that appear in more than one dataset (e.g., SingleMuon and DoubleMuon).
+    # evtName is 'event' for nanoAOD input and 'evt' for the ntuples written by outTuple.
     
-    def __init__(self):
+    def __init__(self, evtName='event'):
         self.nCalls = 0 
-        self.runEventList = []
+        self.evtName = evtName
+        self.runEventSet = set()
 
-    def checkEvent(self,entry) :
+    def checkKey(self,run,evt) :
         self.nCalls += 1 
-        runEvent = "{0:d}:{1:d}".format(entry.run,entry.event)
-        if runEvent in self.runEventList :
-            #print("Event in list: runEventList={0:s}".format(str(self.runEventList)))
+        runEvent = (int(run),int(evt))
+        if runEvent in self.runEventSet :
             return True
         else :
-            self.runEventList.append(runEvent)
-            #print("New event: runEventList={0:s}".format(str(self.runEventList)))
+            self.runEventSet.add(runEvent)
             return False
 
+    def checkEvent(self,entry) :
+        return self.checkKey(entry.run,getattr(entry,self.evtName))
+
+    def checkArrays(self,run,evt) :
+        # vectorized version of checkEvent() for a chunk of events.
+        # Returns a boolean array that is True for duplicates, including repeats within the chunk.
+        # The first occurrence wins, as it would in an event loop.
+        run, evt = np.asarray(run,dtype=np.int64), np.asarray(evt,dtype=np.int64)
+        self.nCalls += len(run)
+        isDupe = np.zeros(len(run),dtype=bool)
+        if len(run) == 0 : return isDupe
+        keys = np.stack((run,evt),axis=1)
+        uKeys, iFirst = np.unique(keys,axis=0,return_index=True)
+        isDupe[:] = True
+        isDupe[iFirst] = False
+        if len(self.runEventSet) > 0 :
+            for i in iFirst :
+                if (int(run[i]),int(evt[i])) in self.runEventSet : isDupe[i] = True 
+        self.runEventSet.update(zip(uKeys[:,0].tolist(),uKeys[:,1].tolist()))
+        return isDupe
+
     def printSummary(self) :
-        print("Duplicate Event Summary: Calls={0:d} Unique Events={1:d}".format(self.nCalls,len(self.runEventList)))
+        print("Duplicate Event Summary: Calls={0:d} Unique Events={1:d}".format(self.nCalls,len(self.runEventSet)))
         return
 
 
@@ -233,6 +320,7 @@ class pileUpWeight() :
         self.dummy = 0
         
     def calculateWeights(self,nickName,year) :
+        from ROOT import TFile
         # get data pileup histogram
         fData = TFile('data_pileup_{0:d}.root'.format(year))
         hData = fData.Get('pileup')
@@ -274,11 +362,14 @@ class pileUpWeight() :
         xMin = hData.GetBinLowEdge(1)
         xMax = xMin + hData.GetNbinsX()*hData.GetBinWidth(1) 
         bins = np.linspace(xMin+0.5*binWidth,xMax-0.5*binWidth,nBins)
+        # binning of the data pileup histogram, used by ZH.py for the pileup profile of its input
+        self.nBins, self.xMin, self.xMax = nBins, xMin, xMax
         self.sampleWeight = xSec*lumi[year]/nMC
         print("In generalFunctions.pileUpWeight.calculateWeights() :")
         print(" nickName={0:s} year={1:d} lumi={2:.1f} /fb xSec={3:.3f} fb nMC={4:.1f} weight={5:f}".format(nickName,year,lumi[year],xSec,nMC,self.sampleWeight))
         
         if False :
+            from ROOT import TCanvas, TGraph, TLegend, kRed, kBlue
             gData = TGraph(len(bins),bins,pData)
             gData.GetXaxis().SetTitle("PileUp") 
             gData.SetMarkerColor(kRed)
@@ -306,6 +397,7 @@ class pileUpWeight() :
         return weight 
         
     def displayWeights(self, bins, weights) :
+        from ROOT import TCanvas, TGraph, kBlue
         gWeights = TGraph(len(bins),bins,weights) 
         c1 = TCanvas("c1","c1",1000,750)
         gWeights.GetXaxis().SetTitle("PileUp")
@@ -339,42 +431,9 @@ def findLast(e, ID, parent) :
 
     return last 
         
-# look for ZH events
+# look for ZH events: the category ('eeet', ..., 'mmtt') from the gen record, '' if it is not one
 def eventID(e) :
-    # find decay mode of Z0
-    neutrinos = [12, 14, 16, -12, -14, -16] 
-    elec, mu, tau, Z0, H = 11, 13, 15, 23, 25
-    iZ0 = findLast(e,Z0,0)
-    if iZ0 < 0 : return ''
-    iLep = findFirst(e,[],iZ0)
-    if iLep < 0 : return ''
-    lepPDG = abs(e.GenPart_pdgId[iLep])
-    if lepPDG == elec :
-        cat = 'ee'
-    elif lepPDG == mu :
-        cat = 'mm'
-    else :
-        #print("In generalFunction.eventID() unrecognized Z0 decay mode lepPDG={0:d}".format(lepPDG))
-        return ''
-        
-    # find decay mode of taus from Higgs
-    iH = findLast(e,H,0)
-    if iH < 0 : return ''
-    for child in [-tau,tau] :
-        iTauP = findLast(e,child,iH)
-        tauChild = findFirst(e,neutrinos,iTauP)
-        tauChildPDG = e.GenPart_pdgId[tauChild]
-        if abs(tauChildPDG) == elec :
-            cat += 'e'
-        elif abs(tauChildPDG) == mu :
-            cat += 'm'
-        else :
-            cat += 't'
-
-    if cat[2:4] in ['ee','em','me','mm'] : return '' 
-    cat = cat.replace('te','et')
-    cat = cat.replace('tm','mt')
-    return cat
+    return genCategory.eventCategory(e)
 
 
 class checkJSON() :
@@ -0,0 +1,145 @@
+# histogram tools shared by the plotting/ and fakes/ scripts
+#
+# npHisto holds the bin contents and sum of squared weights of a fixed-bin
+# 1D histogram as numpy arrays.  Unlike a TH1D it can be pickled, returned
+# from a worker process and added to other npHisto objects, and it is only
+# converted to a TH1D when the output file is written.
+
+import os
+import hashlib
+import pickle
+import numpy as np
+
+class npHisto() :
+
+    def __init__(self, nBins, xMin, xMax) :
+        self.nBins, self.xMin, self.xMax = nBins, float(xMin), float(xMax)
+        # index 0 is the underflow and index nBins+1 the overflow, as in ROOT
+        self.sumw  = np.zeros(nBins+2)
+        self.sumw2 = np.zeros(nBins+2)
+        self.entries = 0
+
+    def getBins(self, x) :
+        x = np.asarray(x,dtype=float)
+        iBin = np.floor(self.nBins*(x-self.xMin)/(self.xMax-self.xMin)).astype(int) + 1
+        return np.clip(iBin,0,self.nBins+1)
+
+    def fill(self, x, w=None) :
+        # x and w may be scalars or arrays
+        x = np.atleast_1d(np.asarray(x,dtype=float))
+        if w is None : w = np.ones_like(x)
+        w = np.broadcast_to(np.asarray(w,dtype=float),x.shape)
+        iBin = self.getBins(x)
+        self.sumw  += np.bincount(iBin,weights=w,minlength=self.nBins+2)
+        self.sumw2 += np.bincount(iBin,weights=w*w,minlength=self.nBins+2)
+        self.entries += len(x)
+        return
+
+    def compatible(self, other) :
+        return self.nBins == other.nBins and self.xMin == other.xMin and self.xMax == other.xMax
+
+    def add(self, other) :
+        if not self.compatible(other) :
+            print("Error in histoTools.npHisto.add(): binnings differ ({0:d},{1:f},{2:f}) vs ({3:d},{4:f},{5:f})".format(
+                self.nBins,self.xMin,self.xMax,other.nBins,other.xMin,other.xMax))
+            exit()
+        self.sumw  += other.sumw
+        self.sumw2 += other.sumw2
+        self.entries += other.entries
+        return self
+
+    def integral(self) :
+        return np.sum(self.sumw[1:-1])
+
+    def toTH1D(self, hName, hTitle='') :
+        from ROOT import TH1D
+        if len(hTitle) < 1 : hTitle = hName
+        h = TH1D(hName,hTitle,self.nBins,self.xMin,self.xMax)
+        h.Sumw2()
+        for i in range(self.nBins+2) :
+            h.SetBinContent(i,self.sumw[i])
+            h.SetBinError(i,np.sqrt(self.sumw2[i]))
+        h.SetEntries(self.entries)
+        return h
+
+    def fillTH1D(self, h) :
+        # add the contents to an existing TH1D with the same binning
+        for i in range(self.nBins+2) :
+            h.SetBinContent(i,h.GetBinContent(i)+self.sumw[i])
+            h.SetBinError(i,np.sqrt(h.GetBinError(i)**2+self.sumw2[i]))
+        h.SetEntries(h.GetEntries()+self.entries)
+        return h
+
+
+def fromTH1D(h) :
+    # build an npHisto from a fixed-bin TH1
+    nBins = h.GetNbinsX()
+    hh = npHisto(nBins,h.GetXaxis().GetXmin(),h.GetXaxis().GetXmax())
+    for i in range(nBins+2) :
+        hh.sumw[i] = h.GetBinContent(i)
+        hh.sumw2[i] = h.GetBinError(i)**2
+    hh.entries = int(h.GetEntries())
+    return hh
+
+
+class histoCache() :
+    # per-sample cache of histogramming results.   An entry is reused only if the input file 
+    # (path plus size and mtime, or optionally an md5 checksum of its contents), the selection 
+    # settings and the code that made it are unchanged, so after reprocessing one sample 
+    # only that sample has to be read again.
+
+    def __init__(self, cacheDir, selection, codeFiles=[], useChecksum=False) :
+        self.cacheDir = cacheDir
+        self.useChecksum = useChecksum
+        if not os.path.isdir(cacheDir) : os.makedirs(cacheDir)
+        hSel = hashlib.sha1(repr(sorted(selection.items())).encode())
+        for codeFile in codeFiles :
+            hSel.update(open(codeFile,'rb').read())
+        self.selectionHash = hSel.hexdigest()
+        self.nHit, self.nMiss = 0, 0
+
+    def getFileKey(self, inFileName) :
+        if self.useChecksum :
+            md5 = hashlib.md5()
+            with open(inFileName,'rb') as f :
+                for block in iter(lambda : f.read(1 << 20), b'') : md5.update(block)
+            return "{0:s}:{1:s}".format(os.path.abspath(inFileName),md5.hexdigest())
+        st = os.stat(inFileName)
+        return "{0:s}:{1:d}:{2:d}".format(os.path.abspath(inFileName),st.st_size,int(st.st_mtime))
+
+    def getKey(self, inFileName, extra='') :
+        try :
+            fileKey = self.getFileKey(inFileName)
+        except (IOError, OSError) :
+            return None
+        return hashlib.sha1("{0:s}|{1:s}|{2:s}".format(fileKey,self.selectionHash,extra).encode()).hexdigest()
+
+    def getCacheFileName(self, nickName) :
+        return os.path.join(self.cacheDir,"{0:s}.pkl".format(nickName))
+
+    def get(self, nickName, inFileName, extra='') :
+        key = self.getKey(inFileName,extra)
+        try :
+            with open(self.getCacheFileName(nickName),'rb') as f :
+                entry = pickle.load(f)
+            if key is not None and entry['key'] == key :
+                self.nHit += 1
+                return entry['result']
+        except (IOError, OSError, EOFError, KeyError, pickle.UnpicklingError) :
+            pass
+        self.nMiss += 1
+        return None
+
+    def put(self, nickName, inFileName, result, extra='') :
+        key = self.getKey(inFileName,extra)
+        if key is None : return
+        cacheFileName = self.getCacheFileName(nickName)
+        # write to a temporary file first so that an interrupted job cannot leave a truncated entry
+        with open(cacheFileName + '.tmp','wb') as f :
+            pickle.dump({'key':key, 'result':result},f,2)
+        os.rename(cacheFileName + '.tmp',cacheFileName)
+        return
+
+    def printSummary(self) :
+        print("Histogram cache {0:s}: hits={1:d} misses={2:d}".format(self.cacheDir,self.nHit,self.nMiss))
+        return
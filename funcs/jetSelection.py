@@ -0,0 +1,71 @@
+# columnar (vectorized) version of outTuple.getJets() for a chunk of selected events
+#
+# The jets of all events are held one after the other (see eventBatch.py) and are cleaned
+# against the two legs of the selected pair with one DR matrix per leg.   The cuts are those
+# of outTuple.getJets(): jets after the first one below 20 GeV are not used (nanoAOD jets are
+# pt ordered), jets within DR 0.5 of a leg or with |eta| > 4.7 are dropped, b jets have
+# |eta| < 2.5 and DeepB > 0.4941, and counted jets pass the loose ID and have pt > 30 GeV.
+
+import numpy as np
+import eventBatch
+
+branches = ['nJet','Jet_pt','Jet_eta','Jet_phi','Jet_jetId','Jet_btagDeepB']
+
+def getLeading(nEvents, event, pt, mask, nLead=2) :
+    # local indices of the nLead highest pt objects passing mask in each event (-1 if fewer)
+    lead = -np.ones((nEvents,nLead),dtype=np.int64)
+    sel = np.nonzero(mask)[0]
+    if len(sel) < 1 : return lead
+    order = sel[np.lexsort((-pt[sel],event[sel]))]
+    ev = event[order]
+    first = np.concatenate([[0],np.nonzero(ev[1:] != ev[:-1])[0]+1])
+    rank = np.arange(len(order)) - np.repeat(first,np.diff(np.concatenate([first,[len(order)]])))
+    keep = rank < nLead
+    lead[ev[keep],rank[keep]] = order[keep]
+    return lead
+
+def getJets(a, eta1, phi1, eta2, phi2, events=None) :
+    """ jetSelection.getJets(): return a dictionary of per-event arrays:
+                                njets, nbtag, and the local indices of the two leading jets
+                                (jet1, jet2) and b jets (bjet1, bjet2), -1 if there is none.
+                                eta1, phi1, eta2, phi2 are those of the two legs of each event.
+                                With events given, only those events (entry numbers within the
+                                chunk) are done, e.g. the ones with a selected pair.
+    """
+    nJet = np.asarray(a['nJet'],dtype=np.int64)
+    offsets = eventBatch.getOffsets(a,'Jet')
+    if events is None : events = np.arange(len(nJet))
+    events = np.asarray(events,dtype=np.int64)
+    nEvents = len(events)
+    n = nJet[events]
+    # global jet indices of the selected events, and the event (0..nEvents-1) each belongs to
+    event = np.repeat(np.arange(nEvents),n)
+    local = np.arange(len(event)) - np.repeat(np.cumsum(n)-n,n)
+    k = offsets[events][event] + local
+    pt, eta, phi = a['Jet_pt'][k], a['Jet_eta'][k], a['Jet_phi'][k]
+
+    # the scalar loop stops at the first jet below 20 GeV
+    softBefore = np.concatenate([[0],np.cumsum(pt < 20.)])
+    first = np.cumsum(n) - n
+    used = (softBefore[1:] - softBefore[first][event]) == 0
+
+    # DR of each jet to the closer of the two legs
+    dR = np.minimum(eventBatch.getDR(np.asarray(eta1)[event],np.asarray(phi1)[event],eta,phi),
+                    eventBatch.getDR(np.asarray(eta2)[event],np.asarray(phi2)[event],eta,phi))
+    good = used & (np.abs(eta) <= 4.7) & (dR >= 0.5)
+    bJet = good & (np.abs(eta) < 2.5) & (a['Jet_btagDeepB'][k] > 0.4941)
+    jet = good & ((a['Jet_jetId'][k].astype(np.int64) & 2) != 0) & (pt >= 30.)
+
+    jets = {}
+    jets['njets'] = np.bincount(event[jet],minlength=nEvents)
+    jets['nbtag'] = np.bincount(event[bJet],minlength=nEvents)
+    lead = getLeading(nEvents,event,pt,jet)
+    bLead = getLeading(nEvents,event,pt,bJet)
+    for name, ll in [('jet',lead),('bjet',bLead)] :
+        for i in range(2) :
+            jets["{0:s}{1:d}".format(name,i+1)] = np.where(ll[:,i] >= 0,local[np.maximum(ll[:,i],0)] if len(local) > 0 else -1,-1)
+    return jets
+
+def getEventJets(jets, i) :
+    # the jet summary of event i in the form used by outTuple.Fill()
+    return (int(jets['njets'][i]),int(jets['nbtag'][i]),[int(jets['jet1'][i]),int(jets['jet2'][i])],[int(jets['bjet1'][i]),int(jets['bjet2'][i])])
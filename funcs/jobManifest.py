@@ -0,0 +1,98 @@
+# job manifest for ZH.py productions
+#
+# makeCondor.py and runLocal.py write manifest.csv in each sample directory, with one line per job:
+#     name,inFileNames,firstEntry,lastEntry,outFileName,status,eventsIn,eventsOut,runTime,exitCode
+# (several input files are separated by ';').   When ZH.py completes it writes {name}.status next
+# to its output, which comes back from condor with the .ntup file.   update() folds the status
+# files into the manifest, so that only the missing or failed jobs have to be resubmitted.
+
+import os
+
+fields = ['name','inFileNames','firstEntry','lastEntry','outFileName','status','eventsIn','eventsOut','runTime','exitCode']
+statusFields = ['status','eventsIn','eventsOut','runTime','exitCode']
+
+def getStatusFileName(outFileName) :
+    return os.path.splitext(outFileName)[0] + '.status'
+
+def writeStatus(outFileName, status, eventsIn, eventsOut, runTime, exitCode=0) :
+    # called by ZH.py (status 'done') and by the local runner for jobs that fail
+    outLines = [','.join(statusFields) + '\n']
+    outLines.append("{0:s},{1:d},{2:d},{3:.1f},{4:d}\n".format(status,eventsIn,eventsOut,runTime,exitCode))
+    open(getStatusFileName(outFileName),'w').writelines(outLines)
+    return
+
+def readStatus(statusFileName) :
+    lines = open(statusFileName,'r').readlines()
+    return dict(zip(lines[0].strip().split(','),lines[1].strip().split(',')))
+
+class jobManifest() :
+
+    def __init__(self, dirName='.', fileName='manifest.csv') :
+        self.dirName = dirName
+        self.fileName = os.path.join(dirName,fileName)
+        self.names, self.jobs = [], {}
+        if os.path.isfile(self.fileName) : self.read()
+
+    def read(self) :
+        lines = open(self.fileName,'r').readlines()
+        header = lines[0].strip().split(',')
+        for line in lines[1:] :
+            if len(line.strip()) < 1 : continue
+            job = dict(zip(header,line.strip().split(',')))
+            for key in ['firstEntry','lastEntry','eventsIn','eventsOut','exitCode'] : job[key] = int(job[key])
+            job['runTime'] = float(job['runTime'])
+            job['inFileNames'] = job['inFileNames'].split(';')
+            self.names.append(job['name'])
+            self.jobs[job['name']] = job
+        return
+
+    def write(self) :
+        outLines = [','.join(fields) + '\n']
+        for name in self.names :
+            job = dict(self.jobs[name])
+            job['inFileNames'] = ';'.join(job['inFileNames'])
+            job['runTime'] = "{0:.1f}".format(job['runTime'])
+            outLines.append(','.join([str(job[key]) for key in fields]) + '\n')
+        # write to a temporary file first so that an interrupted update cannot truncate the manifest
+        open(self.fileName + '.tmp','w').writelines(outLines)
+        os.rename(self.fileName + '.tmp',self.fileName)
+        return
+
+    def addJob(self, outFileName, inFileNames, firstEntry=0, lastEntry=-1) :
+        # the job is known by the name of its output file, e.g. DY1JetsToLL_001
+        name = os.path.splitext(os.path.basename(outFileName))[0]
+        if not name in self.jobs : self.names.append(name)
+        self.jobs[name] = { 'name':name, 'inFileNames':list(inFileNames), 'firstEntry':firstEntry, 'lastEntry':lastEntry,
+                            'outFileName':os.path.basename(outFileName).replace('.root','.ntup'), 'status':'created',
+                            'eventsIn':-1, 'eventsOut':-1, 'runTime':0., 'exitCode':-1 }
+        return self.jobs[name]
+
+    def update(self) :
+        """ jobManifest.update(): take the status of each job from its .status file.
+                                  A job without one, or without its output, is 'missing'.
+        """
+        for name in self.names :
+            job = self.jobs[name]
+            statusFileName = os.path.join(self.dirName,name + '.status')
+            if os.path.isfile(statusFileName) :
+                status = readStatus(statusFileName)
+                job['status'] = status['status']
+                for key in ['eventsIn','eventsOut','exitCode'] : job[key] = int(status[key])
+                job['runTime'] = float(status['runTime'])
+            else :
+                job['status'] = 'missing'
+            if job['status'] == 'done' and not os.path.isfile(os.path.join(self.dirName,job['outFileName'])) :
+                job['status'] = 'missing'
+        return
+
+    def getJobs(self, statusList) :
+        return [self.jobs[name] for name in self.names if self.jobs[name]['status'] in statusList]
+
+    def printSummary(self) :
+        counts = {}
+        for name in self.names : counts[self.jobs[name]['status']] = counts.get(self.jobs[name]['status'],0) + 1
+        done = self.getJobs(['done'])
+        print("{0:40s} jobs={1:4d} {2:s} eventsIn={3:d} eventsOut={4:d}".format(self.dirName,len(self.names),
+            ' '.join(["{0:s}={1:d}".format(s,counts[s]) for s in sorted(counts.keys())]),
+            sum([job['eventsIn'] for job in done]),sum([job['eventsOut'] for job in done])))
+        return
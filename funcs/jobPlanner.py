@@ -0,0 +1,70 @@
+# plan ZH.py jobs with balanced numbers of events
+#
+# The files of a sample are treated as one long sequence of entries, which is cut into
+# jobs of about eventsPerJob entries each.  A large file is thereby split into several
+# entry ranges, and consecutive small files are packed into a single job that ZH.py
+# reads as a chain.  Each job is (fileNames, firstEntry, lastEntry), with the entry
+# range counted from the start of the chain of its files and lastEntry excluded.
+
+import subprocess
+import arrayReader
+
+def getFileEntries(dataSet, instance='') :
+    # file names and numbers of events from DAS
+    query = "file dataset={0:s}".format(dataSet)
+    if len(instance) > 0 : query += " instance={0:s}".format(instance)
+    print("Querying DAS: {0:s}".format(query))
+    p = subprocess.Popen(['dasgoclient','--query={0:s} | grep file.name, file.nevents'.format(query),'--limit=0'],stdout=subprocess.PIPE)
+    files, entries = [], []
+    for line in p.communicate()[0].decode().splitlines() :
+        vals = line.split()
+        if len(vals) < 2 : continue
+        files.append(vals[0])
+        entries.append(int(vals[1]))
+    return files, entries
+
+def readFileList(fileListName) :
+    # one file per line, optionally followed by its number of entries (-1 if not given)
+    files, entries = [], []
+    for line in open(fileListName,'r').readlines() :
+        vals = line.replace(',',' ').split()
+        if len(vals) < 1 : continue
+        files.append(vals[0])
+        entries.append(int(vals[1]) if len(vals) > 1 else -1)
+    return files, entries
+
+def countEntries(files, entries) :
+    # files without a known number of entries (-1) are opened to count them
+    return [n if n >= 0 else arrayReader.getNumEntries(f) for f, n in zip(files,entries)]
+
+def planJobs(files, entries, eventsPerJob) :
+    """ jobPlanner.planJobs(): return a list of (fileNames, firstEntry, lastEntry)
+                               with about eventsPerJob entries per job
+    """
+    if eventsPerJob <= 0 : return [([f],0,-1) for f in files]
+    entries = countEntries(files,entries)
+    files = [f for f, n in zip(files,entries) if n > 0]
+    entries = [n for n in entries if n > 0]
+    nTotal = sum(entries)
+    if nTotal < 1 : return []
+
+    # offsets[i] is the entry number at which file i starts in the full sequence
+    offsets = [0]
+    for n in entries : offsets.append(offsets[-1]+n)
+    nJobs = max(1,int(round(float(nTotal)/eventsPerJob)))
+    bounds = [int(round(float(i)*nTotal/nJobs)) for i in range(nJobs+1)]
+
+    jobs, iFile = [], 0
+    for first, last in zip(bounds[:-1],bounds[1:]) :
+        while offsets[iFile+1] <= first : iFile += 1
+        jFile = iFile
+        while offsets[jFile+1] < last : jFile += 1
+        firstEntry, lastEntry = first - offsets[iFile], last - offsets[iFile]
+        # a job that covers its files completely does not need a range
+        if firstEntry == 0 and last == offsets[jFile+1] : lastEntry = -1
+        jobs.append((files[iFile:jFile+1],firstEntry,lastEntry))
+    return jobs
+
+def printPlan(nickName, files, jobs) :
+    print("{0:s}: {1:d} files -> {2:d} jobs".format(nickName,len(files),len(jobs)))
+    return
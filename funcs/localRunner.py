@@ -0,0 +1,137 @@
+# run ZH.py preselection jobs on a local process pool instead of condor
+#
+# The jobs are the same as those written by MC/condor/makeCondor.py and data/condor/makeCondor.py:
+# by default one job per nanoAOD file, or as planned by jobPlanner.py, with the output written
+# to {nickName}_{NNN}.ntup in the sample directory.
+# Each job runs ZH.py as a separate process, with its output going to a per-job log file.
+
+import os
+import re
+import sys
+import time
+import subprocess
+from multiprocessing.pool import ThreadPool
+import jobManifest
+
+xrdPrefix = 'root://cms-xrd-global.cern.ch/'
+
+def getInputName(fileName, redirector=xrdPrefix) :
+    # logical file names are read directly through an XRootD redirector (by default the global one)
+    if fileName.startswith('/store/') : return redirector + fileName
+    return fileName
+
+def makeJob(nickName, outFileName, fileNames, firstEntry, lastEntry, dataType, year, redirector=xrdPrefix) :
+    return { 'nickName':nickName, 'inFileName':','.join([getInputName(f,redirector) for f in fileNames]), 
+             'firstEntry':firstEntry, 'lastEntry':lastEntry, 'dataType':dataType, 'year':year,
+             'outFileName':os.path.abspath(outFileName) }
+
+def makeJobs(nickName, plan, outDir, dataType='MC', year=2017, redirector=xrdPrefix) :
+    # plan is a list of (fileNames, firstEntry, lastEntry) from jobPlanner.planJobs()
+    jobs = []
+    if not os.path.isdir(outDir) : os.makedirs(outDir)
+    manifest = jobManifest.jobManifest(outDir)
+    for nJob, (fileNames, firstEntry, lastEntry) in enumerate(plan) :
+        outFileName = os.path.join(outDir,"{0:s}_{1:03d}.root".format(nickName,nJob+1))
+        jobs.append(makeJob(nickName,outFileName,fileNames,firstEntry,lastEntry,dataType,year,redirector))
+        manifest.addJob(outFileName,fileNames,firstEntry,lastEntry)
+    manifest.write()
+    return jobs
+
+def makeJobsFromManifest(manifest, statusList, dataType='MC', year=2017, redirector=xrdPrefix) :
+    # the jobs of a manifest that have one of the given status values, e.g. for resubmission
+    jobs = []
+    for job in manifest.getJobs(statusList) :
+        outFileName = os.path.join(manifest.dirName,job['name'] + '.root')
+        jobs.append(makeJob(job['name'].rsplit('_',1)[0],outFileName,job['inFileNames'],job['firstEntry'],job['lastEntry'],dataType,year,redirector))
+    return jobs
+
+def getCommand(job, script='ZH.py') :
+    command = [sys.executable,script,'-f',job['inFileName'],'-o',job['outFileName'],'-y',str(job['year'])]
+    if job['dataType'] == 'MC' :
+        command += ['--nickName',job['nickName']]
+    else :
+        command += ['-d','Data']
+    if job['firstEntry'] > 0 : command += ['--firstEntry',str(job['firstEntry'])]
+    if job['lastEntry'] >= 0 : command += ['--lastEntry',str(job['lastEntry'])]
+    return command
+
+def getLogFileName(job) :
+    return job['outFileName'].replace('.root','.log')
+
+def getEventCount(logFileName) :
+    # number of events processed, from the "nentries=... nMax=... firstEntry=..." line printed by ZH.py
+    try :
+        for line in open(logFileName,'r') :
+            m = re.match(r'nentries=(\d+) nMax=(\d+) firstEntry=(\d+)',line)
+            if m : return int(m.group(2)) - int(m.group(3))
+    except (IOError, OSError) :
+        pass
+    return 0
+
+class localRunner() :
+
+    def __init__(self, runDir, nWorkers=1, nRetries=1, script='ZH.py') :
+        # runDir holds ZH.py and the files it reads (SFs/, pileup files, JSON, SVFit code)
+        self.runDir = os.path.abspath(runDir)
+        self.nWorkers, self.nRetries, self.script = nWorkers, nRetries, script
+
+    def runJob(self, job) :
+        command = getCommand(job,self.script)
+        logFileName = getLogFileName(job)
+        tStart = time.time()
+        statusFileName = jobManifest.getStatusFileName(job['outFileName'])
+        for attempt in range(1,self.nRetries+2) :
+            if os.path.isfile(statusFileName) : os.remove(statusFileName)
+            with open(logFileName,'w') as log :
+                log.write("# attempt {0:d}: {1:s}\n".format(attempt,' '.join(command)))
+                log.flush()
+                exitCode = subprocess.call(command,cwd=self.runDir,stdout=log,stderr=subprocess.STDOUT)
+            if exitCode == 0 : break
+            print("Job {0:s} failed with exit code {1:d} (attempt {2:d})".format(os.path.basename(job['outFileName']),exitCode,attempt))
+        job['exitCode'], job['attempts'] = exitCode, attempt
+        job['runTime'] = time.time() - tStart
+        job['nEvents'] = getEventCount(logFileName)
+        if exitCode != 0 : jobManifest.writeStatus(job['outFileName'],'failed',-1,-1,job['runTime'],exitCode)
+        return job
+
+    def run(self, jobs) :
+        """ localRunner.run(): run all jobs and return them with exitCode, attempts, runTime and nEvents filled
+        """
+        if len(jobs) < 1 : return []
+        tStart = time.time()
+        nJobs, done = len(jobs), []
+        # ZH.py builds the SVFit libraries with ACLiC when they are missing, so the first
+        # job is run on its own to keep parallel jobs from compiling them at the same time
+        if not os.path.isfile(os.path.join(self.runDir,'FastMTT_cc.so')) :
+            done.append(self.runJob(jobs[0]))
+            jobs = jobs[1:]
+        pool = ThreadPool(self.nWorkers)
+        for job in pool.imap_unordered(self.runJob,jobs) :
+            done.append(job)
+            print("Done {0:s} exitCode={1:d} attempts={2:d} runTime={3:.1f} s ({4:d}/{5:d})".format(
+                os.path.basename(job['outFileName']),job['exitCode'],job['attempts'],job['runTime'],len(done),nJobs))
+        pool.close()
+        pool.join()
+        self.wallTime = time.time() - tStart
+        return done
+
+    def printSummary(self, jobs) :
+        nFailed = len([job for job in jobs if job['exitCode'] != 0])
+        nEvents = sum([job['nEvents'] for job in jobs])
+        jobTime = sum([job['runTime'] for job in jobs])
+        print("\nJobs={0:d} failed={1:d} workers={2:d} wall time={3:.1f} s summed job time={4:.1f} s".format(
+            len(jobs),nFailed,self.nWorkers,self.wallTime,jobTime))
+        if self.wallTime > 0. :
+            print("Events={0:d}  {1:.1f} events/s  {2:.1f} events/s per worker".format(
+                nEvents,nEvents/self.wallTime,nEvents/self.wallTime/self.nWorkers))
+        for job in jobs :
+            if job['exitCode'] != 0 :
+                print("  FAILED {0:s} exitCode={1:d} log={2:s}".format(job['inFileName'],job['exitCode'],getLogFileName(job)))
+
+        # bring the manifests of the sample directories up to date
+        for outDir in sorted(set([os.path.dirname(job['outFileName']) for job in jobs])) :
+            manifest = jobManifest.jobManifest(outDir)
+            manifest.update()
+            manifest.write()
+            manifest.printSummary()
+        return nFailed
@@ -0,0 +1,132 @@
+# merge the .ntup outputs of the ZH.py jobs of a sample into a single file
+#
+# When all inputs have the same Events branches (the usual case) the files are merged by
+# TFileMerger, as hadd does, which copies the compressed baskets without unpacking them if
+# the compression settings of the inputs match.  Otherwise the trees are merged one by one
+# as haddnano does, with the missing branches zero filled in C++ rather than in a python loop.
+# In both cases the number of merged entries is checked against the sum of the inputs.
+
+import ROOT
+
+ROOT.gInterpreter.Declare("""
+void ntupleMergerZeroFill(TTree* tree, const char* brName, const char* leafList) {
+    double buff[4] = {0.,0.,0.,0.};
+    TBranch* b = tree->Branch(brName,buff,leafList);
+    Long64_t n = tree->GetEntries();
+    for (Long64_t i = 0; i < n; ++i) b->Fill();
+    b->ResetAddress();
+}
+""")
+
+def getEntries(fileName, treeName='Events') :
+    f = ROOT.TFile.Open(fileName)
+    if not f or f.IsZombie() : return -1
+    tree = f.Get(treeName)
+    nEntries = tree.GetEntries() if tree else 0
+    f.Close()
+    return nEntries
+
+def getBranchNames(tree) :
+    return set([b.GetName() for b in tree.GetListOfBranches()])
+
+def zeroFill(tree, brName, brObj) :
+    # only scalar branches can be back filled, the leaf type is taken from the tree that has the branch
+    leaf = brObj.GetLeaf(brName)
+    if leaf.GetLenStatic() != 1 or leaf.GetLeafCount() :
+        print("Cannot back fill array branch {0:s} in {1:s}".format(brName,tree.GetName()))
+        return False
+    typeCodes = {'Bool_t':'O','Char_t':'B','UChar_t':'b','Short_t':'S','UShort_t':'s','Int_t':'I','UInt_t':'i',
+                 'Float_t':'F','Double_t':'D','Long64_t':'L','ULong64_t':'l'}
+    if not leaf.GetTypeName() in typeCodes :
+        print("Cannot back fill branch {0:s} of type {1:s}".format(brName,leaf.GetTypeName()))
+        return False
+    ROOT.ntupleMergerZeroFill(tree,brName,"{0:s}/{1:s}".format(brName,typeCodes[leaf.GetTypeName()]))
+    return True
+
+def scanFiles(inFileNames, treeName='Events') :
+    """ ntupleMerger.scanFiles(): return the number of entries, the branch names and the compression
+                                  settings of each input, reading only the file headers
+    """
+    entries, branches, compressions = [], [], []
+    for fileName in inFileNames :
+        f = ROOT.TFile.Open(fileName)
+        if not f or f.IsZombie() : raise IOError("Cannot open {0:s}".format(fileName))
+        tree = f.Get(treeName)
+        entries.append(tree.GetEntries() if tree else 0)
+        branches.append(getBranchNames(tree) if tree else set())
+        compressions.append(f.GetCompressionSettings())
+        f.Close()
+    return entries, branches, compressions
+
+def mergeFast(outFileName, inFileNames, compression, goFast=True) :
+    merger = ROOT.TFileMerger(False,False)
+    merger.SetPrintLevel(0)
+    merger.SetFastMethod(goFast)
+    if not merger.OutputFile(outFileName,'RECREATE',compression) : return False
+    for fileName in inFileNames :
+        if not merger.AddFile(fileName,False) : return False
+    return merger.Merge()
+
+def mergeSlow(outFileName, inFileNames, goFast, treeName='Events') :
+    # tree by tree merge for inputs with different branches, following haddnano
+    fileHandles = [ROOT.TFile.Open(fn) for fn in inFileNames]
+    of = ROOT.TFile(outFileName,"recreate")
+    if goFast : of.SetCompressionSettings(fileHandles[0].GetCompressionSettings())
+    of.cd()
+    mode = "fast" if goFast else ""
+    for key in fileHandles[0].GetListOfKeys() :
+        name = key.GetName()
+        obj = key.ReadObj()
+        isTree = obj.IsA().InheritsFrom(ROOT.TTree.Class())
+        inputs = ROOT.TList()
+        if isTree :
+            obj = obj.CloneTree(-1,mode)
+            branchNames = getBranchNames(obj)
+        for fh in fileHandles[1:] :
+            otherKey = fh.GetListOfKeys().FindObject(name)
+            if not otherKey :
+                print("No {0:s} in {1:s} . . . skipping.".format(name,fh.GetName()))
+                continue
+            otherObj = otherKey.ReadObj()
+            inputs.Add(otherObj)
+            if isTree and name == treeName :
+                otherObj.SetAutoFlush(0)
+                otherBranches = getBranchNames(otherObj)
+                for br in branchNames - otherBranches : zeroFill(otherObj,br,obj.GetListOfBranches().FindObject(br))
+                for br in otherBranches - branchNames :
+                    branchNames.add(br)
+                    zeroFill(obj,br,otherObj.GetListOfBranches().FindObject(br))
+                # merge immediately for trees
+                obj.Merge(inputs,mode)
+                inputs.Clear()
+        if isTree :
+            obj.Write()
+        elif obj.IsA().InheritsFrom(ROOT.TH1.Class()) :
+            obj.Merge(inputs)
+            obj.Write()
+        elif obj.IsA().InheritsFrom(ROOT.TObjString.Class()) :
+            for st in inputs :
+                if st.GetString() != obj.GetString() : print("Strings are not matching")
+            obj.Write()
+        else :
+            print("Cannot handle {0:s}".format(obj.IsA().GetName()))
+    of.Close()
+    for fh in fileHandles : fh.Close()
+    return True
+
+def mergeFiles(outFileName, inFileNames, treeName='Events') :
+    """ ntupleMerger.mergeFiles(): merge inFileNames into outFileName and return (entriesIn, entriesOut).
+                                   entriesOut is -1 if the merge failed.
+    """
+    entries, branches, compressions = scanFiles(inFileNames,treeName)
+    nIn = sum(entries)
+    goFast = len(set(compressions)) == 1
+    if not goFast : print("Disabling fast merging as inputs have different compressions")
+    sameBranches = all([b == branches[0] for b in branches])
+    if sameBranches :
+        ok = mergeFast(outFileName,inFileNames,compressions[0],goFast)
+    else :
+        print("Inputs have different {0:s} branches, back filling the missing ones".format(treeName))
+        ok = mergeSlow(outFileName,inFileNames,goFast,treeName)
+    nOut = getEntries(outFileName,treeName) if ok else -1
+    return nIn, nOut
@@ -1,19 +1,43 @@
 # output ntuple for H->tautau analysis for CMSSW_10_2_X
+#
+# ROOT and ScaleFactor.py are only loaded when an outTuple is made, so that getBranches() can be
+# used without them
 
-from ROOT import TLorentzVector
 from math import sqrt, sin, cos, pi
 import tauFun 
-import ROOT
 import os
 import sys
-sys.path.append('SFs')
-import ScaleFactor as SF
+
+def getScaleFactorModule(dirs=['.','SFs']) :
+    # ScaleFactor.py is transferred next to ZH.py by the condor jobs, and is in SFs/ in ZH/
+    if 'ScaleFactor' in sys.modules : return sys.modules['ScaleFactor']
+    for dir in dirs :
+        fileName = os.path.join(dir,'ScaleFactor.py')
+        if os.path.isfile(fileName) :
+            import imp
+            return imp.load_source('ScaleFactor',fileName)
+    raise ImportError("ScaleFactor.py not found in {0:s}".format(' or '.join(dirs)))
+
+def getBranches(isMC) :
+    # nanoAOD branches read by outTuple.Fill() (see GF.pruneBranches())
+    branches = ['run','luminosityBlock','event','MET_pt','MET_phi','PuppiMET_pt','PuppiMET_phi',
+                'Electron_charge','Electron_dxy','Electron_dz','Electron_eta','Electron_mass','Electron_mvaFall17V2noIso_WP90',
+                'Electron_phi','Electron_pt','Muon_charge','Muon_dxy','Muon_dz','Muon_eta','Muon_mass','Muon_mediumId',
+                'Muon_pfRelIso04_all','Muon_phi','Muon_pt','Tau_charge','Tau_dxy','Tau_dz','Tau_eta','Tau_idAntiEle','Tau_idAntiMu',
+                'Tau_idMVAnewDM2017v2','Tau_idMVAoldDMdR032017v2','Tau_mass','Tau_phi','Tau_pt','Tau_rawMVAoldDM2017v2',
+                'Jet_btagCSVV2','Jet_btagDeepB','Jet_eta','Jet_jetId','Jet_phi','Jet_pt','nJet']
+    if isMC :
+        branches += ['genWeight','Generator_weight','LHEWeight_originalXWGTUP','LHE_Njets',
+                     'Electron_genPartFlav','Muon_genPartFlav','Tau_genPartFlav']
+    return branches
 
 class outTuple() :
     
     def __init__(self,fileName, era):
         from array import array
+        import ROOT
         from ROOT import TFile, TTree
+        SF = getScaleFactorModule()
 
         # Tau Decay types
         self.kUndefinedDecayType, self.kTauToHadDecay,  self.kTauToElecDecay, self.kTauToMuDecay = 0, 1, 2, 3    
@@ -30,6 +54,7 @@ class outTuple() :
         #self.SF_muonIdIso = SF.SFs()
         #self.sf_SF_muonIdIso.ScaleFactor("SFs/LeptonEfficiencies/Muon/Run2017/Muon_IsoMu27.root")
      
+        self.timer = None   # stageTimer.stageTimer, set by ZH.py --timing
         self.f = TFile( fileName, 'recreate' )
         self.t = TTree( 'Events', 'Output tree' )
 
@@ -42,6 +67,7 @@ class outTuple() :
         self.is_trigZH = array('l',[0])
         self.evt = array('l',[0])
         self.cat = array('l',[0])
+        self.gen_cat = array('l',[0])
         self.weight = array('f',[0])
         self.LHEweight = array('f',[0])
         self.Generator_weight = array('f',[0])
@@ -167,6 +193,7 @@ class outTuple() :
         self.t.Branch('is_trigZH', self.is_trigZH,   'is_trigZH/I' )
         self.t.Branch('evt',  self.evt,  'evt/I' )
         self.t.Branch('cat',  self.cat,  'cat/I' )
+        self.t.Branch('gen_cat',  self.gen_cat,  'gen_cat/I' )
         self.t.Branch('weight',  self.weight,  'weight/F' )
         self.t.Branch('LHEweight',  self.LHEweight,  'LHEweight/F' )
         self.t.Branch('LHE_Njets',  self.LHE_Njets,  'LHE_Njets/I' )
@@ -304,6 +331,7 @@ class outTuple() :
             print("Invalid METtype={0:s} in outTuple.get_mt().   Exiting".format(METtype))
 
     def getPt_tt(self,entry,tau1,tau2) :
+        from ROOT import TLorentzVector
         ptMiss = TLorentzVector() 
         ptMiss.SetPtEtaPhiM(entry.MET_pt,0.,entry.MET_phi,0.)
         return (tau1+tau2+ptMiss).Pt()
@@ -340,6 +368,7 @@ class outTuple() :
         return nJet30, jetList, bJetList 
 
     def runSVFit(self, entry, channel, jt1, jt2, tau1, tau2 ) :
+        import ROOT
                       
         measuredMETx = entry.MET_pt*cos(entry.MET_phi)
         measuredMETy = entry.MET_pt*sin(entry.MET_phi)
@@ -378,10 +407,14 @@ class outTuple() :
 
         FMTT = ROOT.FastMTT()
         FMTT.run(instance, measuredMETx, measuredMETy, covMET)
+        if self.timer is not None :
+            # FastMTT's own clock of its likelihood minimization
+            self.timer.add('FastMTT minimize',FMTT.getRealTime('minimize'),FMTT.getCpuTime('minimize'))
         ttP4 = FMTT.getBestP4()
         return ttP4.M(), ttP4.Mt() 
     
-    def Fill(self,entry,SVFit,cat,jt1,jt2,LepP,LepM,lepList,isMC,era) :
+    def Fill(self,entry,SVFit,cat,jt1,jt2,LepP,LepM,lepList,isMC,era,jets=None) :
+        from ROOT import TLorentzVector
 
         # jt1 and jt2 point to the selected tau candidates according to the table below.
         # if e.g., channel = 'et', the jt1 points to the electron list and jt2 points to the tau list.
@@ -688,14 +721,18 @@ class outTuple() :
         if (sf_Lp_MC != 0. or sf_Lm_MC != 0.) and (sf_T1_MC == 0. and sf_T2_MC == 0.) :   self.is_trigZ[0] = 1
         if (sf_Lp_MC != 0. or sf_Lm_MC != 0.) and (sf_T1_MC != 0. or sf_T2_MC != 0.) :   self.is_trigZH[0] = 1
 
-        # jet variables
-        nJet30, jetList, bJetList = self.getJets(entry,tau1,tau2) 
-        self.njetspt20[0] = len(jetList)
+        # jet variables.   jets = (njets, nbtag, two leading jets, two leading b jets), with -1 for a missing jet,
+        # may be given by the caller, e.g. from jetSelection.getJets() for a chunk of events
+        if jets is None :
+            nJet30, jetList, bJetList = self.getJets(entry,tau1,tau2) 
+            jets = (nJet30, len(bJetList), (jetList+[-1,-1])[:2], (bJetList+[-1,-1])[:2])
+        nJet30, nBtag, jetList, bJetList = jets
+        self.njetspt20[0] = nJet30
         self.njets[0] = nJet30
-        self.nbtag[0] = len(bJetList)
+        self.nbtag[0] = nBtag
         
         self.jpt_1[0], self.jeta_1[0], self.jphi_1[0], self.jcsv_1[0] = -9.99, -9.99, -9.99, -9.99 
-        if len(jetList) > 0 :
+        if jetList[0] >= 0 :
             jj1 = jetList[0]
             self.jpt_1[0] = entry.Jet_pt[jj1]
             self.jeta_1[0] = entry.Jet_eta[jj1]
@@ -703,7 +740,7 @@ class outTuple() :
             self.jcsv_1[0] = entry.Jet_btagCSVV2[jj1]
 
         self.jpt_2[0], self.jeta_2[0], self.jphi_2[0], self.jcsv_2[0] = -9.99, -9.99, -9.99, -9.99 
-        if len(jetList) > 1 :
+        if jetList[1] >= 0 :
             jj2 = jetList[1] 
             self.jpt_2[0] = entry.Jet_pt[jj2]
             self.jeta_2[0] = entry.Jet_eta[jj2]
@@ -711,7 +748,7 @@ class outTuple() :
             self.jcsv_2[0] = entry.Jet_btagCSVV2[jj2]
 
         self.bpt_1[0], self.beta_1[0], self.bphi_1[0], self.bcsv_1[0] = -9.99, -9.99, -9.99, -9.99
-        if len(bJetList) > 0 :
+        if bJetList[0] >= 0 :
             jbj1 = bJetList[0]
             self.bpt_1[0] = entry.Jet_pt[jbj1]
             self.beta_1[0] = entry.Jet_eta[jbj1]
@@ -719,7 +756,7 @@ class outTuple() :
             self.bcsv_1[0] = entry.Jet_btagCSVV2[jbj1] 
 
         self.bpt_2[0], self.beta_2[0], self.bphi_2[0], self.bcsv_2[0] = -9.99, -9.99, -9.99, -9.99
-        if len(bJetList) > 1 :
+        if bJetList[1] >= 0 :
             jbj2 = bJetList[1] 
             self.bpt_2[0] = entry.Jet_pt[jbj2]
             self.beta_2[0] = entry.Jet_eta[jbj2]
@@ -735,6 +772,11 @@ class outTuple() :
         #print("outTuple.setWeight() weight={0:f}".format(weight))
         return
 
+    def setGenCat(self,genCat) :
+        # gen-level category (genCategory.catNumbers, 0 if none) of the next event filled
+        self.gen_cat[0] = genCat
+        return
+
     def writeTree(self) :
         print("In outTuple.writeTree() entries={0:d}".format(self.entries)) 
         self.f.Write()
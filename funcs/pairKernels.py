@@ -0,0 +1,101 @@
+# compiled per-event loops for the pair selection of pairSelection.py
+#
+# The loops of tauFun (first object i outer, second object j inner, keep the best pair) are run
+# event by event over the flat content and the offsets of the two collections.   They are
+# compiled with numba when it is installed (available is then True); otherwise pairSelection.py
+# uses its NumPy code, which gives the same pairs.   The functions are plain python as well, so
+# they can be checked without numba on a few events.
+#
+# The DR is computed in double precision, as in tauFun.   The ranking keys are compared as
+# np.lexsort does (smaller is better, NaN after any number), and of the pairs with the same
+# keys the first one formed is kept.   In ZH.py the pairs are formed after a Z has been found:
+# events that fail the category vetoes on the number of leptons (passEvent) are skipped, and
+# both objects must be at least lt_DR away from the two Z leptons (zEta, zPhi, as lTauDR()).
+
+import numpy as np
+
+try :
+    import numba
+    jit = numba.njit(cache=True)
+except ImportError :
+    numba = None
+    jit = lambda func : func
+
+available = numba is not None
+
+@jit
+def isBetter(cand, best, nKeys) :
+    for k in range(nKeys) :
+        c, b = cand[k], best[k]
+        if c < b or (b != b and c == c) : return True
+        if c > b or (c != c and b == b) : return False
+    return False
+
+@jit
+def farFromZ(eta, phi, zEta, zPhi, ltDR) :
+    # tauFun.lTauDR() to each Z lepton is at least ltDR
+    for k in range(len(zEta)) :
+        dPhi = abs(zPhi[k]-phi)
+        dPhi = min(dPhi,2.*np.pi-dPhi)
+        if np.sqrt(dPhi*dPhi + (zEta[k]-eta)**2) < ltDR : return False
+    return True
+
+@jit
+def bestPairsKernel(off1, off2, good1, good2, eta1, phi1, eta2, phi2, drCut, foldPhi, sameCollection, keys1, keys2, owner,
+                    passEvent, zEta, zPhi, ltDR) :
+    nEvents = len(off1) - 1
+    nKeys = len(owner)
+    useZ = len(zEta) > 0
+    jt1 = -np.ones(nEvents,dtype=np.int64)
+    jt2 = -np.ones(nEvents,dtype=np.int64)
+    best = np.zeros(nKeys)
+    cand = np.zeros(nKeys)
+    ok2 = np.zeros(len(good2),dtype=np.bool_)
+    for event in range(nEvents) :
+        if not passEvent[event] : continue
+        for j in range(off2[event],off2[event+1]) :
+            ok2[j] = good2[j] and (not useZ or farFromZ(eta2[j],phi2[j],zEta[event],zPhi[event],ltDR))
+        for i in range(off1[event],off1[event+1]) :
+            if not good1[i] : continue
+            if useZ and not farFromZ(eta1[i],phi1[i],zEta[event],zPhi[event],ltDR) : continue
+            for j in range(off2[event],off2[event+1]) :
+                if not ok2[j] : continue
+                if sameCollection and j - off2[event] == i - off1[event] : continue
+                dPhi = abs(phi2[j]-phi1[i])
+                if foldPhi : dPhi = min(dPhi,2.*np.pi-dPhi)
+                if np.sqrt(dPhi*dPhi + (eta2[j]-eta1[i])**2) < drCut : continue
+                for k in range(nKeys) :
+                    if owner[k] == 0 : cand[k] = keys1[k,i]
+                    else : cand[k] = keys2[k,j]
+                if jt1[event] < 0 or isBetter(cand,best,nKeys) :
+                    jt1[event], jt2[event] = i - off1[event], j - off2[event]
+                    for k in range(nKeys) : best[k] = cand[k]
+    return jt1, jt2
+
+def getKeyArrays(keys, owner, n1, n2) :
+    # (nKeys x objects) arrays of the keys of each collection; the rows of the other collection are unused
+    keys1, keys2 = np.zeros((len(keys),n1)), np.zeros((len(keys),n2))
+    for k, (values, o) in enumerate(zip(keys,owner)) :
+        if o == 0 : keys1[k] = values
+        else : keys2[k] = values
+    return keys1, keys2
+
+def bestPairs(off1, off2, good1, good2, eta1, phi1, eta2, phi2, drCut, foldPhi, sameCollection, keys, owner,
+              passEvent=None, zEta=None, zPhi=None, ltDR=0.) :
+    """ pairKernels.bestPairs(): return (jt1, jt2), the indices within each event of the members of its
+                                 best pair (-1 if there is none).   keys are the ranking arrays, most
+                                 important first, and owner[k] tells if keys[k] belongs to the first (0)
+                                 or to the second (1) collection.   Only the events in passEvent (all
+                                 if None) get a pair; zEta and zPhi, (events x 2) arrays of the Z
+                                 leptons, add the ltDR cut of both objects to them.
+    """
+    nEvents = len(off1) - 1
+    keys1, keys2 = getKeyArrays(keys,owner,len(good1),len(good2))
+    f8 = lambda x : np.ascontiguousarray(x,dtype=np.float64)
+    if passEvent is None : passEvent = np.ones(nEvents,dtype=np.bool_)
+    if zEta is None : zEta, zPhi = np.zeros((0,2)), np.zeros((0,2))
+    return bestPairsKernel(np.asarray(off1,dtype=np.int64),np.asarray(off2,dtype=np.int64),
+                           np.ascontiguousarray(good1,dtype=np.bool_),np.ascontiguousarray(good2,dtype=np.bool_),
+                           f8(eta1),f8(phi1),f8(eta2),f8(phi2),float(drCut),bool(foldPhi),bool(sameCollection),
+                           keys1,keys2,np.asarray(owner,dtype=np.int64),
+                           np.ascontiguousarray(passEvent,dtype=np.bool_),f8(zEta),f8(zPhi),float(ltDR))
@@ -0,0 +1,199 @@
+# columnar (vectorized) selection of the H->tau tau pair, for a whole chunk of events at a time
+#
+# The arrays are those of arrayReader.getArrays() or an eventBatch: jagged branches such as
+# Tau_pt hold the objects of all events one after the other, and the offsets of their
+# n<Collection> counter give where each event starts.   The cuts are those of tauFun.getETauPairs(), getMuTauPairs(),
+# getEMuTauPairs() and getTauList()/getBestTauPair(), taken from the same selections dictionary,
+# and the best pair is the one that the single pass of the bubble sort of tauFun brings to the front.
+# Since that pass swaps two pairs when compare*Pair() ranks the earlier one better, this is the
+# first pair, in the order in which tauFun forms them, among those that compare*Pair() ranks
+# lowest, e.g. the pair with the largest Tau_rawMVAoldDM2017v2 of the leading tau (tt) or the
+# largest Muon_pfRelIso04_all (mt); the ranking keys below are ordered accordingly.
+# As in ZH.py, where the pairs are formed for each category once a Z has been found, the
+# category (e.g. 'eemt') adds the vetoes of tauFun for that category, and the eta and phi of
+# the two Z leptons the separation of both objects from them (lt_DR).   The sync sample has no
+# Z, and without them only the cuts of the channel (e.g. 'mt') are applied.
+# The objects are selected with array operations; the pairs are formed by the compiled loops of
+# pairKernels.py when numba is installed, and with array operations on all pairs otherwise.
+
+import numpy as np
+import eventBatch
+import pairKernels
+
+def getBranches(channel) :
+    # branches read by getBestPairs() for the given channel
+    tau = ['nTau','Tau_pt','Tau_eta','Tau_phi','Tau_dz','Tau_charge','Tau_idAntiMu','Tau_idAntiEle',
+           'Tau_idDecayMode','Tau_idMVAoldDM2017v2','Tau_rawMVAoldDM2017v2']
+    if channel == 'tt' : return tau
+    if channel == 'mt' :
+        return tau + ['nMuon','Muon_pt','Muon_eta','Muon_phi','Muon_dxy','Muon_dz','Muon_mediumId','Muon_pfRelIso04_all']
+    if channel == 'em' :
+        return ['nMuon','Muon_pt','Muon_eta','Muon_phi','Muon_dxy','Muon_dz','Muon_mediumId','Muon_pfRelIso04_all',
+                'nElectron','Electron_pt','Electron_eta','Electron_phi','Electron_dxy','Electron_dz','Electron_lostHits',
+                'Electron_convVeto','Electron_mvaFall17V2noIso_WP90','Electron_mvaFall17V2Iso','Electron_pfRelIso03_all']
+    if channel == 'et' :
+        return tau + ['nElectron','Electron_pt','Electron_eta','Electron_phi','Electron_dxy','Electron_dz','Electron_lostHits',
+                      'Electron_convVeto','Electron_mvaFall17V2noIso_WP90','Electron_mvaFall17V2Iso']
+    print("Error in pairSelection.getBranches(): invalid channel={0:s}".format(channel))
+    exit()
+
+def getPairs(n1, n2, sameCollection=False) :
+    """ pairSelection.getPairs(): return (event, i, j) for all combinations of object i of the first
+                                  and object j of the second collection in each event, in the order
+                                  of the loops in tauFun (i outer, j inner).  i and j count from the
+                                  start of the event.   With sameCollection pairs with i == j are left out.
+    """
+    n1, n2 = np.asarray(n1,dtype=np.int64), np.asarray(n2,dtype=np.int64)
+    nPairs = n1*n2
+    event = np.repeat(np.arange(len(n1)),nPairs)
+    start = np.cumsum(nPairs) - nPairs
+    k = np.arange(len(event)) - start[event]
+    i, j = k // n2[event], k % n2[event]
+    if sameCollection :
+        keep = i != j
+        event, i, j = event[keep], i[keep], j[keep]
+    return event, i, j
+
+def getBest(nEvents, event, rankKeys) :
+    """ pairSelection.getBest(): return for each event the position in event[] of its best pair, or -1.
+                                 rankKeys are arrays ordered from the most to the least important,
+                                 with smaller values being better.
+    """
+    best = -np.ones(nEvents,dtype=np.int64)
+    if len(event) < 1 : return best
+    position = np.arange(len(event))
+    # np.lexsort sorts on its last key first
+    order = np.lexsort([position] + list(rankKeys[::-1]) + [event])
+    first = np.ones(len(order),dtype=bool)
+    first[1:] = event[order][1:] != event[order][:-1]
+    best[event[order][first]] = order[first]
+    return best
+
+def countPerEvent(mask, offsets) :
+    # number of selected objects in each event
+    total = np.concatenate([[0],np.cumsum(mask.astype(np.int64))])
+    return total[offsets[1:]] - total[offsets[:-1]]
+
+def tauMask(a, cuts, channel) :
+    # the tau(h) cuts of getETauPairs() (et), getMuTauPairs() (mt) or getTauList() (tt)
+    mask = (a['Tau_pt'] >= cuts['tau_pt']) & (np.abs(a['Tau_eta']) <= cuts['tau_eta'])
+    mask &= (a['Tau_idAntiMu'].astype(int) > cuts['tau_antiMu']) & (a['Tau_idAntiEle'].astype(int) > cuts['tau_antiEle'])
+    mask &= np.abs(a['Tau_dz']) <= cuts['tau_dz']
+    if channel == 'tt' or cuts['tau_decayMode'] : mask &= a['Tau_idDecayMode'].astype(bool)
+    if channel != 'tt' : mask &= a['Tau_idMVAoldDM2017v2'].astype(int) > cuts['tau_ID']
+    if channel != 'mt' : mask &= (np.abs(a['Tau_charge']) > 0.5) & (np.abs(a['Tau_charge']) < 1.5)
+    return mask
+
+def muonMask(a, cuts) :
+    mask = (np.abs(a['Muon_dxy']) <= cuts['mu_dxy']) & (np.abs(a['Muon_dz']) <= cuts['mu_dz'])
+    mask &= (a['Muon_pt'] >= cuts['mu_pt']) & (np.abs(a['Muon_eta']) <= cuts['mu_eta'])
+    if cuts['mu_ID'] : mask &= a['Muon_mediumId'].astype(bool)
+    return mask
+
+def electronMask(a, cuts) :
+    mask = (np.abs(a['Electron_dxy']) <= cuts['ele_dxy']) & (np.abs(a['Electron_dz']) <= cuts['ele_dz'])
+    mask &= a['Electron_lostHits'].astype(int) <= cuts['ele_lostHits']
+    mask &= (a['Electron_pt'] >= cuts['ele_pt']) & (np.abs(a['Electron_eta']) <= cuts['ele_eta'])
+    if cuts['ele_ID'] : mask &= a['Electron_mvaFall17V2noIso_WP90'].astype(bool)
+    if cuts['ele_convVeto'] : mask &= a['Electron_convVeto'].astype(bool)
+    return mask
+
+def farFromZ(eta, phi, event, zEta, zPhi, ltDR) :
+    # objects whose tauFun.lTauDR() to both Z leptons of their event is at least ltDR
+    far = np.ones(len(eta),dtype=bool)
+    for k in range(zEta.shape[1]) :
+        far &= np.logical_not(eventBatch.getDR(zEta[event,k],zPhi[event,k],eta,phi) < ltDR)
+    return far
+
+def bestPairsNumPy(off1, off2, good1, good2, eta1, phi1, eta2, phi2, drCut, foldPhi, sameCollection, keys, owner,
+                   passEvent=None, zEta=None, zPhi=None, ltDR=0.) :
+    # pairKernels.bestPairs() with array operations on all the pairs of the chunk at once
+    n1, n2 = off1[1:] - off1[:-1], off2[1:] - off2[:-1]
+    if passEvent is not None : n1, n2 = np.where(passEvent,n1,0), np.where(passEvent,n2,0)
+    if zEta is not None :
+        zEta, zPhi = np.asarray(zEta,dtype=np.float64), np.asarray(zPhi,dtype=np.float64)
+        good1 = good1 & farFromZ(eta1.astype(np.float64),phi1.astype(np.float64),np.repeat(np.arange(len(n1)),off1[1:]-off1[:-1]),zEta,zPhi,ltDR)
+        good2 = good2 & farFromZ(eta2.astype(np.float64),phi2.astype(np.float64),np.repeat(np.arange(len(n2)),off2[1:]-off2[:-1]),zEta,zPhi,ltDR)
+    event, i, j = getPairs(n1,n2,sameCollection=sameCollection)
+    k1, k2 = off1[event] + i, off2[event] + j
+    keep = good1[k1] & good2[k2]
+    eta1, phi1 = eta1[k1].astype(np.float64), phi1[k1].astype(np.float64)
+    eta2, phi2 = eta2[k2].astype(np.float64), phi2[k2].astype(np.float64)
+    if foldPhi : keep &= eventBatch.getDR(eta1,phi1,eta2,phi2) >= drCut
+    else : keep &= np.sqrt((phi2-phi1)**2 + (eta2-eta1)**2) >= drCut
+    event, i, j, k1, k2 = event[keep], i[keep], j[keep], k1[keep], k2[keep]
+    best = getBest(len(n1),event,[values[k1] if o == 0 else values[k2] for values, o in zip(keys,owner)])
+    jt1, jt2 = -np.ones(len(n1),dtype=np.int64), -np.ones(len(n1),dtype=np.int64)
+    has = best >= 0
+    jt1[has], jt2[has] = i[best[has]], j[best[has]]
+    return jt1, jt2
+
+def getCategoryVetoes(a, cuts, cat) :
+    # (passEvent, goodTau): the events with enough leptons for cat, and the taus that pass its
+    # additional tau(h) cut, as in getMuTauPairs(), getETauPairs() and getEMuTauPairs(); None if none
+    passEvent, goodTau = None, None
+    if cat in ['mmmt','mmem'] : passEvent = np.asarray(a['nMuon']) >= 3
+    if cat in ['eeet','eeem'] : passEvent = np.asarray(a['nElectron']) >= 3
+    if cat == 'eemt' : goodTau = a['Tau_idAntiMu'].astype(int) >= cuts['tau_eemt_antiMu']
+    if cat == 'eeet' : goodTau = a['Tau_idAntiEle'].astype(int) >= cuts['tau_eeet_antiEle']
+    return passEvent, goodTau
+
+def getBestPairs(a, channel, selections, useKernels=None, cat=None, zEta=None, zPhi=None, passEvent=None) :
+    """ pairSelection.getBestPairs(): return (jt1, jt2, nGood), the indices within each event of the
+                                      members of the best pair (-1 if there is none) and the number of
+                                      good taus (tt) or of good leptons (et, mt; electrons for em) in
+                                      each event.   cat (e.g. 'eemt') adds the vetoes of that category,
+                                      zEta and zPhi, (events x 2) arrays of the Z leptons, the lt_DR cut,
+                                      and only the events in passEvent (e.g. those with a Z) get a pair.
+                                      The pairs are formed by the compiled loops of pairKernels.py if
+                                      useKernels, by default when numba is installed.
+    """
+    cuts = selections[channel]
+    offTau = eventBatch.getOffsets(a,'Tau')
+    vetoEvent, vetoTau = getCategoryVetoes(a,cuts,cat)
+    if vetoEvent is not None : passEvent = vetoEvent if passEvent is None else passEvent & vetoEvent
+    if channel == 'tt' :
+        goodTau = tauMask(a,cuts,channel)
+        raw, pt = a['Tau_rawMVAoldDM2017v2'], a['Tau_pt']
+        # tauFun.tauDR() does not fold dPhi into [0,pi]
+        pairArgs = (offTau,offTau,goodTau,goodTau,a['Tau_eta'],a['Tau_phi'],a['Tau_eta'],a['Tau_phi'],cuts['tt_DR'],False,True,
+                    [-raw,pt,-raw,pt],[0,0,1,1])
+        off1, good1 = offTau, goodTau
+    elif channel in ['mt','et'] :
+        goodTau = tauMask(a,cuts,channel)
+        if vetoTau is not None : goodTau &= vetoTau
+        if channel == 'mt' :
+            lep, goodLep, drCut, iso = 'Muon', muonMask(a,cuts), cuts['mt_DR'], a['Muon_pfRelIso04_all']
+        else :
+            lep, goodLep, drCut, iso = 'Electron', electronMask(a,cuts), cuts['tt_DR'], a['Electron_mvaFall17V2Iso']
+        offLep = eventBatch.getOffsets(a,lep)
+        pairArgs = (offLep,offTau,goodLep,goodTau,a[lep+'_eta'],a[lep+'_phi'],a['Tau_eta'],a['Tau_phi'],drCut,True,False,
+                    [-iso,a[lep+'_pt'],-a['Tau_rawMVAoldDM2017v2']],[0,0,1])
+        off1, good1 = offLep, goodLep
+    elif channel == 'em' :
+        # tauFun.getEMuTauPairs() loops over the muons first, but returns [electron,muon]
+        goodMuon, goodElectron = muonMask(a,cuts), electronMask(a,cuts)
+        if cuts['mu_iso'] : goodMuon &= a['Muon_pfRelIso04_all'] <= 0.25
+        if cuts['ele_iso'] : goodElectron &= a['Electron_pfRelIso03_all'] <= 0.5
+        offMuon, offElectron = eventBatch.getOffsets(a,'Muon'), eventBatch.getOffsets(a,'Electron')
+        pairArgs = (offMuon,offElectron,goodMuon,goodElectron,a['Muon_eta'],a['Muon_phi'],a['Electron_eta'],a['Electron_phi'],
+                    cuts['em_DR'],True,False,[-a['Electron_mvaFall17V2Iso'],a['Electron_pt'],-a['Muon_pt']],[1,1,0])
+        off1, good1 = offElectron, goodElectron
+    else :
+        print("Error in pairSelection.getBestPairs(): invalid channel={0:s}".format(channel))
+        exit()
+
+    zArgs = (passEvent,zEta,zPhi,cuts['lt_DR'] if zEta is not None else 0.)
+    if useKernels is None : useKernels = pairKernels.available
+    if useKernels : jt1, jt2 = pairKernels.bestPairs(*(pairArgs+zArgs))
+    else : jt1, jt2 = bestPairsNumPy(*(pairArgs+zArgs))
+    nGood = countPerEvent(good1,off1)
+
+    if channel == 'tt' :
+        # the leading tau comes first
+        has = jt1 >= 0
+        swap = np.zeros(len(jt1),dtype=bool)
+        swap[has] = pt[offTau[:-1][has]+jt2[has]] > pt[offTau[:-1][has]+jt1[has]]
+        jt1[swap], jt2[swap] = jt2[swap], jt1[swap]
+    if channel == 'em' : jt1, jt2 = jt2, jt1
+    return jt1, jt2, nGood
@@ -0,0 +1,127 @@
+# skims of the nanoAOD input of ZH.py: the events that pass its category independent
+# preselection (a tau, two good leptons of the same flavour, the trigger and 60 < M(ll) < 120)
+#
+# 'events' copies the selected events to {job}_skim.root, with only the branches that ZH.py
+# reads (see GF.pruneBranches()), so that ZH.py can be rerun on the skim with other tau
+# selections.   'entries' writes the entry numbers of the selected events, with the input files,
+# to {job}.skim (JSON), and ZH.py --entryList reads only those entries of the same input.
+# Both keep the pileup histograms (hMC, hWeight) of all the input events of the job, which a
+# rerun on the skim takes instead of filling them from the skimmed events (restoreHistos()).
+# When the rerun is split into entry ranges, those of each skim are taken by the one job whose
+# range contains the start of the skim (ownsStart()), so that the merged jobs count them once.
+
+import os
+import json
+
+modes = ['entries','events']
+title = 'Events skimmed by ZH.py'
+
+def getFileName(outFileName, mode) :
+    if mode == 'events' : return os.path.splitext(outFileName)[0] + '_skim.root'
+    return os.path.splitext(outFileName)[0] + '.skim'
+
+class skimWriter() :
+
+    def __init__(self, fileName, mode, inTree, inFileNames, firstEntry=0) :
+        self.fileName, self.mode, self.inFileNames = fileName, mode, inFileNames
+        self.firstEntry = firstEntry
+        self.entries = []
+        self.nEvents = 0
+        if mode == 'events' :
+            import ROOT
+            savedDir = ROOT.gDirectory.GetDirectory('')
+            self.f = ROOT.TFile(fileName,'recreate')
+            # a copy of the active (not pruned) branches; a TChain keeps its addresses when it changes file
+            self.t = inTree.CloneTree(0)
+            self.t.SetTitle(title)
+            savedDir.cd()
+
+    def fill(self, entry) :
+        # called after inTree.GetEntry(entry)
+        self.nEvents += 1
+        if self.mode == 'events' : self.t.Fill()
+        else : self.entries.append(int(entry))
+        return
+
+    def write(self, nInput, histos=[]) :
+        if self.mode == 'events' :
+            import ROOT
+            savedDir = ROOT.gDirectory.GetDirectory('')
+            self.f.cd()
+            self.t.Write()
+            for h in histos : h.Write()
+            self.f.Close()
+            savedDir.cd()
+        else :
+            d = { 'files':self.inFileNames, 'treeName':'Events', 'firstEntry':self.firstEntry, 'nInput':nInput,
+                  'entries':self.entries, 'histos':dict([(h.GetName(),histoToDict(h)) for h in histos]) }
+            with open(self.fileName + '.tmp','w') as f : json.dump(d,f)
+            os.rename(self.fileName + '.tmp',self.fileName)
+        print("Skim: {0:d} of {1:d} events written to {2:s}".format(self.nEvents,nInput,self.fileName))
+        return
+
+def histoToDict(h) :
+    # bin contents (with under and overflow), squared errors and number of entries of a TH1
+    bins = range(h.GetNbinsX()+2)
+    return { 'contents':[h.GetBinContent(i) for i in bins], 'errors2':[h.GetBinError(i)**2 for i in bins],
+             'entries':h.GetEntries() }
+
+def setHisto(h, d) :
+    # the reverse of histoToDict()
+    for i, (c, e2) in enumerate(zip(d['contents'],d['errors2'])) :
+        h.SetBinContent(i,c)
+        h.SetBinError(i,e2**0.5)
+    h.ResetStats()
+    h.SetEntries(d['entries'])
+    return
+
+def ownsStart(start, nFirst, nMax, nEntries) :
+    # True for the one job, of those that split the nEntries entries of their input into ranges
+    # [nFirst,nMax), whose range contains entry start (the last job also takes start = nEntries)
+    return nFirst <= start and (start < nMax or nMax >= nEntries)
+
+def isSkim(inFileNames, treeName='Events', histoNames=['hMC','hWeight']) :
+    # True if any of the input files was written by skimWriter: its tree has the skim title, or
+    # it holds the pileup histograms.   Read from the files, not the chain, which has no tree to
+    # look at when the skims are empty.
+    from ROOT import TFile
+    for fileName in inFileNames :
+        f = TFile.Open(fileName)
+        if not f or f.IsZombie() : continue
+        t = f.Get(treeName)
+        found = (t and t.GetTitle() == title) or all([f.Get(name) for name in histoNames])
+        f.Close()
+        if found : return True
+    return False
+
+def readEntries(fileName) :
+    """ skim.readEntries(): the dictionary written by skimWriter.write() in 'entries' mode
+    """
+    return json.load(open(fileName,'r'))
+
+def restoreHistos(histos, inFileNames, nFirst, nMax, nEntries, entryList=None, treeName='Events') :
+    """ skim.restoreHistos(): set the histograms to those of the full input kept by the skim, from
+                              the entry list or from the skim files (see isSkim()), for the job that
+                              processes entries [nFirst,nMax) of the nEntries of its input; only the
+                              skims that start in that range are taken (ownsStart()).   Return False,
+                              leaving the histograms untouched, if they are not there.
+    """
+    if entryList is not None :
+        if not all([h.GetName() in entryList['histos'] for h in histos]) : return False
+        if ownsStart(entryList['firstEntry'],nFirst,nMax,nEntries) :
+            for h in histos : setHisto(h,entryList['histos'][h.GetName()])
+        return True
+    from ROOT import TFile
+    stored, start = [], 0
+    for fileName in inFileNames :
+        f = TFile.Open(fileName)
+        stored.append((f,[f.Get(h.GetName()) for h in histos],start))
+        if not all(stored[-1][1]) :
+            for f, hh, start in stored : f.Close()
+            return False
+        start += f.Get(treeName).GetEntries()
+    for f, hh, start in stored :
+        if ownsStart(start,nFirst,nMax,nEntries) :
+            for h, hSkim in zip(histos,hh) : h.Add(hSkim)
+        f.Close()
+    return True
@@ -0,0 +1,110 @@
+# wall and CPU time per stage of the event processing
+#
+# start(stage)/stop(stage) bracket a piece of code, wrap() times every call of a function or
+# method (e.g. tauFun.findETrigger, which outTuple.Fill() calls through the module), and add()
+# takes times measured elsewhere, such as those of FastMTT's TBenchmark clock.   Stages may be
+# nested, the time of a stage includes that of the stages inside it.   The report of a job is
+# written to {job}.timing (JSON) and optionally as CSV, and the reports of several jobs are
+# added with mergeFiles().   A disabled timer (enabled=False) does nothing, so the calls can
+# stay in the event loop.
+
+import os
+import time
+import json
+
+try :
+    cpuTime = time.process_time
+except AttributeError :
+    cpuTime = time.clock      # python 2: CPU time on unix
+
+def getFileName(outFileName) :
+    return os.path.splitext(outFileName)[0] + '.timing'
+
+class stageTimer() :
+
+    def __init__(self, enabled=True) :
+        self.enabled = enabled
+        self.stages = []
+        self.calls, self.wall, self.cpu = {}, {}, {}
+        self.started = {}
+        self.nEvents = 0
+
+    def addStage(self, stage) :
+        self.stages.append(stage)
+        self.calls[stage], self.wall[stage], self.cpu[stage] = 0, 0., 0.
+        return
+
+    def start(self, stage) :
+        if not self.enabled : return
+        self.started[stage] = (time.time(),cpuTime())
+        return
+
+    def stop(self, stage) :
+        if not self.enabled : return
+        t0, c0 = self.started.pop(stage)
+        self.add(stage,time.time()-t0,cpuTime()-c0)
+        return
+
+    def add(self, stage, wall, cpu=0., calls=1) :
+        if not self.enabled : return
+        if not stage in self.calls : self.addStage(stage)
+        self.calls[stage] += calls
+        self.wall[stage] += wall
+        self.cpu[stage] += cpu
+        return
+
+    def wrap(self, owner, name, stage) :
+        # replace owner.name (a module function or an object's method) by a timed version
+        if not self.enabled : return
+        func = getattr(owner,name)
+        def timed(*args, **kwargs) :
+            t0, c0 = time.time(), cpuTime()
+            try :
+                return func(*args,**kwargs)
+            finally :
+                self.add(stage,time.time()-t0,cpuTime()-c0)
+        setattr(owner,name,timed)
+        return
+
+    def merge(self, other) :
+        for stage in other.stages : self.add(stage,other.wall[stage],other.cpu[stage],other.calls[stage])
+        self.nEvents += other.nEvents
+        return self
+
+    def printSummary(self) :
+        print("Stage                      Calls    Wall(s)     CPU(s)  Wall/event(us)")
+        for stage in self.stages :
+            print("{0:24s}{1:9d}{2:11.2f}{3:11.2f}{4:16.1f}".format(stage,self.calls[stage],self.wall[stage],self.cpu[stage],
+                1.e6*self.wall[stage]/max(self.nEvents,1)))
+        return
+
+    def toDict(self) :
+        return { 'nEvents':self.nEvents,
+                 'stages':[{ 'stage':s, 'calls':self.calls[s], 'wall':self.wall[s], 'cpu':self.cpu[s] } for s in self.stages] }
+
+    def write(self, fileName, csv=False) :
+        if not self.enabled : return
+        with open(fileName,'w') as f : json.dump(self.toDict(),f)
+        if csv :
+            outLines = ['stage,calls,wall,cpu,nEvents\n']
+            for s in self.stages :
+                outLines.append("{0:s},{1:d},{2:.6f},{3:.6f},{4:d}\n".format(s,self.calls[s],self.wall[s],self.cpu[s],self.nEvents))
+            open(os.path.splitext(fileName)[0] + '_timing.csv','w').writelines(outLines)
+        return
+
+def read(fileName) :
+    d = json.load(open(fileName,'r'))
+    timer = stageTimer()
+    for s in d['stages'] : timer.add(s['stage'],s['wall'],s['cpu'],s['calls'])
+    timer.nEvents = d['nEvents']
+    return timer
+
+def mergeFiles(fileNames) :
+    """ stageTimer.mergeFiles(): return the sum of the timing reports in the given files, None if there are none
+    """
+    total = None
+    for fileName in fileNames :
+        timer = read(fileName)
+        if total is None : total = timer
+        else : total.merge(timer)
+    return total
@@ -0,0 +1,179 @@
+# synthetic nanoAOD-like events for benchmarking the selection code without a real input file
+#
+# makeEvents() returns the branches in the layout of arrayReader.getArrays(): one numpy array
+# per branch, the jagged ones (Tau_pt, ...) as the content of all events one after the other,
+# with the n<Collection> counters giving the number of objects of each event.   The numbers
+# and kinematics of the objects are roughly those of ZH->ll tau tau MC: a fraction of the
+# events has a Z->ee or Z->mumu pair at the Z mass with a trigger object on the leading
+# lepton, on top of Poisson distributed extra leptons, taus, jets and trigger objects, and
+# the gen record holds Z -> ll and H -> tau tau with the tau decays.   The same seed always
+# gives the same events.   eventBatch.eventView gives per-event access in the style of a PyROOT
+# TTree, so that the per-event (scalar) code can run on the same events.
+
+import numpy as np
+import arrayReader
+
+triggers = ['HLT_Ele27_WPTight_Gsf','HLT_Ele32_WPTight_Gsf','HLT_Ele35_WPTight_Gsf','HLT_IsoMu24','HLT_IsoMu27']
+
+def getPt(rng, n, ptMin, slope) :
+    return (ptMin + rng.exponential(slope,n)).astype(np.float32)
+
+def makeCollection(rng, n, ptMin, slope) :
+    # pt, eta, phi of n objects
+    return getPt(rng,n,ptMin,slope), rng.normal(0.,1.3,n).clip(-2.5,2.5).astype(np.float32), \
+           rng.uniform(-np.pi,np.pi,n).astype(np.float32)
+
+def insertZ(rng, nEvents, counts, pt, eta, phi, charge, hasZ) :
+    # make the first two objects of the events with hasZ an opposite charge pair at the Z mass
+    first = arrayReader.getOffsets(counts)[:-1][hasZ]
+    mass = rng.normal(91.19,2.5,len(first))
+    pt1 = 25. + rng.exponential(20.,len(first))
+    dEta, dPhi = eta[first+1] - eta[first], phi[first+1] - phi[first]
+    pt2 = mass**2/(2.*pt1*np.maximum(np.cosh(dEta)-np.cos(dPhi),1.e-3))
+    pt[first], pt[first+1] = pt1, np.clip(pt2,10.,500.)
+    charge[first], charge[first+1] = 1, -1
+    return first
+
+def makeEvents(nEvents, seed=1, fracZee=0.35, fracZmm=0.35) :
+    """ syntheticEvents.makeEvents(): return a dictionary of numpy arrays, one per branch,
+                                      for nEvents synthetic events
+    """
+    rng = np.random.RandomState(seed)
+    a = {}
+    a['run'] = np.full(nEvents,1,dtype=np.uint32)
+    a['luminosityBlock'] = (1 + np.arange(nEvents)//1000).astype(np.uint32)
+    a['event'] = (1 + np.arange(nEvents)).astype(np.uint64)
+    mode = rng.uniform(0.,1.,nEvents)
+    isZee, isZmm = mode < fracZee, (mode >= fracZee) & (mode < fracZee+fracZmm)
+
+    # electrons and muons, with the Z pair first
+    for lep, isZ, mass in [('Electron',isZee,0.000511),('Muon',isZmm,0.105)] :
+        n = rng.poisson(0.4,nEvents) + 2*isZ
+        a['n'+lep] = n.astype(np.int32)
+        nTot = int(np.sum(n))
+        pt, eta, phi = makeCollection(rng,nTot,7.,15.)
+        charge = rng.choice([-1,1],nTot).astype(np.int32)
+        insertZ(rng,nEvents,n,pt,eta,phi,charge,isZ)
+        a[lep+'_pt'], a[lep+'_eta'], a[lep+'_phi'], a[lep+'_charge'] = pt, eta, phi, charge
+        a[lep+'_mass'] = np.full(nTot,mass,dtype=np.float32)
+        a[lep+'_dxy'] = rng.normal(0.,0.01,nTot).astype(np.float32)
+        a[lep+'_dz'] = rng.normal(0.,0.03,nTot).astype(np.float32)
+        a[lep+'_genPartFlav'] = rng.choice([0,1,15],nTot,p=[0.1,0.8,0.1]).astype(np.uint8)
+    nTot = len(a['Electron_pt'])
+    a['Electron_lostHits'] = rng.choice([0,1,2],nTot,p=[0.85,0.1,0.05]).astype(np.uint8)
+    a['Electron_convVeto'] = rng.uniform(0.,1.,nTot) < 0.95
+    a['Electron_cutBased'] = rng.randint(0,5,nTot).astype(np.int32)
+    a['Electron_mvaFall17V2Iso'] = rng.uniform(-1.,1.,nTot).astype(np.float32)
+    a['Electron_mvaFall17V2noIso'] = rng.uniform(-1.,1.,nTot).astype(np.float32)
+    a['Electron_mvaFall17V2noIso_WP90'] = rng.uniform(0.,1.,nTot) < 0.8
+    a['Electron_pfRelIso03_all'] = rng.exponential(0.1,nTot).astype(np.float32)
+    a['Electron_miniPFRelIso_all'] = rng.exponential(0.1,nTot).astype(np.float32)
+    nTot = len(a['Muon_pt'])
+    a['Muon_mediumId'] = rng.uniform(0.,1.,nTot) < 0.9
+    a['Muon_tightId'] = a['Muon_mediumId'] & (rng.uniform(0.,1.,nTot) < 0.9)
+    a['Muon_softId'] = rng.uniform(0.,1.,nTot) < 0.5
+    a['Muon_pfRelIso04_all'] = rng.exponential(0.1,nTot).astype(np.float32)
+
+    # hadronic taus
+    n = rng.poisson(2.,nEvents)
+    a['nTau'] = n.astype(np.int32)
+    nTot = int(np.sum(n))
+    a['Tau_pt'], a['Tau_eta'], a['Tau_phi'] = makeCollection(rng,nTot,18.,20.)
+    a['Tau_mass'] = rng.uniform(0.2,1.5,nTot).astype(np.float32)
+    a['Tau_charge'] = rng.choice([-1,1],nTot).astype(np.int32)
+    a['Tau_dxy'] = rng.normal(0.,0.02,nTot).astype(np.float32)
+    a['Tau_dz'] = rng.normal(0.,0.05,nTot).astype(np.float32)
+    a['Tau_decayMode'] = rng.choice([0,1,10,11],nTot).astype(np.int32)
+    a['Tau_idDecayMode'] = a['Tau_decayMode'] < 11
+    a['Tau_idDecayModeNewDMs'] = np.ones(nTot,dtype=bool)
+    a['Tau_idAntiMu'] = rng.choice([0,1,3],nTot,p=[0.1,0.2,0.7]).astype(np.uint8)
+    a['Tau_idAntiEle'] = rng.choice([0,1,3,7,15,31],nTot).astype(np.uint8)
+    for name in ['Tau_idMVAoldDM2017v2','Tau_idMVAnewDM2017v2','Tau_idMVAoldDMdR032017v2'] :
+        a[name] = rng.choice([0,1,3,7,15,31,63,127],nTot).astype(np.uint8)
+    a['Tau_rawMVAoldDM2017v2'] = rng.uniform(-1.,1.,nTot).astype(np.float32)
+    a['Tau_rawIso'] = rng.exponential(2.,nTot).astype(np.float32)
+    a['Tau_chargedIso'] = rng.exponential(1.,nTot).astype(np.float32)
+    a['Tau_neutralIso'] = rng.exponential(1.,nTot).astype(np.float32)
+    a['Tau_jetIdx'] = -np.ones(nTot,dtype=np.int32)
+    a['Tau_genPartFlav'] = rng.choice([0,1,5],nTot,p=[0.4,0.1,0.5]).astype(np.uint8)
+
+    # jets, pt ordered as in nanoAOD
+    n = rng.poisson(5.,nEvents)
+    a['nJet'] = n.astype(np.int32)
+    nTot = int(np.sum(n))
+    pt, eta, phi = makeCollection(rng,nTot,15.,30.)
+    eta = (eta*1.8).clip(-4.9,4.9)
+    event = np.repeat(np.arange(nEvents),n)
+    order = np.lexsort((-pt,event))
+    a['Jet_pt'], a['Jet_eta'], a['Jet_phi'] = pt[order], eta[order], phi[order]
+    a['Jet_jetId'] = rng.choice([0,2,6],nTot,p=[0.05,0.15,0.8]).astype(np.int32)
+    a['Jet_btagDeepB'] = rng.uniform(0.,1.,nTot).astype(np.float32)**3
+    a['Jet_btagCSVV2'] = rng.uniform(0.,1.,nTot).astype(np.float32)**3
+
+    # trigger objects, one on the leading lepton of each Z pair
+    nExtra = rng.poisson(4.,nEvents)
+    nLep = isZee.astype(np.int64) + isZmm.astype(np.int64)
+    n = nExtra + nLep
+    a['nTrigObj'] = n.astype(np.int32)
+    nTot = int(np.sum(n))
+    a['TrigObj_pt'], a['TrigObj_eta'], a['TrigObj_phi'] = makeCollection(rng,nTot,10.,20.)
+    a['TrigObj_id'] = rng.choice([1,11,13,15,22],nTot).astype(np.int32)
+    a['TrigObj_filterBits'] = rng.randint(0,16,nTot).astype(np.int32)
+    for lep, isZ, pdg in [('Electron',isZee,11),('Muon',isZmm,13)] :
+        k = arrayReader.getOffsets(n)[:-1][isZ]
+        first = arrayReader.getOffsets(a['n'+lep])[:-1][isZ]
+        a['TrigObj_eta'][k], a['TrigObj_phi'][k] = a[lep+'_eta'][first], a[lep+'_phi'][first]
+        a['TrigObj_pt'][k], a['TrigObj_id'][k], a['TrigObj_filterBits'][k] = a[lep+'_pt'][first], pdg, 10
+    for name in triggers : a[name] = (isZee if 'Ele' in name else isZmm) & (rng.uniform(0.,1.,nEvents) < 0.9)
+
+    a['Photon_pt'], a['Photon_eta'], a['Photon_phi'] = np.zeros(0,dtype=np.float32), np.zeros(0,dtype=np.float32), np.zeros(0,dtype=np.float32)
+    a['nPhoton'] = np.zeros(nEvents,dtype=np.int32)
+    for met in ['MET','PuppiMET'] :
+        a[met+'_pt'] = rng.exponential(30.,nEvents).astype(np.float32)
+        a[met+'_phi'] = rng.uniform(-np.pi,np.pi,nEvents).astype(np.float32)
+    a['genWeight'] = rng.choice([-1.,1.],nEvents,p=[0.1,0.9]).astype(np.float32)
+    a['Generator_weight'] = a['genWeight'].copy()
+    a['LHEWeight_originalXWGTUP'] = a['genWeight'].copy()
+    a['LHE_Njets'] = rng.randint(0,4,nEvents).astype(np.uint8)
+    a['Pileup_nPU'] = rng.poisson(30.,nEvents).astype(np.int32)
+    a.update(makeGenParticles(rng,nEvents,isZee,isZmm))
+    return a
+
+def makeGenParticles(rng, nEvents, isZee, isZmm) :
+    # two partons, Z and H, the Z leptons, the two taus and their decays, and a few other particles
+    zLep = np.where(isZee,11,np.where(isZmm,13,rng.choice([1,2,3],nEvents)))
+    tauLep = rng.choice([11,13,211],(nEvents,2),p=[0.175,0.175,0.65])
+    nExtra = rng.poisson(5.,nEvents)
+    nFixed = 12
+    n = nFixed + nExtra
+    offsets = arrayReader.getOffsets(n)
+    nTot = int(offsets[-1])
+    pdg, mother = np.zeros(nTot,dtype=np.int32), np.zeros(nTot,dtype=np.int32)
+    status = np.ones(nTot,dtype=np.int32)
+    start = offsets[:-1]
+    #            0   1   2   3   4     5     6    7    8      9         10     11
+    # particle  g   g   Z   H   l-    l+    tau- tau+ nu_tau  tau- child nu_tau tau+ child
+    fixed = [(21,-1,21),(21,-1,21),(23,0,62),(25,0,62),(0,2,1),(0,2,1),(15,3,2),(-15,3,2),(16,6,1),(0,6,1),(-16,7,1),(0,7,1)]
+    for i, (p, m, s) in enumerate(fixed) :
+        pdg[start+i], mother[start+i], status[start+i] = p, m, s
+    pdg[start+4], pdg[start+5] = zLep, -zLep
+    pdg[start+9], pdg[start+11] = tauLep[:,0], -tauLep[:,1]
+    # the other particles come from one of the partons
+    event = np.repeat(np.arange(nEvents),n)
+    local = np.arange(nTot) - start[event]
+    extra = local >= nFixed
+    pdg[extra] = rng.choice([22,211,-211,111],int(np.sum(extra)))
+    mother[extra] = rng.randint(0,2,int(np.sum(extra)))
+    a = { 'nGenPart':n.astype(np.int32), 'GenPart_pdgId':pdg, 'GenPart_genPartIdxMother':mother, 'GenPart_status':status }
+    a['GenPart_pt'], a['GenPart_eta'], a['GenPart_phi'] = makeCollection(rng,nTot,1.,20.)
+    a['GenPart_mass'] = np.zeros(nTot,dtype=np.float32)
+    return a
+
+def writeEvents(fileName, a) :
+    # a compressed numpy (.npz) file: a columnar file that needs nothing but numpy
+    np.savez_compressed(fileName,**a)
+    return
+
+def readEvents(fileName) :
+    f = np.load(fileName)
+    return dict([(b,f[b]) for b in f.files])
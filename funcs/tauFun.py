@@ -3,18 +3,36 @@
 """ tauFun.py: apply selection sequence to four-lepton final state """
 
 import io
-import yaml
-import subprocess
-from ROOT import TLorentzVector
 from math import sqrt, sin, cos, pi
 
 __author__ = "Dan Marlow, Alexis Kalogeropoulos, Gage DeZoort"
 __date__   = "Monday, Oct. 28th, 2019"
 
-# get selections from configZH.yaml:
-with io.open('configZH_tight.yaml', 'r') as stream:
-    selections = yaml.load(stream)
-print "Using selections:\n", selections
+# selections from configZH_tight.yaml in the directory the job runs in, read on first use so that
+# the module can be imported without it (and without ROOT, which only findZ*() need)
+configFile = 'configZH_tight.yaml'
+selections = None
+
+def getSelections() :
+    global selections
+    if selections is None :
+        import yaml
+        with io.open(configFile, 'r') as stream:
+            selections = yaml.load(stream)
+        print("Using selections:\n{0:s}".format(str(selections)))
+    return selections
+
+def getBranches(era) :
+    # nanoAOD branches read by the functions in this module (see GF.pruneBranches())
+    branches = ['Electron_charge','Electron_convVeto','Electron_dxy','Electron_dz','Electron_eta','Electron_lostHits',
+                'Electron_mvaFall17V2Iso','Electron_mvaFall17V2noIso_WP90','Electron_pfRelIso03_all','Electron_phi','Electron_pt',
+                'Muon_charge','Muon_dxy','Muon_dz','Muon_eta','Muon_mediumId','Muon_pfRelIso04_all','Muon_phi','Muon_pt','Muon_tightId',
+                'Tau_charge','Tau_dz','Tau_eta','Tau_idAntiEle','Tau_idAntiMu','Tau_idDecayMode','Tau_idMVAoldDM2017v2','Tau_phi',
+                'Tau_pt','Tau_rawMVAoldDM2017v2','TrigObj_eta','TrigObj_filterBits','TrigObj_phi',
+                'nElectron','nMuon','nTau','nTrigObj']
+    # triggers checked in findETrigger() and findMuTrigger()
+    triggers = { '2016':['HLT_Ele27_WPTight_Gsf','HLT_IsoMu24'], '2017':['HLT_Ele35_WPTight_Gsf','HLT_IsoMu27'] }
+    return branches + triggers.get(str(era),[])
 
 
 def getTauList(channel, entry, pairList=[]) :
@@ -29,7 +47,7 @@ def getTauList(channel, entry, pairList=[]) :
     if entry.nTau == 0: return []
 
     tauList = []
-    tt = selections['tt'] # selections for H->tau(h)+tau(h)
+    tt = getSelections()['tt'] # selections for H->tau(h)+tau(h)
     for j in range(entry.nTau):    
 
         # apply tau(h) selections 
@@ -118,7 +136,7 @@ def getBestTauPair(channel, entry, tauList) :
     
     # form all possible pairs that satisfy DR requirement
     tauPairList = []
-    tt = selections['tt'] # selections for H->(tau_h)(tau_h)
+    tt = getSelections()['tt'] # selections for H->(tau_h)(tau_h)
     for i in range(len(tauList)) :
         idx_tau1 = tauList[i]
         for j in range(len(tauList)) :
@@ -152,7 +170,7 @@ def getMuTauPairs(entry,cat='mt',pairList=[],printOn=False) :
     if cat == 'mmmt' and entry.nMuon < 3: return []
 
     muTauPairs = []
-    mt = selections['mt'] # H->tau(mu)+tau(h) selections
+    mt = getSelections()['mt'] # H->tau(mu)+tau(h) selections
     for i in range(entry.nMuon):
         
         # apply tau(mu) selections
@@ -228,7 +246,7 @@ def getEMuTauPairs(entry,cat='em',pairList=[],printOn=False) :
     if cat == 'eeem' and entry.nElectron < 3:  return []
 
     elmuTauPairs = []
-    em = selections['em'] # selections for H->tau(ele)+tau(mu)
+    em = getSelections()['em'] # selections for H->tau(ele)+tau(mu)
     for i in range(entry.nMuon):
 
         # selections for tau(mu)
@@ -311,7 +329,7 @@ def getETauPairs(entry,cat='et',pairList=[],printOn=False) :
     if cat == 'eeet' and entry.nElectron < 3: return []
     
     eTauPairs = []
-    et = selections['et'] # selections for H->tau(ele)+tau(h)
+    et = getSelections()['et'] # selections for H->tau(ele)+tau(h)
     for i in range(entry.nElectron) :
 
         # selections for tau(ele)
@@ -389,7 +407,7 @@ def goodMuon(entry, j):
                            for Z -> mu + mu
     """
     
-    mm = selections['mm'] # selections for Z->mumu
+    mm = getSelections()['mm'] # selections for Z->mumu
     if entry.Muon_pt[j] < mm['mu_pt']: return False
     if abs(entry.Muon_eta[j]) > mm['mu_eta']: return False
     if mm['mu_ID']:
@@ -411,7 +429,7 @@ def goodElectron(entry, j) :
     """ tauFun.goodElectron(): select good electrons 
                                for Z -> ele + ele
     """
-    ee = selections['ee'] # selections for Z->ee
+    ee = getSelections()['ee'] # selections for Z->ee
     if entry.Electron_pt[j] < ee['ele_pt']: return False
     if abs(entry.Electron_eta[j]) > ee['ele_eta']: return False
     if abs(entry.Electron_dxy[j]) > ee['ele_dxy']: return False
@@ -519,6 +537,7 @@ def findMuTrigger(goodMuonList,entry,era):
     return MutrigList
 
 def findZ(goodElectronList, goodMuonList, entry) :
+    from ROOT import TLorentzVector
     selpair,pairList, mZ, bestDiff = [],[], 91.19, 99999. 
     nElectron = len(goodElectronList)
     if nElectron > 1 :
@@ -571,6 +590,7 @@ def findZ(goodElectronList, goodMuonList, entry) :
                     
                     
 def findZmumu(goodMuonList, entry) :
+    from ROOT import TLorentzVector
     pairList, mZ, bestDiff = [], 91.19, 99999.     
     nMuon = len(goodMuonList)
     if nMuon < 2 : return pairList 
@@ -591,6 +611,7 @@ def findZmumu(goodMuonList, entry) :
     return pairList
 
 def findZee(goodElectronList, entry) :
+    from ROOT import TLorentzVector
     pairList, mZ, bestDiff = [], 91.19, 99999. 
     nElectron = len(goodElectronList)
     if nElectron < 2 : return pairList 
@@ -74,7 +74,7 @@ for file in scriptList :
     outLines.append('Error = {0:s}.err\n'.format(base))
     outLines.append('Log = {0:s}.log\n'.format(base))
     outLines.append('transfer_input_files = {0:s}makePileUpHisto.py, {0:s}data_pileup_2017.root,'.format(dir))
-    outLines.append('{0:s}tauFun.py, {0:s}generalFunctions.py \n '.format(funcsDir))
+    outLines.append('{0:s}tauFun.py, {0:s}generalFunctions.py, {0:s}arrayReader.py, {0:s}histoTools.py, {0:s}genCategory.py \n '.format(funcsDir))
     outLines.append('should_transfer_files = YES\n')
     outLines.append('when_to_transfer_output = ON_EXIT\n')
     outLines.append('x509userproxy = $ENV(X509_USER_PROXY)\n')
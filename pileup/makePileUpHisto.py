@@ -1,30 +1,58 @@
 #
 # read MC file and histogram pileup
 # write result to output file
-# 
-from ROOT import TFile, TTree, TH1D, TCanvas, TLorentzVector  
+#
+# Only Pileup_nPU and genWeight are read, in chunks of --chunkSize entries, and hMC and hWeight are
+# filled with np.bincount.   Several input files (-f file1,file2,...) can be histogrammed in parallel
+# with -j.   --eventLoop fills the histograms one event at a time as before, e.g. for validation.
+#
+import sys
+sys.path.insert(1,'../funcs/')
+from ROOT import TFile, TTree, TH1D, TCanvas, TLorentzVector
 import numpy as np
-import generalFunctions as GF 
+import generalFunctions as GF
+import arrayReader
+import histoTools
 import time
 
 def getArgs() :
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("-v","--verbose",default=0,type=int,help="Print level.")
-    parser.add_argument("-f","--inFileName",default='./VBF_sync_input.root',help="File to be analyzed.")
+    parser.add_argument("-f","--inFileName",default='./VBF_sync_input.root',help="File(s) to be analyzed (comma separated).")
     parser.add_argument("-o","--outFileName",default='',help="File to be used for output.")
     parser.add_argument("-n","--nEvents",default=0,type=int,help="Number of events to process.")
     parser.add_argument("-y","--year",default=2017,type=int,help="Year for data.")
+    parser.add_argument("-j","--nWorkers",default=1,type=int,help="Number of input files histogrammed in parallel.")
+    parser.add_argument("--chunkSize",default=500000,type=int,help="Number of entries read at a time.")
+    parser.add_argument("--eventLoop",action='store_true',help="Fill the histograms in an event loop instead.")
     return parser.parse_args()
 
+def histoFile(job) :
+    # job = (inFileName, nMax, nBins, xMin, xMax, chunkSize)
+    inFileName, nMax, nBins, xMin, xMax, chunkSize = job
+    hMC, hWeight = histoTools.npHisto(nBins,xMin,xMax), histoTools.npHisto(nBins,xMin,xMax)
+    for first, a in arrayReader.iterateArrays(inFileName,['Pileup_nPU','genWeight'],chunkSize=chunkSize,entryStop=nMax) :
+        hMC.fill(a['Pileup_nPU'])
+        hWeight.fill(a['Pileup_nPU'],a['genWeight'])
+    return hMC, hWeight
+
+def histoFileLoop(inFileName, nMax, hMC, hWeight) :
+    inFile = TFile.Open(inFileName)
+    inTree = inFile.Get("Events")
+    for i, e in enumerate(inTree) :
+        if i >= nMax : break
+        hMC.Fill(e.Pileup_nPU)
+        hWeight.Fill(e.Pileup_nPU,e.genWeight)
+    inFile.Close()
+    return
+
 args = getArgs()
 
-inFileName = args.inFileName
-print("Opening {0:s} as input.".format(inFileName))
-inFile = TFile.Open(inFileName)
-inFile.cd()
-inTree = inFile.Get("Events")
-nentries = inTree.GetEntries()
+inFileNames = args.inFileName.split(',')
+print("Opening {0:s} as input.".format(args.inFileName))
+entries = [arrayReader.getNumEntries(inFileName) for inFileName in inFileNames]
+nentries = sum(entries)
 
 outFileName = GF.getOutFileName(args)
 print("Opening {0:s} as output.".format(outFileName))
@@ -41,23 +69,39 @@ xMax = xMin + nBins*binWidth
 bins = np.linspace(xMin+0.5*binWidth,xMax-0.5*binWidth,nBins)
 print("nBins={0:d} binWidth={1:f} xMin={2:f} xMax={3:f}".format(nBins,binWidth,xMin,xMax))
 
-hMC = TH1D("hMC","hMC",nBins,xMin,xMax)
-hWeight = TH1D("hWeight","hWeight",nBins,xMin,xMax)
-
-nentries = inTree.GetEntries()
 nMax = nentries
-if args.nEvents > 0 : nMax = min(nMax,args.nEvents) 
+if args.nEvents > 0 : nMax = min(nMax,args.nEvents)
+# number of entries to read from each file
+fileMax, nLeft = [], nMax
+for n in entries :
+    fileMax.append(min(n,nLeft))
+    nLeft -= fileMax[-1]
 print("Entering pileup loop.  Number of entries={0:d} nMax={1:d}".format(nentries,nMax))
 tStart = time.time()
-for i, e in enumerate(inTree) :
-    if i >= nMax : break
-    hMC.Fill(e.Pileup_nPU)
-    hWeight.Fill(e.Pileup_nPU,e.genWeight)
-    
-print("After pileup loop:  time={0:.1f} s   time/event={1:.1f} us".format(time.time()-tStart,1.e6*(time.time()-tStart)/nMax))
+if args.eventLoop :
+    hMC = TH1D("hMC","hMC",nBins,xMin,xMax)
+    hWeight = TH1D("hWeight","hWeight",nBins,xMin,xMax)
+    for inFileName, n in zip(inFileNames,fileMax) : histoFileLoop(inFileName,n,hMC,hWeight)
+else :
+    jobs = [(inFileName,n,nBins,xMin,xMax,args.chunkSize) for inFileName, n in zip(inFileNames,fileMax) if n > 0]
+    if args.nWorkers > 1 and len(jobs) > 1 :
+        from multiprocessing import Pool
+        pool = Pool(min(args.nWorkers,len(jobs)))
+        results = pool.map(histoFile,jobs)
+        pool.close()
+        pool.join()
+    else :
+        results = [histoFile(job) for job in jobs]
+    npMC, npWeight = histoTools.npHisto(nBins,xMin,xMax), histoTools.npHisto(nBins,xMin,xMax)
+    for hh, hw in results :
+        npMC.add(hh)
+        npWeight.add(hw)
+    hMC = npMC.toTH1D("hMC")
+    hWeight = npWeight.toTH1D("hWeight")
+
+print("After pileup loop:  time={0:.1f} s   time/event={1:.1f} us".format(time.time()-tStart,1.e6*(time.time()-tStart)/max(nMax,1)))
 fOut.cd()
 hMC.Write()
-hWeight.Write() 
+hWeight.Write()
 fOut.Write()
-fOut.Close()        
-
+fOut.Close()
@@ -11,6 +11,7 @@ def getArgs() :
     parser.add_argument("-v","--verbose",default=0,type=int,help="Print level.")
     parser.add_argument("-f","--inFileName",default='./MCsamples_2017.csv',help="File to be analyzed.")
     parser.add_argument("-y","--year",default=2017,type=str,help="Data taking period, 2016, 2017 or 2018")
+    parser.add_argument("--ntupleDir",default='',help="Take hMC and hWeight from the merged ZH.py outputs {nickName}_{year}/{nickName}_{year}.root in this directory.")
     return parser.parse_args()
 
 args = getArgs()
@@ -30,8 +31,16 @@ print("len(nickNames)={0:d}".format(len(nickNames)))
     
 hIn, hW = {}, {}
 for nickName in nickNames :
-    os.system("hadd -f ./{0:s}_{1:s}/temp.root ./{0:s}_{1:s}/{0:s}_*.root".format(nickName,era))
-    inFile = TFile.Open("./{0:s}_{1:s}/temp.root".format(nickName,era))
+    if len(args.ntupleDir) > 0 :
+        # ZH.py fills the pileup histograms of all its input events, and hAddAllDir.py merges them with the ntuples
+        inFileName = os.path.join(args.ntupleDir,"{0:s}_{1:s}".format(nickName,era),"{0:s}_{1:s}.root".format(nickName,era))
+        if not os.path.isfile(inFileName) :
+            print("No merged ntuple {0:s} . . . skipping.".format(inFileName))
+            continue
+    else :
+        os.system("hadd -f ./{0:s}_{1:s}/temp.root ./{0:s}_{1:s}/{0:s}_*.root".format(nickName,era))
+        inFileName = "./{0:s}_{1:s}/temp.root".format(nickName,era)
+    inFile = TFile.Open(inFileName)
     inFile.cd()
     hh = inFile.Get("hMC")
     h2 = inFile.Get("hWeight")
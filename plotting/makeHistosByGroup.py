@@ -2,7 +2,13 @@
 # read MC file root files and histogram by group 
 #
 
+import sys
 from ROOT import TFile, TTree, TH1D, TCanvas, TLorentzVector  
+sys.path.insert(1,'../funcs/')
+import numpy as np
+import generalFunctions as GF
+import histoTools
+import fakeRates
 
 def getArgs() :
     import argparse
@@ -13,106 +19,215 @@ def getArgs() :
     parser.add_argument("-y","--year",default=2017,type=int,help="Year for data.")
     parser.add_argument("-l","--LTcut",default=0.,type=float,help="H_LTcut")
     parser.add_argument("-s","--sign",default='OS',help="Opposite or same sign (OS or SS).")
+    parser.add_argument("-j","--nWorkers",default=1,type=int,help="Number of samples to histogram in parallel.")
+    parser.add_argument("--cacheDir",default='',help="Directory for the per-sample histogram cache (no cache if empty).")
+    parser.add_argument("--checksum",action='store_true',help="Key the cache on file checksums instead of size and mtime.")
+    parser.add_argument("--fakeRateFile",default='../fakes/FakeRates.root',help="Binned fake rates from makeFakeRateHistos.py")
     parser.add_argument("--MConly",action='store_true',help="MC only") 
     parser.add_argument("--looseCuts",action='store_true',help="Loose cuts")
     parser.add_argument("--unBlind",action='store_true',help="Unblind signal region for OS")
     
     return parser.parse_args()
 
-class dupeDetector() :
-    
-    def __init__(self):
-        self.nCalls = 0 
-        self.runEventList = []
-
-    def checkEvent(self,entry) :
-        self.nCalls += 1 
-        runEvent = "{0:d}:{1:d}".format(entry.run,entry.evt)
-        if runEvent in self.runEventList :
-            #print("Event in list: runEventList={0:s}".format(str(self.runEventList)))
-            return True
-        else :
-            self.runEventList.append(runEvent)
-            #print("New event: runEventList={0:s}".format(str(self.runEventList)))
-            return False
-
-    def printSummary(self) :
-        print("Duplicate Event Summary: Calls={0:d} Unique Events={1:d}".format(self.nCalls,len(self.runEventList)))
-        return
+def getFakeWeights(mode, fail1, fail2, pt_1, pt_2, eta_1, eta_2) :
+    # application-region weights for arrays of events: w1 if only leg 1 fails the tight
+    # selection, w2 if only leg 2 fails and -w1*w2 if both fail
+    leg1, leg2 = fakeLegs[mode]
+    w1 = FR.getWeight(leg1,pt_1,eta_1)
+    w2 = FR.getWeight(leg2,pt_2,eta_2)
+    return np.where(fail1 & fail2,-w1*w2,np.where(fail1,w1,w2))
 
-def getFakeWeights(f1,f2) :
-    w1 = f1/(1.-f1)
-    w2 = f2/(1.-f2)
-    w0 = w1*w2
-    return w1, w2, w0
-
-def trigweight(e,cat)
+def trigweight(e,cat) :
     trigw = 1.
     if cat == 'eeet' or cat == 'mmmt' :
-	if e.trig_Lp_MC != 0. and  e.trig_Lm_MC == 0. : 
-	    if trig_T1_MC == 0. : trigw = float(e.trig_Lp_Data/e.trig_Lp_MC)
-	    if trig_T1_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T1_MC) ))
+        if e.trig_Lp_MC != 0. and  e.trig_Lm_MC == 0. : 
+            if e.trig_T1_MC == 0. : trigw = float(e.trig_Lp_Data/e.trig_Lp_MC)
+            if e.trig_T1_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T1_MC) ))
 
-	if e.trig_Lp_MC == 0. and  e.trig_Lm_MC != 0. : 
-	    if trig_T1_MC == 0. : trigw = float(e.trig_Lm_Data/e.trig_Lm_MC)
-	    if trig_T1_MC != 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ))
+        if e.trig_Lp_MC == 0. and  e.trig_Lm_MC != 0. : 
+            if e.trig_T1_MC == 0. : trigw = float(e.trig_Lm_Data/e.trig_Lm_MC)
+            if e.trig_T1_MC != 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ))
 
-	if e.trig_Lp_MC != 0. and  e.trig_Lm_MC != 0. : 
-	    trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ))
+        if e.trig_Lp_MC != 0. and  e.trig_Lm_MC != 0. : 
+            trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ))
 
     if cat == 'eemt' or cat == 'mmet' :
-	if e.trig_Lp_MC != 0. and  e.trig_Lm_MC == 0. : 
-	    if trig_T1_MC = 0. : trigw = float(e.trig_Lp_Data/e.trig_Lp_MC)
-	    if trig_T1_MC != 0. : trigw = float(   (e.trig_Lp_Data/e.trig_Lp_MC) * (e.trig_Lp_Data/e.trig_Lp_MC)   )
-	if e.trig_Lp_MC == 0. and  e.trig_Lm_MC != 0. : 
-	    if trig_T1_MC = 0. : trigw = float(e.trig_Lm_Data/e.trig_Lm_MC)
-	    if trig_T1_MC != 0. : trigw = float(   (e.trig_Lm_Data/e.trig_Lm_MC) * (e.trig_Lm_Data/e.trig_Lm_MC)   )
-	if e.trig_Lp_MC != 0. and  e.trig_Lm_MC != 0. : 
-	    if trig_T1_MC == 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ) )
-	    if trig_T1_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) )  * float(e.trig_T1_Data/e.trig_T1_MC) )
+        if e.trig_Lp_MC != 0. and  e.trig_Lm_MC == 0. : 
+            if e.trig_T1_MC == 0. : trigw = float(e.trig_Lp_Data/e.trig_Lp_MC)
+            if e.trig_T1_MC != 0. : trigw = float(   (e.trig_Lp_Data/e.trig_Lp_MC) * (e.trig_Lp_Data/e.trig_Lp_MC)   )
+        if e.trig_Lp_MC == 0. and  e.trig_Lm_MC != 0. : 
+            if e.trig_T1_MC == 0. : trigw = float(e.trig_Lm_Data/e.trig_Lm_MC)
+            if e.trig_T1_MC != 0. : trigw = float(   (e.trig_Lm_Data/e.trig_Lm_MC) * (e.trig_Lm_Data/e.trig_Lm_MC)   )
+        if e.trig_Lp_MC != 0. and  e.trig_Lm_MC != 0. : 
+            if e.trig_T1_MC == 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ) )
+            if e.trig_T1_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) )  * float(e.trig_T1_Data/e.trig_T1_MC) )
 
     if cat == 'eeem' :
-	if e.trig_Lp_MC != 0. and  e.trig_Lm_MC == 0. : 
-	    if trig_T1_MC == 0. and trig_T2_MC == 0.: trigw = float(e.trig_Lp_Data/e.trig_Lp_MC)
-	    if trig_T1_MC == 0. and trig_T2_MC != 0.: trigw = float(e.trig_Lp_Data/e.trig_Lp_MC) * float(e.trig_T2_Data/e.trig_T2_MC)
-	    if trig_T1_MC != 0. and trig_T2_MC == 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T1_MC) ))
-	    if trig_T1_MC != 0. and trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T1_MC) ) * float(e.trig_T2_Data/e.trig_T2_MC))
-
-	if e.trig_Lp_MC == 0. and  e.trig_Lm_MC != 0. : 
-	    if trig_T1_MC == 0. and trig_T2_MC == 0.: trigw = float(e.trig_Lm_Data/e.trig_Lm_MC)
-	    if trig_T1_MC == 0. and trig_T2_MC != 0.: trigw = float(e.trig_Lm_Data/e.trig_Lm_MC) * float(e.trig_T2_Data/e.trig_T2_MC)
-	    if trig_T1_MC != 0. and trig_T2_MC == 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ))
-	    if trig_T1_MC != 0. and trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ) * float(e.trig_T2_Data/e.trig_T2_MC))
-
-	if e.trig_Lp_MC != 0. and  e.trig_Lm_MC != 0. : 
-	    if trig_T1_MC == 0. and trig_T2_MC == 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ))
-	    if trig_T1_MC == 0. and trig_T2_MC != 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ) * float(e.trig_T2_Data/e.trig_T2_MC))
-	    if trig_T1_MC != 0. and trig_T2_MC == 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ) 
-	    if trig_T1_MC != 0. and trig_T2_MC != 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ) * float(e.trig_T2_Data/e.trig_T2_MC))
+        if e.trig_Lp_MC != 0. and  e.trig_Lm_MC == 0. : 
+            if e.trig_T1_MC == 0. and e.trig_T2_MC == 0.: trigw = float(e.trig_Lp_Data/e.trig_Lp_MC)
+            if e.trig_T1_MC == 0. and e.trig_T2_MC != 0.: trigw = float(e.trig_Lp_Data/e.trig_Lp_MC) * float(e.trig_T2_Data/e.trig_T2_MC)
+            if e.trig_T1_MC != 0. and e.trig_T2_MC == 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T1_MC) ))
+            if e.trig_T1_MC != 0. and e.trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T1_MC) ) * float(e.trig_T2_Data/e.trig_T2_MC))
+
+        if e.trig_Lp_MC == 0. and  e.trig_Lm_MC != 0. : 
+            if e.trig_T1_MC == 0. and e.trig_T2_MC == 0.: trigw = float(e.trig_Lm_Data/e.trig_Lm_MC)
+            if e.trig_T1_MC == 0. and e.trig_T2_MC != 0.: trigw = float(e.trig_Lm_Data/e.trig_Lm_MC) * float(e.trig_T2_Data/e.trig_T2_MC)
+            if e.trig_T1_MC != 0. and e.trig_T2_MC == 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ))
+            if e.trig_T1_MC != 0. and e.trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ) * float(e.trig_T2_Data/e.trig_T2_MC))
+
+        if e.trig_Lp_MC != 0. and  e.trig_Lm_MC != 0. : 
+            if e.trig_T1_MC == 0. and e.trig_T2_MC == 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ))
+            if e.trig_T1_MC == 0. and e.trig_T2_MC != 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ) * float(e.trig_T2_Data/e.trig_T2_MC))
+            if e.trig_T1_MC != 0. and e.trig_T2_MC == 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ))
+            if e.trig_T1_MC != 0. and e.trig_T2_MC != 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T1_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T1_MC) ) * float(e.trig_T2_Data/e.trig_T2_MC))
 
     if cat == 'mmem' :
-	if e.trig_Lp_MC != 0. and  e.trig_Lm_MC == 0. : 
-	    if trig_T1_MC == 0. and trig_T2_MC == 0.: trigw = float(e.trig_Lp_Data/e.trig_Lp_MC)
-	    if trig_T1_MC != 0. and trig_T2_MC == 0.: trigw = float(e.trig_Lp_Data/e.trig_Lp_MC) * float(e.trig_T2_Data/e.trig_T2_MC)
-	    if trig_T1_MC == 0. and trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T2_MC) ))
-	    if trig_T1_MC != 0. and trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T2_MC) ) * float(e.trig_T1_Data/e.trig_T1_MC))
-
-	if e.trig_Lp_MC == 0. and  e.trig_Lm_MC != 0. : 
-	    if trig_T1_MC == 0. and trig_T2_MC == 0.: trigw = float(e.trig_Lm_Data/e.trig_Lm_MC)
-	    if trig_T1_MC != 0. and trig_T2_MC == 0.: trigw = float(e.trig_Lm_Data/e.trig_Lm_MC) * float(e.trig_T2_Data/e.trig_T2_MC)
-	    if trig_T1_MC == 0. and trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T2_MC) ))
-	    if trig_T1_MC != 0. and trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T2_MC) ) * float(e.trig_T1_Data/e.trig_T1_MC))
-
-	if e.trig_Lp_MC != 0. and  e.trig_Lm_MC != 0. : 
-	    if trig_T1_MC == 0. and trig_T2_MC == 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ))
-	    if trig_T1_MC != 0. and trig_T2_MC == 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ) * float(e.trig_T1_Data/e.trig_T1_MC))
-	    if trig_T1_MC == 0. and trig_T2_MC != 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T2_MC) ) 
-	    if trig_T1_MC != 0. and trig_T2_MC != 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T2_MC) ) * float(e.trig_T1_Data/e.trig_T1_MC))
+        if e.trig_Lp_MC != 0. and  e.trig_Lm_MC == 0. : 
+            if e.trig_T1_MC == 0. and e.trig_T2_MC == 0.: trigw = float(e.trig_Lp_Data/e.trig_Lp_MC)
+            if e.trig_T1_MC != 0. and e.trig_T2_MC == 0.: trigw = float(e.trig_Lp_Data/e.trig_Lp_MC) * float(e.trig_T2_Data/e.trig_T2_MC)
+            if e.trig_T1_MC == 0. and e.trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T2_MC) ))
+            if e.trig_T1_MC != 0. and e.trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lp_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_T2_MC) ) * float(e.trig_T1_Data/e.trig_T1_MC))
+
+        if e.trig_Lp_MC == 0. and  e.trig_Lm_MC != 0. : 
+            if e.trig_T1_MC == 0. and e.trig_T2_MC == 0.: trigw = float(e.trig_Lm_Data/e.trig_Lm_MC)
+            if e.trig_T1_MC != 0. and e.trig_T2_MC == 0.: trigw = float(e.trig_Lm_Data/e.trig_Lm_MC) * float(e.trig_T2_Data/e.trig_T2_MC)
+            if e.trig_T1_MC == 0. and e.trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T2_MC) ))
+            if e.trig_T1_MC != 0. and e.trig_T2_MC != 0. : trigw = float(      (1 - (1-e.trig_Lm_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lm_MC)*(1-e.trig_T2_MC) ) * float(e.trig_T1_Data/e.trig_T1_MC))
+
+        if e.trig_Lp_MC != 0. and  e.trig_Lm_MC != 0. : 
+            if e.trig_T1_MC == 0. and e.trig_T2_MC == 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ))
+            if e.trig_T1_MC != 0. and e.trig_T2_MC == 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC) ) * float(e.trig_T1_Data/e.trig_T1_MC))
+            if e.trig_T1_MC == 0. and e.trig_T2_MC != 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T2_MC) ))
+            if e.trig_T1_MC != 0. and e.trig_T2_MC != 0.: trigw = float(  (1 - (1-e.trig_Lp_Data)*(1-e.trig_Lm_Data)*(1-e.trig_T2_Data)) /  (1 - (1-e.trig_Lp_MC)*(1-e.trig_Lm_MC)*(1-e.trig_T2_MC) ) * float(e.trig_T1_Data/e.trig_T1_MC))
 
     return trigw
 
+def getInFileName(nickName, group) :
+    if group == 'data' : return './data/{0:s}/{0:s}.root'.format(nickName)
+    return './MC/condor/{0:s}/{0:s}.root'.format(nickName)
+
+def getWeightKey(nickName) :
+    # the sample weights are folded into the histograms, so they are part of the cache key 
+    nns = [nickName]
+    if nickName == 'DYJetsToLL' : nns += ['DY{0:d}JetsToLL'.format(i) for i in range(1,5)]
+    if nickName == 'WJetsToLNu' : nns += ['W{0:d}JetsToLNu'.format(i) for i in range(1,4)]
+    return ','.join(["{0:.9e}".format(sampleWeight[nn]) for nn in nns])
+
+def processSample(job) :
+    # histogram a single sample.  This runs in a worker process when nWorkers > 1, so it 
+    # returns npHisto objects rather than TH1D's.   Data events are returned as a list of 
+    # records instead, so that duplicates can be removed by the parent in the original sample order.
+    nickName, group = job
+    inFileName = getInFileName(nickName,group)
+    try :
+        inFile = TFile.Open(inFileName)
+        inFile.cd()
+        inTree = inFile.Get("Events")
+        nentries = inTree.GetEntries()
+    except AttributeError :
+        print("  Failure on file {0:s}".format(inFileName))
+        return None
+
+    nEvents, totalWeight = 0, 0.
+    sWeight = sampleWeight[nickName]
+    DYJets = (nickName == 'DYJetsToLL')
+    WJets  = (nickName == 'WJetsToLNu')
+    xFill, wFill, dataEvents, fakeEvents = {}, {}, [], []
+
+    for i, e in enumerate(inTree) :
+        hGroup = group
+        #if e.nbtag > 0 : continue
+        sw = sWeight
+        if e.LHE_Njets > 0 :
+            if DYJets : sw = sampleWeight['DY{0:d}JetsToLL'.format(e.LHE_Njets)]
+            if WJets  : sw = sampleWeight['W{0:d}JetsToLNu'.format(e.LHE_Njets)] 
+        weight = e.weight*sw
+
+        ww = weight
+        #s = sf.checkFile()
+
+        cat = cats[e.cat]
+        if tightCuts :
+            if cat[2:] == 'et' : tight1 = e.iso_1 > 0.5 
+            if cat[2:] == 'mt' : tight1 = e.iso_1 < 0.25 and e.iso_1_ID > 0.5
+            if cat[2:] == 'tt' : tight1 = e.iso_1_ID > 15
+            tight2 = e.iso_2_ID > 15
+            if cat[2:] == 'em' :
+                tight1 = e.iso_1 > 0.5
+                tight2 = e.iso_2 < 0.25 and e.iso_2_ID > 0.5
+
+            if group == 'data' :
+                if dataDriven :
+                    # the fake weight is applied to all events of the sample after the loop 
+                    ww = 1.
+                    hGroup = 'data'
+                    if not (tight1 and tight2) : hGroup = 'Reducible'
+                else :
+                    hGroup = 'data'
+                    #print("group = data  cat={0:s} tight1={1} tight2={2} ww={3:f}".format(cat,tight1,tight2,ww))
+                    if not (tight1 and tight2) : continue 
+
+            else : 
+                if not (tight1 and tight2) : continue
+                #print("Good MC event: group={0:s} nickName={1:s} cat={2:s} gen_match_1={3:d} gen_match_2={4:d}".format(
+                #    group,nickName,cat,e.gen_match_1,e.gen_match_2))
+                if dataDriven :   # include only events with MC matching
+                    if cat[2] == 'e' or cat[2] == 'm':
+                        if not (e.gen_match_1 == 1 or e.gen_match_1 == 15) : continue
+                    else :
+                        if not e.gen_match_1 == 5 : continue
+                    if cat[3] == 'e' or cat[3] == 'm' :
+                        if not (e.gen_match_2 == 1 or e.gen_match_2 == 15) : continue
+                    else : 
+                        if not e.gen_match_2 == 5 : continue
 
+            #elif group == 'Rare' or group == 'ZZ4L' or group == 'Signal' :
+            #    if not (tight1 and tight2) : continue         
 
+        if args.sign == 'SS':
+            if e.q_1*e.q_2 < 0. : continue
+        else :
+            if e.q_1*e.q_2 > 0. : continue
+            if hGroup == 'data' and not args.unBlind and e.m_sv > 80. and e.m_sv < 140. : continue                 
+        H_LT = e.pt_1 + e.pt_2
+        if H_LT < args.LTcut : continue
+
+        trigw_ = trigweight(e,cat)
+
+        if group == 'data' :
+            # duplicate removal and filling are done by the parent
+            if hGroup == 'Reducible' :
+                fakeEvents.append((len(dataEvents),cat[2:],not tight1,not tight2,e.pt_1,e.pt_2,e.eta_1,e.eta_2))
+            dataEvents.append((cat,e.run,e.evt,hGroup,e.m_sv,ww*trigw_,e.is_trig == 1,ww))
+            continue
+
+        if cat == 'mmtt' :
+            totalWeight += ww
+            nEvents += 1
+
+        if e.is_trig == 1 :
+            xFill.setdefault((hGroup,cat),[]).append(e.m_sv)
+            wFill.setdefault((hGroup,cat),[]).append(ww*trigw_)
+
+    inFile.Close()
+
+    if len(fakeEvents) > 0 :
+        iRec, mode, fail1, fail2, pt_1, pt_2, eta_1, eta_2 = [np.array(x) for x in zip(*fakeEvents)]
+        ww = np.zeros(len(iRec))
+        for m in fakeLegs.keys() :
+            inMode = (mode == m)
+            if np.any(inMode) :
+                ww[inMode] = getFakeWeights(m,fail1[inMode],fail2[inMode],pt_1[inMode],pt_2[inMode],eta_1[inMode],eta_2[inMode])
+        for i, w in zip(iRec,ww) :
+            cat, run, evt, hGroup, m_sv, wTrig, isTrig, ww_ = dataEvents[i]
+            dataEvents[i] = (cat,run,evt,hGroup,m_sv,w*wTrig,isTrig,w)
+
+    hists = {}
+    for key in xFill.keys() :
+        hists[key] = histoTools.npHisto(nBins,xMin,xMax)
+        hists[key].fill(xFill[key],wFill[key])
+
+    return nickName, nentries, nEvents, totalWeight, hists, dataEvents
 
 
 args = getArgs()
@@ -121,6 +236,7 @@ groups = ['Signal','Reducible','Rare','ZZ4L','data']
 lumi = 1000.*41.8 
 #cats = { 1:'eeet', 2:'eemt', 3:'eett', 4:'mmet', 5:'mmmt', 6:'mmtt', 7:'et', 8:'mt', 9:'tt' }
 cats = { 1:'eeet', 2:'eemt', 3:'eett', 4:'eeem', 5:'mmet', 6:'mmmt', 7:'mmtt', 8:'mmem', 9:'et', 10:'mt', 11:'tt' }
+histCats = [cats[i] for i in range(1,9)]
 groups = ['Signal','Reducible','Rare','ZZ4L','data']
 tightCuts = not args.looseCuts 
 dataDriven = not args.MConly
@@ -128,7 +244,7 @@ dataDriven = not args.MConly
 # use this utility class to screen out duplicate events
 DD = {}
 for cat in cats.values() :
-    DD[cat] = dupeDetector()
+    DD[cat] = GF.dupeDetector(evtName='evt')
 
 # dictionary where the group is the key
 hMC = {}
@@ -180,131 +296,99 @@ if tightCuts :
         outFileName = outFileName.replace('.root','_MC.root') 
 else :
     outFileName = 'allGroups_{0:d}_{1:s}_LT{2:02d}_loose.root'.format(args.year,args.sign,int(args.LTcut))
-    
-print("Opening {0:s} as output.".format(outFileName))
-fOut = TFile( outFileName, 'recreate' )
 
-#fe, fm, ft_et, ft_mt, f1_tt, f2_tt   = 0.0456, 0.0935, 0.1391, 0.1284, 0.0715, 0.0609
-# values with nbtag = 0 cut 
-fe, fm, ft_et, ft_mt, f1_tt, f2_tt   = 0.0390, 0.0794, 0.1397, 0.1177, 0.0756, 0.0613
-fW1, fW2, fW0 = {}, {}, {}
-fW1['et'], fW2['et'], fW0['et'] = getFakeWeights(fe,ft_et)
-fW1['mt'], fW2['mt'], fW0['mt'] = getFakeWeights(fm,ft_mt)
-fW1['tt'], fW2['tt'], fW0['tt'] = getFakeWeights(f1_tt,f2_tt)
-fW1['em'], fW2['em'], fW0['em'] = getFakeWeights(fe,fm)
+# pt-binned fake rates measured by fakes/makeFakeRateHistos.py, for the legs of each tau-pair mode
+fakeLegs = { 'et':('e_et','t_et'), 'mt':('m_mt','t_mt'), 'tt':('t1_tt','t2_tt'), 'em':('e_et','m_mt') }
+FR = None
+if dataDriven :
+    FR = fakeRates.fakeRateLookup(args.fakeRateFile)
+    FR.printSummary()
 
-global getsf,sf
 for group in groups :
-    fOut.cd()
     hMC[group] = {}
-    for cat in cats.values()[0:8] :
-        hName = 'h{0:s}_{1:s}_Mtt'.format(group,cat)
-        hMC[group][cat] = TH1D(hName,hName,nBins,xMin,xMax)
-    print("\nInstantiating TH1D {0:s}".format(hName))
-    print("      Nickname                 Entries    Wt/Evt  Ngood   Tot Wt")
-    for nickName in nickNames[group] :
-        isData = False 
-        inFileName = './MC/condor/{0:s}/{0:s}.root'.format(nickName)
-        if group == 'data' :
-            isData = True
-            inFileName = './data/{0:s}/{0:s}.root'.format(nickName)
-        try :
-            inFile = TFile.Open(inFileName)
-            inFile.cd()
-            inTree = inFile.Get("Events")
-            nentries = inTree.GetEntries()
-        except AttributeError :
-            print("  Failure on file {0:s}".format(inFileName))
-            exit()
-
-        # resume here
-        nEvents, trigw, totalWeight = 0, 1., 0.
-        sWeight = sampleWeight[nickName]
-        DYJets = (nickName == 'DYJetsToLL')
-        WJets  = (nickName == 'WJetsToLNu')
-
-        for i, e in enumerate(inTree) :
-            hGroup = group
-            #if e.nbtag > 0 : continue
-            sw = sWeight
-            if e.LHE_Njets > 0 :
-                if DYJets : sw = sampleWeight['DY{0:d}JetsToLL'.format(e.LHE_Njets)]
-                if WJets  : sw = sampleWeight['W{0:d}JetsToLNu'.format(e.LHE_Njets)] 
-            weight = e.weight*sw
-
-            ww = weight
-            #s = sf.checkFile()
-
-            cat = cats[e.cat]
-            if tightCuts :
-                if cat[2:] == 'et' : tight1 = e.iso_1 > 0.5 
-                if cat[2:] == 'mt' : tight1 = e.iso_1 < 0.25 and e.iso_1_ID > 0.5
-                if cat[2:] == 'tt' : tight1 = e.iso_1_ID > 15
-                tight2 = e.iso_2_ID > 15
-                if cat[2:] == 'em' :
-                    tight1 = e.iso_1 > 0.5
-                    tight2 = e.iso_2 < 0.25 and e.iso_2_ID > 0.5
-                    
-                if group == 'data' :
-                    if dataDriven :
-                        hGroup = 'Reducible'
-                        if not tight1 and tight2 : ww = fW1[cat[2:]]
-                        elif tight1 and not tight2 : ww = fW2[cat[2:]]
-                        elif not (tight1 or tight2) : ww = -fW0[cat[2:]]
-                        else :
-                            ww = 1.
-                            hGroup = 'data'
-                    else :
-                        hGroup = 'data'
-                        #print("group = data  cat={0:s} tight1={1} tight2={2} ww={3:f}".format(cat,tight1,tight2,ww))
-                        if not (tight1 and tight2) : continue 
-                        
-                else : 
-                    if not (tight1 and tight2) : continue
-                    #print("Good MC event: group={0:s} nickName={1:s} cat={2:s} gen_match_1={3:d} gen_match_2={4:d}".format(
-                    #    group,nickName,cat,e.gen_match_1,e.gen_match_2))
-                    if dataDriven :   # include only events with MC matching
-                        if cat[2] == 'e' or cat[2] == 'm':
-                            if not (e.gen_match_1 == 1 or e.gen_match_1 == 15) : continue
-                        else :
-                            if not e.gen_match_1 == 5 : continue
-                        if cat[3] == 'e' or cat[3] == 'm' :
-                            if not (e.gen_match_2 == 1 or e.gen_match_2 == 15) : continue
-                        else : 
-                            if not e.gen_match_2 == 5 : continue
-                                        
-                #elif group == 'Rare' or group == 'ZZ4L' or group == 'Signal' :
-                #    if not (tight1 and tight2) : continue         
-                                        
-            if args.sign == 'SS':
-                if e.q_1*e.q_2 < 0. : continue
-            else :
-                if e.q_1*e.q_2 > 0. : continue
-                if hGroup == 'data' and not args.unBlind and e.m_sv > 80. and e.m_sv < 140. : continue                 
-            H_LT = e.pt_1 + e.pt_2
-            if H_LT < args.LTcut : continue
-            if group == 'data' :
-                if DD[cat].checkEvent(e) : continue 
-            if cat == 'mmtt' :
-                totalWeight += ww
-                nEvents += 1
+    for cat in histCats :
+        hMC[group][cat] = histoTools.npHisto(nBins,xMin,xMax)
 
-
-            trigw_ = trigweight(e,cat)
-
-            if e.is_trig ==1 :  hMC[hGroup][cat].Fill(e.m_sv,ww*trigw_)
-
-        print("{0:30s} {1:7d} {2:10.6f} {3:5d} {4:8.3f}".format(nickName,nentries,sampleWeight[nickName],nEvents,totalWeight))
-        inFile.Close()
-    fOut.cd()
-    for cat in cats.values()[0:6] : hMC[group][cat].Write() 
+# each sample is independent, so they can be histogrammed in parallel.  Results
+# come back in the original order, which keeps the duplicate removal for data reproducible.
+jobs = []
+for group in groups :
+    for nickName in nickNames[group] : jobs.append((nickName,group))
+
+# samples whose input and selection are unchanged are taken from the cache 
+cache, cached, todo = None, {}, []
+if len(args.cacheDir) > 0 :
+    selection = { 'year':args.year, 'sign':args.sign, 'LTcut':args.LTcut, 'looseCuts':args.looseCuts, 'MConly':args.MConly, 
+                  'unBlind':args.unBlind, 'bins':(nBins,xMin,xMax), 'fakeRates':FR.getHash() if FR is not None else '' }
+    cache = histoTools.histoCache(args.cacheDir,selection,codeFiles=[__file__,histoTools.__file__.replace('.pyc','.py'),fakeRates.__file__.replace('.pyc','.py')],useChecksum=args.checksum)
+for job in jobs :
+    nickName, group = job
+    if cache is not None :
+        result = cache.get(nickName,getInFileName(nickName,group),extra=getWeightKey(nickName))
+        if result is not None :
+            cached[nickName] = result
+            continue
+    todo.append(job)
+
+if args.nWorkers > 1 and len(todo) > 1 :
+    from multiprocessing import Pool
+    print("Histogramming {0:d} samples with {1:d} workers.".format(len(todo),args.nWorkers))
+    pool = Pool(args.nWorkers)
+    newResults = pool.imap(processSample,todo)
+else :
+    pool = None 
+    newResults = (processSample(job) for job in todo)
+
+def getResults() :
+    for nickName, group in jobs :
+        if nickName in cached :
+            yield cached[nickName]
+            continue
+        result = next(newResults)
+        if result is not None and cache is not None :
+            cache.put(nickName,getInFileName(nickName,group),result,extra=getWeightKey(nickName))
+        yield result 
+
+results = getResults()
+
+print("      Nickname                 Entries    Wt/Evt  Ngood   Tot Wt")
+for result in results :
+    if result is None :
+        if pool is not None : pool.terminate()
+        exit()
+    nickName, nentries, nEvents, sumWeight, hists, dataEvents = result
+    for key in hists.keys() :
+        hGroup, cat = key
+        hMC[hGroup][cat].add(hists[key])
+
+    for cat, run, evt, hGroup, m_sv, weight, isTrig, ww in dataEvents :
+        if DD[cat].checkKey(run,evt) : continue 
+        if cat == 'mmtt' :
+            sumWeight += ww
+            nEvents += 1
+        if isTrig : hMC[hGroup][cat].fill(m_sv,weight)
+
+    print("{0:30s} {1:7d} {2:10.6f} {3:5d} {4:8.3f}".format(nickName,nentries,sampleWeight[nickName],nEvents,sumWeight))
+
+if pool is not None :
+    pool.close()
+    pool.join()
+if cache is not None : cache.printSummary()
 
 for cat in cats.values():
     print("Duplicate summar for {0:s}".format(cat))
     DD[cat].printSummary()
+
+print("Opening {0:s} as output.".format(outFileName))
+fOut = TFile( outFileName, 'recreate' )
+fOut.cd()
+hOut = {}
+for group in groups :
+    hOut[group] = {}
+    for cat in histCats :
+        hName = 'h{0:s}_{1:s}_Mtt'.format(group,cat)
+        hOut[group][cat] = hMC[group][cat].toTH1D(hName)
     
 fOut.cd()
 fOut.Write()
-fOut.Close()        
-
-
+fOut.Close()
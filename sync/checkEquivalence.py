@@ -0,0 +1,116 @@
+#
+# check that two outputs of the analysis are the same event by event, e.g. those of the
+# per-event code and of a faster version run on the same input
+#
+# The events of the two ntuples are matched on (run,lumi,evt,cat).   The events found in only
+# one of them, the largest deviation of each common branch over the matched events, and the
+# cut flows ({job}.cutflow, see funcs/cutFlow.py) are reported.   The script exits with 1 if
+# more than --maxUnmatched events are unmatched, if a branch differs by more than the
+# tolerance in any event, or if the cut flows differ by more than --cutFlowTol events.
+# --refCmd and --testCmd run the two versions first.
+#
+# e.g.  python checkEquivalence.py ref.ntup fast.ntup --relTol 1e-6 --branchTol m_sv:0.01,0.001
+#
+import sys
+sys.path.insert(1,'../funcs/')
+import os
+import subprocess
+import numpy as np
+import ROOT
+import syncTools
+import cutFlow
+
+def getArgs() :
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("refFileName",help="Ntuple of the reference (e.g. per-event) version.")
+    parser.add_argument("testFileName",help="Ntuple of the version under test.")
+    parser.add_argument("--treeName",default='Events',help="Tree in both files.")
+    parser.add_argument("--keys",default='run,lumi,evt,cat',help="Branches on which the events are matched.")
+    parser.add_argument("--absTol",default=0.,type=float,help="Allowed absolute difference of a value.")
+    parser.add_argument("--relTol",default=1.e-6,type=float,help="Allowed relative difference of a value.")
+    parser.add_argument("--branchTol",action='append',default=[],help="branch:absTol,relTol for one branch (may be repeated).")
+    parser.add_argument("--ignore",default='',help="Comma separated branches that are not compared.")
+    parser.add_argument("--maxUnmatched",default=0,type=int,help="Allowed number of events found in only one ntuple.")
+    parser.add_argument("--refCutFlow",default='',help="Cut flow of the reference ({ntuple}.cutflow by default, if it exists).")
+    parser.add_argument("--testCutFlow",default='',help="Cut flow of the version under test.")
+    parser.add_argument("--cutFlowTol",default=0,type=int,help="Allowed difference of the number of events at any stage.")
+    parser.add_argument("--refCmd",default='',help="Command that makes the reference ntuple, run first.")
+    parser.add_argument("--testCmd",default='',help="Command that makes the ntuple under test, run first.")
+    parser.add_argument("-m","--maxPrint",default=10,type=int,help="Number of differing events printed per branch.")
+    return parser.parse_args()
+
+def getBranchTol(specs) :
+    branchTol = {}
+    for spec in specs :
+        branch, tols = spec.split(':')
+        tols = [float(t) for t in tols.split(',')]
+        branchTol[branch] = (tols[0],tols[1] if len(tols) > 1 else 0.)
+    return branchTol
+
+def getKeyString(arrays, entry, keys) :
+    return ' '.join(["{0:s}={1:d}".format(k,int(arrays[k][entry])) for k in keys])
+
+args = getArgs()
+failures = []
+
+for cmd in [args.refCmd,args.testCmd] :
+    if len(cmd) < 1 : continue
+    print("Running {0:s}".format(cmd))
+    if subprocess.call(cmd,shell=True) != 0 :
+        print("FAILED: {0:s}".format(cmd))
+        sys.exit(1)
+
+# read the common branches of the two ntuples
+fileNames = [args.refFileName,args.testFileName]
+files = [ROOT.TFile.Open(fileName) for fileName in fileNames]
+trees = [f.Get(args.treeName) for f in files]
+names = [set(syncTools.getScalarBranches(t)) for t in trees]
+keys = args.keys.split(',')
+for k in keys :
+    if not (k in names[0] and k in names[1]) :
+        print("Key branch {0:s} is missing from one of the ntuples".format(k))
+        sys.exit(1)
+ignore = args.ignore.split(',') if len(args.ignore) > 0 else []
+branches = sorted([b for b in names[0] & names[1] if not b in keys and not b in ignore])
+for b in sorted(names[0] ^ names[1]) : print("Branch {0:s} is only in {1:s}".format(b,fileNames[0] if b in names[0] else fileNames[1]))
+arrays = [syncTools.loadArrays(fileName,t,branches+keys) for fileName, t in zip(fileNames,trees)]
+
+# match the events
+index1, index2, only1, only2 = syncTools.joinEvents(syncTools.getKeys(arrays[0],keys),syncTools.getKeys(arrays[1],keys))
+print("\nEvents: reference={0:d} test={1:d} matched={2:d} only in reference={3:d} only in test={4:d}".format(
+    len(only1),len(only2),len(index1),int(np.sum(only1)),int(np.sum(only2))))
+for only, a, title in [(only1,arrays[0],'reference'),(only2,arrays[1],'test')] :
+    for entry in np.nonzero(only)[0][:args.maxPrint] : print("  only in {0:s}: {1:s}".format(title,getKeyString(a,entry,keys)))
+if np.sum(only1) + np.sum(only2) > args.maxUnmatched : failures.append('unmatched events')
+
+# compare the values of the matched events
+results = syncTools.compareValues(arrays[0],arrays[1],index1,index2,branches,args.absTol,args.relTol,getBranchTol(args.branchTol))
+print("\nBranch                                   differ    NaN      max |diff|    max rel diff")
+for r in sorted(results,key=lambda r : -r['nBad']) :
+    print("{0:40s}{1:7d}{2:7d}{3:16.6g}{4:16.6g}".format(r['branch'],r['nBad'],r['nNaN'],r['maxAbs'],r['maxRel']))
+for r in results :
+    if r['nBad'] < 1 : continue
+    failures.append(r['branch'])
+    for entry in r['entries'][:args.maxPrint] :
+        i2 = index2[np.nonzero(index1 == entry)[0][0]]
+        print("  {0:s}: {1:s} reference={2:.6g} test={3:.6g}".format(r['branch'],getKeyString(arrays[0],entry,keys),
+            float(arrays[0][r['branch']][entry]),float(arrays[1][r['branch']][i2])))
+
+# compare the cut flows
+cutFlowFiles = [args.refCutFlow or cutFlow.getFileName(args.refFileName),args.testCutFlow or cutFlow.getFileName(args.testFileName)]
+if all([os.path.isfile(f) for f in cutFlowFiles]) :
+    print("\nStage            Category    reference       test   sumw reference   sumw test")
+    for stage, cat, n1, n2, w1, w2 in syncTools.compareCutFlows(cutFlow.read(cutFlowFiles[0]),cutFlow.read(cutFlowFiles[1])) :
+        flag = ''
+        if abs(n2-n1) > args.cutFlowTol :
+            flag = '  DIFFERENT'
+            failures.append('cut flow {0:s} {1:s}'.format(stage,cat))
+        print("{0:16s} {1:8s}{2:12d}{3:11d}{4:17.2f}{5:12.2f}{6:s}".format(stage,cat,n1,n2,w1,w2,flag))
+else :
+    print("\nNo cut flows compared ({0:s} not found)".format(' or '.join([f for f in cutFlowFiles if not os.path.isfile(f)])))
+
+if len(failures) > 0 :
+    print("\nFAILED: {0:s}".format(', '.join(failures)))
+    sys.exit(1)
+print("\nThe two outputs agree.")
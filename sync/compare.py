@@ -7,6 +7,7 @@ from optparse import OptionParser
 
 from varCfg import var_dict
 from DisplayManager import DisplayManager
+import syncTools
 
 # TODO (welcome by everybody):
 # - Please add more variables to varCfg.py if the default range finding doesn't
@@ -40,122 +41,58 @@ def applyHistStyle(h, i):
     h.SetStats(False)
 
 
-def comparisonPlots(u_names, trees, titles, pname='sync.pdf', ratio=True):
+def comparisonPlots(u_names, arrays, titles, pname='sync.pdf', ratio=True, selections=None):
+    # the histogram ranges are taken from all events, the contents from the selected ones
 
     display = DisplayManager(pname, ratio)
    
     for branch in u_names:
-        nbins = 50
-        min_x = min(t.GetMinimum(branch) for t in trees)
-        max_x = max(t.GetMaximum(branch) for t in trees)
-        title_x = branch
-
-        if min_x == max_x or all(t.GetMinimum(branch) == t.GetMaximum(branch) for t in trees):
+        hRange = syncTools.getRange(branch, arrays, var_dict)
+        if hRange is None:
             continue
-
-        if min_x < -900 and max_x < -min_x * 1.5:
-            min_x = - max_x
-
-        min_x = min(0., min_x)
-
-        if branch in var_dict:
-            b_d = var_dict[branch]
-            nbins = b_d['nbinsx'] if 'nbinsx' in b_d else nbins
-            min_x = b_d['xmin'] if 'xmin' in b_d else min_x
-            max_x = b_d['xmax'] if 'xmax' in b_d else max_x
-            title_x = b_d['title'] if 'title' in b_d else title_x
-
+        nbins, min_x, max_x, title_x = hRange
 
         hists = []
-        for i, t in enumerate(trees):
-            h_name = branch+t.GetName()+str(i)
+        for i, a in enumerate(arrays):
+            h_name = branch+titles[i]+str(i)
             h = ROOT.TH1F(h_name, branch, nbins, min_x, max_x + (max_x - min_x) * 0.01)
             h.Sumw2()
             h.GetXaxis().SetTitle(title_x)
             h.GetYaxis().SetTitle('Entries')
             applyHistStyle(h, i)
-            t.Project(h_name, branch, '1') # Should introduce weight...
+            values = a[branch] if selections is None else a[branch][selections[i]]
+            syncTools.fillHisto(h, values) # Should introduce weight...
             hists.append(h)
 
 
         display.Draw(hists, titles)
 
 
-def interSect(tree1, tree2, var='evt', common=False, save=False,  titles=[]):
-    # run, lumi, evt
+def interSect(arrays1, arrays2, common=False, save=False,  titles=[]):
+    # match on run, lumi, evt and return the selections of the common or of the unique events
     print("Enter compare.interSect()")
-    tlist1 = ROOT.TEntryList()
-    tlist2 = ROOT.TEntryList()
-    
-    tree1.Draw(var)
-    r_evt1 = tree1.GetV1()
-    if len(titles) > 0 and titles[0] == 'Imperial':
-        evt1 = np.array([int(r_evt1[i]) & 0xffffffff for i in xrange(tree2.GetEntries())], dtype=int)
-    else:
-        evt1 = np.array([r_evt1[i] for i in xrange(tree1.GetEntries())], dtype=int)
-
-    tree2.Draw(var)
-    r_evt2 = tree2.GetV1()
-    if len(titles) > 1 and titles[1] == 'Imperial':
-        evt2 = np.array([int(r_evt2[i]) & 0xffffffff for i in xrange(tree2.GetEntries())], dtype=int)
-    else:
-        evt2 = np.array([int(r_evt2[i]) for i in xrange(tree2.GetEntries())], dtype=int)
+    index1, index2, only1, only2 = syncTools.joinEvents(syncTools.getKeys(arrays1), syncTools.getKeys(arrays2))
 
     if common:
-        indices1 = np.nonzero(np.in1d(evt1, evt2))
-        indices2 = np.nonzero(np.in1d(evt2, evt1))
+        sel1, sel2 = np.logical_not(only1), np.logical_not(only2)
         print("In compare.interSect() common:\n len(evt1)={0:d} len(evt2)={1:d} len(indices1[0])={2:d} len(indices2[0])={3:d}".format(
-            len(evt1),len(evt2),len(indices1[0]),len(indices2[0])))
+            len(only1),len(only2),int(np.sum(sel1)),int(np.sum(sel2))))
     else:
-        indices1 = np.nonzero(np.in1d(evt1, evt2) == 0)
-        indices2 = np.nonzero(np.in1d(evt2, evt1) == 0)
+        sel1, sel2 = only1, only2
 
     if save:
         if len(titles) < 2:
             titles = ['tree1', 'tree2']
 
-        evt1[indices1].tofile(titles[0]+'.csv', sep=',', format='%d')
-        evt2[indices2].tofile(titles[1]+'.csv', sep=',', format='%d')
-
-    for ind1 in indices1[0]:
-        tlist1.Enter(ind1)
-
-    for ind2 in indices2[0]:
-        tlist2.Enter(ind2)
+        arrays1['evt'][sel1].astype(np.int64).tofile(titles[0]+'.csv', sep=',', format='%d')
+        arrays2['evt'][sel2].astype(np.int64).tofile(titles[1]+'.csv', sep=',', format='%d')
 
-    return tlist1, tlist2
+    return sel1, sel2
 
 
-def scanForDiff(tree1, tree2, branch_names, scan_var='pt_1', index_var='evt'):
-    # tree1.BuildIndex(index_var)
-    # index1 = tree1.GetTreeIndex()
-    tree2.BuildIndex(index_var)
-
-    diff_events = []
-
-    for entry_1 in tree1:
-        ind = int(getattr(tree1, index_var))
-        tree2.GetEntryWithIndex(ind)
-
-        var1 = getattr(tree1, scan_var)
-        var2 = getattr(tree2, scan_var)
-
-        if tree1.evt != tree2.evt:
-            continue
-
-        if var1 > -50. and round(var1, 2) != round(var2, 2): 
-            diff_events.append(ind)
-            print 'Event', ind
-            for branch in branch_names:
-                v1 = getattr(tree1, branch)
-                v2 = getattr(tree2, branch)
-                # if round(v1, 6) != round(v2, 6) and v1 > -99.:
-                if True:
-                    print '{b:>43}: {v1:>8.4f}, {v2:>8.4f}'.format(b=branch, v1=v1, v2=v2)
-            print
-
-    print 'Found', len(diff_events), 'events with differences in', scan_var
-    print diff_events
+def scanForDiff(arrays1, arrays2, branch_names, scan_var='pt_1'):
+    index1, index2, only1, only2 = syncTools.joinEvents(syncTools.getKeys(arrays1), syncTools.getKeys(arrays2))
+    return syncTools.scanForDiff(arrays1, arrays2, index1, index2, branch_names, scan_var)
 
 
 if __name__ == '__main__':
@@ -208,33 +145,34 @@ if __name__ == '__main__':
 
     trees = [findTree(f) for f in tfiles]
 
-    # find all branches that exist in all files
+    # find all branches that exist in all files and read them once
 
-    b_names = [set([b.GetName() for b in t.GetListOfBranches()]) for t in trees]
+    b_names = [set(syncTools.getScalarBranches(t)) for t in trees]
 
     u_names = set.intersection(*b_names)
 
     u_names = sorted(u_names)
 
+    if not 'evt' in u_names:
+        print 'No evt branch common to all files'
+        sys.exit(1)
+
+    arrays = [syncTools.loadArrays(arg, t, u_names, title) for arg, t, title in zip(args, trees, titles)]
+
     print 'Making plots for all common branches', u_names
 
-    comparisonPlots(u_names, trees, titles, 'sync.pdf', options.do_ratio)
+    comparisonPlots(u_names, arrays, titles, 'sync.pdf', options.do_ratio)
 
 
     if len(trees) == 2 and options.do_intersect:
-        intersect = interSect(trees[0], trees[1], save=True, titles=titles)
-        trees[0].SetEntryList(intersect[0])
-        trees[1].SetEntryList(intersect[1])
-        if not all(l.GetN() == 0 for l in intersect):
-            comparisonPlots(u_names, trees, titles, 'intersect.pdf', options.do_ratio)
+        intersect = interSect(arrays[0], arrays[1], save=True, titles=titles)
+        if not all(np.sum(l) == 0 for l in intersect):
+            comparisonPlots(u_names, arrays, titles, 'intersect.pdf', options.do_ratio, intersect)
 
 
     if len(trees) == 2 and options.do_common:
-        intersect = interSect(trees[0], trees[1], common=True)
-        trees[0].SetEntryList(intersect[0])
-        trees[1].SetEntryList(intersect[1])
-        comparisonPlots(u_names, trees, titles, 'common.pdf', options.do_ratio)
+        intersect = interSect(arrays[0], arrays[1], common=True)
+        comparisonPlots(u_names, arrays, titles, 'common.pdf', options.do_ratio, intersect)
 
     if len(trees) == 2 and options.do_diff:
-        scanForDiff(trees[0], trees[1], u_names, scan_var=options.var_diff)
-    
+        scanForDiff(arrays[0], arrays[1], u_names, scan_var=options.var_diff)
@@ -78,7 +78,7 @@ for file in scriptList :
     outLines.append('Log = {0:s}.log\n'.format(base))
     outLines.append('transfer_input_files = {0:s}makeSyncNtuple.py, '.format(dir))
     #outLines.append('{0:s}FSA_et_only.csv, {0:s}Dan_et_only.csv, '.format(dir))
-    outLines.append('{0:s}outTuple.py, {0:s}tauFun.py, {0:s}generalFunctions.py, '.format(funcsDir))
+    outLines.append('{0:s}outTuple.py, {0:s}tauFun.py, {0:s}generalFunctions.py, {0:s}arrayReader.py, {0:s}eventBatch.py, {0:s}pairSelection.py, {0:s}pairKernels.py, {0:s}jetSelection.py, {0:s}genCategory.py, {0:s}cutFlow.py, '.format(funcsDir))
     outLines.append('{0:s}FastMTT.h, {0:s}MeasuredTauLepton.h, {0:s}svFitAuxFunctions.h,'.format(SVFitDir)) 
     outLines.append('{0:s}FastMTT.cc, {0:s}MeasuredTauLepton.cc, {0:s}svFitAuxFunctions.cc \n'.format(SVFitDir))
     outLines.append('should_transfer_files = YES\n')
@@ -1,15 +1,28 @@
 #
 # make sync ntuple for ZH tau tau analysis
-# takes nanoAOD file as input 
+# takes nanoAOD file as input
 # CMSSW_10_2_X
 #
+# The tau pair is selected for --chunkSize events at a time with funcs/pairSelection.py, and the
+# jets are cleaned and counted with funcs/jetSelection.py, reading only the branches they need.
+# The gen-level category (gen_cat) is found with funcs/genCategory.py in the same way.   Each chunk
+# is an eventBatch (funcs/eventBatch.py), so the offsets of a collection are computed only once.
+# The input tree is then read event by event only for the events that have a pair, to fill the
+# output ntuple.
+#
 
-from ROOT import TFile, TTree, TH1D, TCanvas, TLorentzVector  
+import sys
+sys.path.insert(1,'../funcs/')
+from ROOT import TFile, TTree, TH1D, TCanvas, TLorentzVector
 import numpy as np
-from math import sqrt
 import tauFun
-import generalFunctions as GF 
+import generalFunctions as GF
 import outTuple
+import eventBatch
+import pairSelection
+import jetSelection
+import cutFlow
+import genCategory
 import time
 
 def getArgs() :
@@ -21,27 +34,31 @@ def getArgs() :
     parser.add_argument("-u","--unique",default='',help="Unique sample e.g., FSA_only or DRM_only")
     parser.add_argument("-o","--outFileName",default='',help="File to be used for output.")
     parser.add_argument("-n","--nEvents",default=0,type=int,help="Number of events to process.")
+    parser.add_argument("-y","--year",default=2017,type=int,help="Data taking period, 2016, 2017 or 2018")
+    parser.add_argument("--chunkSize",default=100000,type=int,help="Number of events selected at a time.")
     return parser.parse_args()
 
+def readEventList(fileName) :
+    # comma separated event numbers, as written by compare.py
+    vals = open(fileName,'r').readlines()[0].split(',')
+    return np.array([int(val) for val in vals if len(val.strip()) > 0],dtype=np.int64)
+
 args = getArgs()
 print("args={0:s}".format(str(args)))
 maxPrint = 20
 verbose = args.verbose
-cutCounter = GF.cutCounter()
+cutCounter = cutFlow.cutFlow()
+channel = args.channel
+era = str(args.year)
 
+FSA_only, Dan_only = np.zeros(0,dtype=np.int64), np.zeros(0,dtype=np.int64)
 if len(args.unique) > 1 :
-    vals = open('FSA_{0:s}_only.csv'.format(args.channel),'r').readlines()[0].split(',')
-    FSA_only = [] 
-    for val in vals : FSA_only.append(int(val))
+    FSA_only = readEventList('FSA_{0:s}_only.csv'.format(channel))
     print("len(FSA_only)={0:d}".format(len(FSA_only)))
-
-    vals = open('Dan_{0:s}_only.csv'.format(args.channel),'r').readlines()[0].split(',')
-    Dan_only = [] 
-    for val in vals : Dan_only.append(int(val))
+    Dan_only = readEventList('Dan_{0:s}_only.csv'.format(channel))
     print("len(Dan_only)={0:d}".format(len(Dan_only)))
-
     print("FSA_only={0} Dan_only={1}".format(args.unique == 'FSA_only', args.unique == 'Dan_only'))
-          
+
 inFileName = args.inFileName
 print("Opening {0:s} as input.".format(inFileName))
 inFile = TFile.Open(inFileName)
@@ -49,90 +66,61 @@ inFile.cd()
 inTree = inFile.Get("Events")
 nentries = inTree.GetEntries()
 nMax = nentries
-print("nentries={0:d} nMax={1:d}".format(nentries,nMax))
 if args.nEvents > 0 : nMax = min(args.nEvents,nentries)
+print("nentries={0:d} nMax={1:d}".format(nentries,nMax))
 
 outFileName = GF.getOutFileName(args).replace(".root",".ntup")
 print("Opening {0:s} as output.".format(outFileName))
-outTuple = outTuple.outTuple(outFileName)
+outTuple = outTuple.outTuple(outFileName, era)
 
-channel = args.channel
-goodEventCounter = 0
+branches = pairSelection.getBranches(channel) + jetSelection.branches + genCategory.branches + ['event']
 tStart = time.time()
-for count, entry in enumerate(inTree) :
-    cutCounter.count('All')
-    if count % 1000 == 0 : print("Count={0:d}".format(count))
-    if count > nMax : break
-
-    if channel == 'tt' :
-        tauList = tauFun.getTauList(channel, entry)
-        if len(tauList) < 2 : continue
-        cutCounter.count('TwoTaus')
-        bestTauPair = tauFun.getBestTauPair(channel, entry, tauList )
-    elif channel == 'mt' :
-        bestTauPair = tauFun.getBestMuTauPair(entry,cat=channel,printOn=False)
-        if len(bestTauPair) < 1 :
-            if args.unique == 'FSA_only' and entry.event in FSA_only :
-                if True :
-                    print("\n** FSA only event *** Count={0:d}".format(count))
-                    print("bestTauPair={0:s}".format(str(bestTauPair)))
-                    bestTauPair = tauFun.getBestMuTauPair(entry,printOn=False)
-                    GF.printEvent(entry)
-                    GF.printMC(entry)
-                    maxPrint -= 1
-            continue
-    elif channel == 'et' :
-        bestTauPair = tauFun.getBestETauPair(entry,cat=channel,printOn=False)
-        if len(bestTauPair) < 1 :
-            if args.unique == 'FSA_only' and entry.event in FSA_only :
-                if True :
-                    print("\n** FSA only event *** Count={0:d}".format(count))
-                    print("bestTauPair = {0:s}".format(str(bestTauPair)))
-                    best = tauFun.getBestETauPair(entry,printOn=False) 
-                    GF.printEvent(entry)
-                    maxPrint -= 1
-            continue
-    
-    if len(bestTauPair) < 1 : continue
-    cutCounter.count("TauPair") 
-    if bestTauPair[0] < 0 : continue
-    cutCounter.count("GoodTauPair")
-        
-    #if False and len(args.unique) > 0  and (not ((entry.event in Dan_only) or (entry.event in FSA_only))) and maxPrint > 0 :
-    #if args.unique == 'Dan_only'  and (entry.event in Dan_only)  and maxPrint > 0 :
-    if maxPrint > 0 :
-        print("\n** GOOD EVENT *** Count={0:d}".format(count))
-        print("bestTauPair = {0:s}".format(str(bestTauPair)))
-        GF.printEvent(entry)
-        maxPrint -= 1
-        
-    if len(bestTauPair) > 1 :
-        jt1, jt2 = bestTauPair[0], bestTauPair[1]
-    else :
-        continue
-
-    SVFit = True
-    LepP, LepM = TLorentzVector(), TLorentzVector()
-    #defFill(self,entry,SVFit,cat,    jt1,jt2,LepP,LepM) :
-    outTuple.Fill(entry,SVFit,channel,jt1,jt2,LepP,LepM) 
+for a in eventBatch.iterateBatches(inFileName,branches,chunkSize=args.chunkSize,entryStop=nMax) :
+    first = a.first
+    print("Count={0:d}".format(first))
+    nChunk = len(a['event'])
+    jt1, jt2, nGood = pairSelection.getBestPairs(a,channel,tauFun.getSelections())
+    hasPair = jt1 >= 0
+    cutCounter.count('All',n=nChunk)
+    if channel == 'tt' : cutCounter.count('TwoTaus',nGood >= 2)
+    cutCounter.count('TauPair',hasPair)
+    cutCounter.count('GoodTauPair',hasPair)
+
+    # debugging of the events that only the FSA group selects
+    if args.unique == 'FSA_only' and channel in ['et','mt'] :
+        for i in np.nonzero(np.logical_not(hasPair) & np.isin(a['event'],FSA_only))[0] :
+            inTree.GetEntry(first+i)
+            print("\n** FSA only event *** Count={0:d}".format(first+i))
+            print("bestTauPair=[]")
+            GF.printEvent(inTree)
+            if channel == 'mt' : GF.printMC(inTree)
+            maxPrint -= 1
+
+    # jet cleaning against the two legs for all the selected events at once
+    selected = np.nonzero(hasPair)[0]
+    leg1 = {'et':'Electron','mt':'Muon','tt':'Tau'}[channel]
+    k1 = a.getOffsets(leg1)[selected] + jt1[selected]
+    k2 = a.getOffsets('Tau')[selected] + jt2[selected]
+    jets = jetSelection.getJets(a,a[leg1+'_eta'][k1],a[leg1+'_phi'][k1],a['Tau_eta'][k2],a['Tau_phi'][k2],selected)
+    genCats = genCategory.getCategories(a)
+
+    for m, i in enumerate(selected) :
+        inTree.GetEntry(first+i)
+        bestTauPair = [int(jt1[i]),int(jt2[i])]
+        if maxPrint > 0 :
+            print("\n** GOOD EVENT *** Count={0:d}".format(first+i))
+            print("bestTauPair = {0:s}".format(str(bestTauPair)))
+            GF.printEvent(inTree)
+            maxPrint -= 1
+
+        SVFit = True
+        LepP, LepM = TLorentzVector(), TLorentzVector()
+        outTuple.setGenCat(genCats[i])
+        outTuple.Fill(inTree,SVFit,channel,bestTauPair[0],bestTauPair[1],LepP,LepM,[],True,era,jetSelection.getEventJets(jets,m))
 
 dT = time.time() - tStart
-print("Run time={0:.2f} s  time/event={1:.1f} us".format(dT,1000000.*dT/count))
+print("Run time={0:.2f} s  time/event={1:.1f} us".format(dT,1000000.*dT/max(nMax,1)))
 
 outTuple.writeTree()
 cutCounter.printSummary()
-
-
-
-
-
-
-
-
-  
-            
-
-    
-    
-
-
+cutCounter.write(cutFlow.getFileName(outFileName))
@@ -0,0 +1,163 @@
+# columnar tools for comparing sync ntuples, used by compare.py and venn.py
+#
+# The common branches of the two ntuples are read once into numpy arrays.   The events
+# are matched on (run,lumi,evt) with a sorted merge, and the unique and common selections,
+# the comparison histograms and the per-event differences are all made from the arrays.
+
+import sys
+sys.path.insert(1,'../funcs/')
+import numpy as np
+import ROOT
+import arrayReader
+
+keyNames = ['run','lumi','evt']
+numericTypes = ['Bool_t','Char_t','UChar_t','Short_t','UShort_t','Int_t','UInt_t',
+                'Float_t','Double_t','Long64_t','ULong64_t','Long_t','ULong_t']
+
+def getTreePath(tree):
+    # path of the tree inside its file, e.g. 'Events' or 'mt/ntuple'
+    dirPath = tree.GetDirectory().GetPath().split(':')[-1].strip('/')
+    if len(dirPath) > 0:
+        return dirPath + '/' + tree.GetName()
+    return tree.GetName()
+
+def getScalarBranches(tree):
+    # names of the branches with a single numeric leaf, the only ones that can be compared event by event
+    names = []
+    for b in tree.GetListOfBranches():
+        leaves = b.GetListOfLeaves()
+        if leaves.GetEntries() != 1:
+            continue
+        leaf = leaves.At(0)
+        if leaf.GetLenStatic() == 1 and not leaf.GetLeafCount() and leaf.GetTypeName() in numericTypes:
+            names.append(b.GetName())
+    return names
+
+def loadArrays(fileName, tree, branches, title=''):
+    """ syncTools.loadArrays(): return a dictionary with one numpy array per branch
+    """
+    arrays = arrayReader.getArrays(fileName, list(branches), treeName=getTreePath(tree))
+    # Imperial store evt as a 64 bit word of which only the lower half is the event number
+    if title == 'Imperial' and 'evt' in arrays:
+        arrays['evt'] = arrays['evt'].astype(np.int64) & 0xffffffff
+    return arrays
+
+def getKeys(arrays, names=keyNames):
+    return [arrays[k].astype(np.int64) for k in names if k in arrays]
+
+def joinEvents(keys1, keys2):
+    """ syncTools.joinEvents(): match events on the key arrays (e.g. run,lumi,evt) with a sorted merge.
+                                Return (index1, index2, only1, only2): the entries of the matched
+                                events in each ntuple, and masks of the events found in only one.
+    """
+    n1, n2 = len(keys1[0]), len(keys2[0])
+    if n1 + n2 == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+    keys = [np.concatenate([k1, k2]) for k1, k2 in zip(keys1, keys2)]
+    source = np.concatenate([np.zeros(n1, dtype=int), np.ones(n2, dtype=int)])
+    entry = np.concatenate([np.arange(n1), np.arange(n2)])
+    # np.lexsort sorts on the last key first, so events with equal keys end up next to
+    # each other with the entry of the first ntuple in front
+    order = np.lexsort([source] + keys[::-1])
+    sKeys = [k[order] for k in keys]
+    sSource, sEntry = source[order], entry[order]
+    same = np.ones(len(order)-1, dtype=bool) if len(order) > 0 else np.zeros(0, dtype=bool)
+    for k in sKeys:
+        same &= k[1:] == k[:-1]
+    pair = same & (sSource[:-1] == 0) & (sSource[1:] == 1)
+    index1, index2 = sEntry[:-1][pair], sEntry[1:][pair]
+    # an event that is duplicated in one ntuple is common if any of its copies is matched
+    group = np.cumsum(np.concatenate([[True], np.logical_not(same)])) - 1
+    has1 = np.bincount(group, weights=(sSource == 0)) > 0
+    has2 = np.bincount(group, weights=(sSource == 1)) > 0
+    matched = (has1 & has2)[group]
+    only1, only2 = np.ones(n1, dtype=bool), np.ones(n2, dtype=bool)
+    only1[sEntry[(sSource == 0) & matched]] = False
+    only2[sEntry[(sSource == 1) & matched]] = False
+    return index1, index2, only1, only2
+
+def getRange(branch, arrays, var_dict={}):
+    # histogram range as found by compare.comparisonPlots() from TTree.GetMinimum()/GetMaximum()
+    nbins, title_x = 50, branch
+    mins = [np.min(a[branch]) for a in arrays if len(a[branch]) > 0]
+    maxs = [np.max(a[branch]) for a in arrays if len(a[branch]) > 0]
+    if len(mins) < 1:
+        return None
+    min_x, max_x = float(min(mins)), float(max(maxs))
+    if min_x == max_x or all(mn == mx for mn, mx in zip(mins, maxs)):
+        return None
+    if min_x < -900 and max_x < -min_x * 1.5:
+        min_x = - max_x
+    min_x = min(0., min_x)
+    if branch in var_dict:
+        b_d = var_dict[branch]
+        nbins = b_d['nbinsx'] if 'nbinsx' in b_d else nbins
+        min_x = b_d['xmin'] if 'xmin' in b_d else min_x
+        max_x = b_d['xmax'] if 'xmax' in b_d else max_x
+        title_x = b_d['title'] if 'title' in b_d else title_x
+    return nbins, min_x, max_x, title_x
+
+def fillHisto(h, values):
+    # fill a TH1 with all values at once
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if len(values) > 0:
+        h.FillN(len(values), values, np.ones(len(values)))
+    return h
+
+def scanForDiff(arrays1, arrays2, index1, index2, branch_names, scan_var='pt_1'):
+    """ syncTools.scanForDiff(): print the matched events for which scan_var differs (to 0.01)
+    """
+    v1 = arrays1[scan_var][index1].astype(np.float64)
+    v2 = arrays2[scan_var][index2].astype(np.float64)
+    diff = (v1 > -50.) & (np.round(v1, 2) != np.round(v2, 2))
+    diff_events = arrays1['evt'][index1][diff].astype(np.int64)
+    for i1, i2, evt in zip(index1[diff], index2[diff], diff_events):
+        print('Event {0:d}'.format(int(evt)))
+        for branch in branch_names:
+            print('{b:>43}: {v1:>8.4f}, {v2:>8.4f}'.format(b=branch, v1=float(arrays1[branch][i1]), v2=float(arrays2[branch][i2])))
+        print('')
+    print('Found {0:d} events with differences in {1:s}'.format(len(diff_events), scan_var))
+    print(list(diff_events))
+    return diff_events
+
+def compareValues(arrays1, arrays2, index1, index2, branches, absTol=0., relTol=0., branchTol={}):
+    """ syncTools.compareValues(): compare each branch of the matched events.  Values agree if
+                                   |v2-v1| <= absTol + relTol*|v1|, with (absTol,relTol) taken from
+                                   branchTol for the branches found there; NaN agrees with NaN.
+                                   Return one dictionary per branch with the number of events that
+                                   differ, how many of them are a number against a NaN, the largest
+                                   absolute and relative deviations of the others (relative to a
+                                   non-zero v1 only), and the entries (in the first ntuple) of the
+                                   events that differ.
+    """
+    results = []
+    for branch in branches:
+        v1 = arrays1[branch][index1].astype(np.float64)
+        v2 = arrays2[branch][index2].astype(np.float64)
+        aTol, rTol = branchTol.get(branch, (absTol, relTol))
+        diff = np.abs(v2 - v1)
+        bothNaN = np.isnan(v1) & np.isnan(v2)
+        oneNaN = np.isnan(v1) ^ np.isnan(v2)
+        diff[bothNaN] = 0.
+        bad = np.logical_not(diff <= aTol + rTol*np.abs(v1)) & np.logical_not(bothNaN)
+        finite = np.isfinite(diff)
+        nonZero = finite & (np.abs(v1) > 0.)
+        maxAbs = float(np.max(diff[finite])) if np.any(finite) else 0.
+        maxRel = float(np.max(diff[nonZero]/np.abs(v1[nonZero]))) if np.any(nonZero) else 0.
+        results.append({'branch': branch, 'nBad': int(np.sum(bad)), 'nNaN': int(np.sum(oneNaN)), 'maxAbs': maxAbs,
+                        'maxRel': maxRel, 'entries': index1[bad]})
+    return results
+
+def compareCutFlows(cf1, cf2):
+    # (stage, category, n1, n2, sumw1, sumw2) for each stage and category of either cut flow
+    rows = []
+    stages = list(cf1.stages) + [s for s in cf2.stages if s not in cf1.stageIndex]
+    cats = list(cf1.cats) + [c for c in cf2.cats if c not in cf1.catIndex]
+    for stage in stages:
+        for cat in cats:
+            n1 = cf1.getCount(stage, cat) if cat in cf1.catIndex else 0
+            n2 = cf2.getCount(stage, cat) if cat in cf2.catIndex else 0
+            w1 = cf1.getCount(stage, cat, weighted=True) if cat in cf1.catIndex else 0.
+            w2 = cf2.getCount(stage, cat, weighted=True) if cat in cf2.catIndex else 0.
+            rows.append((stage, cat, int(n1), int(n2), float(w1), float(w2)))
+    return rows